@@ -38,6 +38,10 @@ def create_app():
     app.register_blueprint(user_bp)
     app.register_blueprint(admin_bp)
 
+    # Instrumentação por requisição (consultas SQL, tempos) de todos os blueprints
+    from . import metricas
+    metricas.init_app(app)
+
     # Error Handlers
     @app.errorhandler(404)
     def pagina_nao_encontrada(e):
@@ -0,0 +1,44 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+class CacheTTL:
+    """Cache em memória do processo, com expiração (TTL) e limite de itens (LRU).
+    Cada worker do gunicorn tem o seu; serve para dados que podem ficar alguns
+    segundos/minutos defasados ou que são validados na leitura."""
+
+    def __init__(self, ttl_segundos=300, max_itens=10000):
+        self.ttl = ttl_segundos
+        self.max_itens = max_itens
+        self._dados = OrderedDict()
+        self._lock = Lock()
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return padrao
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return padrao
+            self._dados.move_to_end(chave)
+            return valor
+
+    def definir(self, chave, valor, ttl=None):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + (ttl or self.ttl), valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def remover(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
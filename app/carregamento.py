@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload, contains_eager, noload
+from .extensions import db
+from .models import Resposta, Usuario, Pergunta
+
+# Perfis de carregamento (eager loading) por tela.
+# Cada página que lista respostas declara aqui o que o template vai tocar, e a
+# consulta aplica o perfil com com_perfil(query, 'nome'). Relações "para um"
+# (usuário, setor, pergunta) vêm no mesmo SELECT com joinedload; coleções
+# (imagens, anexos) vêm numa consulta extra com selectinload para a página toda.
+# Resultado: número fixo de consultas por página, em vez de 3-4 por linha.
+#
+# Pergunta.departamentos é lazy='subquery' no modelo (a edição de pergunta usa);
+# nas listagens ele não é usado, então os perfis desligam com noload.
+
+def _pergunta_sem_setores(caminho):
+    return caminho.options(noload(Pergunta.departamentos))
+
+PERFIS = {
+    # admin/correcoes: usuário + setor, pergunta com imagens extras, anexos da resposta
+    'correcoes': lambda: [
+        joinedload(Resposta.usuario).joinedload(Usuario.departamento),
+        _pergunta_sem_setores(joinedload(Resposta.pergunta)).selectinload(Pergunta.imagens_extra),
+        selectinload(Resposta.anexos_extra),
+    ],
+    # admin/analytics: a consulta já faz join com pergunta, usuário e setor
+    'analytics': lambda: [
+        contains_eager(Resposta.usuario).contains_eager(Usuario.departamento),
+        _pergunta_sem_setores(contains_eager(Resposta.pergunta)),
+    ],
+    # minhas_respostas: só a pergunta de cada resposta
+    'minhas_respostas': lambda: [
+        _pergunta_sem_setores(joinedload(Resposta.pergunta)),
+    ],
+}
+
+def com_perfil(query, nome):
+    """Aplica o perfil de carregamento `nome` à consulta de Resposta."""
+    return query.options(*PERFIS[nome]())
+
+@contextmanager
+def contar_consultas():
+    """Conta os comandos SQL executados dentro do bloco: `with contar_consultas() as c: ...; c['total']`."""
+    contagem = {'total': 0}
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contagem['total'] += 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _contar)
+    try:
+        yield contagem
+    finally:
+        event.remove(engine, 'before_cursor_execute', _contar)
\ No newline at end of file
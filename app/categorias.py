@@ -0,0 +1,146 @@
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from . import temas
+from .models import Categoria, Pergunta, PerguntaElegivel, Resposta
+
+# Categorias (temas) das perguntas.
+# Cada categoria é uma linha em Categoria com o nome de exibição e uma chave
+# normalizada única ('  Vendas ' -> 'vendas'); Pergunta, PerguntaElegivel e
+# ContadorCategoria guardam só o categoria_id. Assim filtrar é igualdade por id no
+# índice, renomear é um UPDATE de uma linha e excluir/juntar/reclassificar é um
+# UPDATE por tabela (WHERE categoria_id / id / texto ...), sem carregar as perguntas.
+
+GERAL = 'Geral'
+SEM_CLASSIFICACAO = 'Sem Classificação'
+
+def chave_categoria(nome):
+    """Normaliza o nome da categoria para comparação ('  Vendas ' -> 'vendas')."""
+    return (nome or '').strip().lower()
+
+def buscar(nome):
+    return Categoria.query.filter_by(chave=chave_categoria(nome)).first()
+
+def obter_ou_criar(nome):
+    """Categoria com a mesma chave (ou uma nova, com o nome digitado). Não faz commit."""
+    nome = (nome or '').strip() or GERAL
+    categoria = buscar(nome)
+    if categoria:
+        return categoria
+    # Outra requisição pode ter criado a mesma chave agora: usa a dela
+    try:
+        with db.session.begin_nested():
+            categoria = Categoria(nome=nome, chave=chave_categoria(nome))
+            db.session.add(categoria)
+    except IntegrityError:
+        categoria = buscar(nome)
+    return categoria
+
+def ids_por_nome(nomes):
+    """{nome digitado: categoria_id} para a importação em massa. As que faltam são criadas
+    com a primeira grafia que aparece. Não faz commit."""
+    por_chave = {}
+    for nome in nomes:
+        por_chave.setdefault(chave_categoria(nome) or chave_categoria(GERAL), (nome or '').strip() or GERAL)
+    ids = dict(db.session.query(Categoria.chave, Categoria.id).filter(Categoria.chave.in_(list(por_chave))))
+    for chave, nome in por_chave.items():
+        if chave not in ids:
+            ids[chave] = obter_ou_criar(nome).id
+    return {nome: ids[chave_categoria(nome) or chave_categoria(GERAL)] for nome in nomes}
+
+def filtro_id(nome):
+    """Subconsulta escalar com o id da categoria, para usar em filtros (uma consulta só)."""
+    return select(Categoria.id).where(Categoria.chave == chave_categoria(nome)).scalar_subquery()
+
+def nomes():
+    """Nomes para as sugestões dos formulários."""
+    return [nome for (nome,) in db.session.query(Categoria.nome).order_by(Categoria.nome)]
+
+def estatisticas():
+    """[(nome, perguntas)] para a tela de categorias, incluindo as que ficaram vazias."""
+    return db.session.query(
+        Categoria.nome, func.count(Pergunta.id)
+    ).outerjoin(Pergunta, Pergunta.categoria_id == Categoria.id).group_by(
+        Categoria.id, Categoria.nome
+    ).order_by(Categoria.nome).all()
+
+# --- Operações em massa ---
+# Cada operação é um UPDATE em pergunta e um em pergunta_elegivel (filtrados por
+# categoria_id, id ou texto), sem carregar as perguntas. Os contadores por tema são
+# somados de uma categoria na outra (juntar) ou recalculados só para quem respondeu
+# alguma pergunta que mudou (reclassificar). Nenhuma faz commit; com simular=True
+# só contam quantas perguntas mudariam.
+
+def _quantidade(filtro):
+    return db.session.query(func.count(Pergunta.id)).filter(filtro).scalar()
+
+def _aplicar(filtro, nome_destino, simular=False):
+    """Passa para a categoria 'nome_destino' as perguntas do filtro. Retorna quantas mudaram."""
+    destino = buscar(nome_destino) if simular else obter_ou_criar(nome_destino)
+    mudar = filtro if destino is None else filtro & (Pergunta.categoria_id != destino.id)
+    if simular:
+        return _quantidade(mudar)
+    db.session.flush()
+    ids_mudar = select(Pergunta.id).where(mudar)
+    quem_respondeu = [u_id for (u_id,) in db.session.query(Resposta.usuario_id).filter(
+        Resposta.pergunta_id.in_(ids_mudar)).distinct()]
+    # O índice primeiro: a subconsulta ainda enxerga a categoria antiga
+    PerguntaElegivel.query.filter(PerguntaElegivel.pergunta_id.in_(ids_mudar)).update(
+        {'categoria_id': destino.id}, synchronize_session=False)
+    qtd = Pergunta.query.filter(mudar).update({'categoria_id': destino.id}, synchronize_session=False)
+    if quem_respondeu:
+        temas.recalcular_usuarios(quem_respondeu)
+    return qtd
+
+def juntar(nomes_origem, nome_destino, simular=False):
+    """Junta várias categorias numa só (criada se não existir) e apaga as de origem.
+    Retorna quantas perguntas mudaram (None se nenhuma origem existe)."""
+    chave_destino = chave_categoria(nome_destino)
+    chaves = {chave_categoria(n) for n in nomes_origem} - {chave_destino}
+    origem_ids = [c_id for (c_id,) in db.session.query(Categoria.id).filter(Categoria.chave.in_(list(chaves)))]
+    if not origem_ids:
+        return None
+    if simular:
+        return _quantidade(Pergunta.categoria_id.in_(origem_ids))
+    destino = obter_ou_criar(nome_destino)
+    PerguntaElegivel.query.filter(PerguntaElegivel.categoria_id.in_(origem_ids)).update(
+        {'categoria_id': destino.id}, synchronize_session=False)
+    qtd = Pergunta.query.filter(Pergunta.categoria_id.in_(origem_ids)).update(
+        {'categoria_id': destino.id}, synchronize_session=False)
+    temas.juntar_categorias(origem_ids, destino.id)
+    Categoria.query.filter(Categoria.id.in_(origem_ids)).delete(synchronize_session=False)
+    return qtd
+
+def reclassificar(nome_destino, pergunta_ids=None, texto_contem=None, simular=False):
+    """Passa para 'nome_destino' as perguntas da lista de ids e/ou cujo texto contém o trecho
+    (sem diferenciar maiúsculas). Retorna quantas mudaram."""
+    filtros = []
+    if pergunta_ids is not None:
+        filtros.append(Pergunta.id.in_(list(pergunta_ids)))
+    if texto_contem:
+        filtros.append(Pergunta.texto.icontains(texto_contem, autoescape=True))
+    if not filtros:
+        raise ValueError('Informe pergunta_ids ou texto_contem.')
+    return _aplicar(and_(*filtros), nome_destino, simular)
+
+def renomear(nome_antigo, novo_nome, simular=False):
+    """Renomeia (um UPDATE em Categoria). Se já existe uma categoria com a chave do
+    novo nome, junta as duas. Retorna quantas perguntas foram afetadas (None se não achou)."""
+    categoria = buscar(nome_antigo)
+    novo_nome = (novo_nome or '').strip()
+    if categoria is None or not novo_nome:
+        return None
+    destino = buscar(novo_nome)
+    if destino is not None and destino.id != categoria.id:
+        return juntar([nome_antigo], novo_nome, simular)
+    if not simular:
+        categoria.nome = novo_nome
+        categoria.chave = chave_categoria(novo_nome)
+    return _quantidade(Pergunta.categoria_id == categoria.id)
+
+def excluir(nome, simular=False):
+    """Move as perguntas para 'Geral' e apaga a categoria. Retorna quantas perguntas
+    foram movidas (None se não achou ou se é a própria 'Geral')."""
+    if chave_categoria(nome) == chave_categoria(GERAL):
+        return None
+    return juntar([nome], GERAL, simular)
\ No newline at end of file
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, func
+from .extensions import db
+from .models import ContadorPendencias, Usuario, Pergunta, Resposta, PerguntaElegivel
+from .elegibilidade import TIPOS_QUIZ
+
+# Contadores do dashboard mantidos incrementalmente.
+# O dashboard lê uma única linha (chave primária = usuario_id); as rotas que
+# mudam as pendências ajustam os números com UPDATEs atômicos, e qualquer mudança
+# difícil de calcular (edição/exclusão de pergunta, troca de setor, virada do dia)
+# apenas marca o contador como desatualizado para ser recalculado na próxima leitura.
+
+STATUS_FEEDBACK = ['correto', 'incorreto']
+
+def _hoje():
+    return (datetime.utcnow() - timedelta(hours=3)).date()
+
+def _soma_se(condicao):
+    return func.sum(case((condicao, 1), else_=0))
+
+def calcular_pendencias(usuario, hoje=None):
+    """Calcula do zero (quiz, atividades, feedbacks) direto das tabelas."""
+    hoje = hoje or _hoje()
+    sq_respondidas = db.session.query(Resposta.pergunta_id).filter(Resposta.usuario_id == usuario.id)
+
+    # Varredura por faixa no índice de elegibilidade do setor
+    quiz, atividades = db.session.query(
+        _soma_se(PerguntaElegivel.tipo.in_(TIPOS_QUIZ)),  # os mesmos tipos que o /quiz mostra
+        _soma_se(PerguntaElegivel.tipo == 'discursiva')
+    ).filter(
+        PerguntaElegivel.departamento_id == usuario.departamento_id,
+        PerguntaElegivel.data_liberacao <= hoje,
+        ~PerguntaElegivel.pergunta_id.in_(sq_respondidas)
+    ).one()
+
+    feedbacks = Resposta.query.join(Pergunta).filter(
+        Resposta.usuario_id == usuario.id,
+        Pergunta.tipo == 'discursiva',
+        Resposta.status_correcao.in_(STATUS_FEEDBACK),
+        Resposta.feedback_visto == False
+    ).count()
+
+    return quiz or 0, atividades or 0, feedbacks
+
+def recalcular_contador(usuario, hoje=None):
+    hoje = hoje or _hoje()
+    quiz, atividades, feedbacks = calcular_pendencias(usuario, hoje)
+
+    contador = db.session.get(ContadorPendencias, usuario.id)
+    if not contador:
+        contador = ContadorPendencias(usuario_id=usuario.id)
+        db.session.add(contador)
+
+    contador.quiz_pendentes = quiz
+    contador.atividades_pendentes = atividades
+    contador.feedbacks_novos = feedbacks
+    contador.data_referencia = hoje
+    return contador
+
+def obter_contador(usuario_id):
+    """Leitura do dashboard: uma busca por chave primária; recalcula só se estiver desatualizado."""
+    hoje = _hoje()
+    contador = db.session.get(ContadorPendencias, usuario_id)
+    if contador and contador.data_referencia == hoje:
+        return contador
+
+    usuario = db.session.get(Usuario, usuario_id)
+    contador = recalcular_contador(usuario, hoje)
+    db.session.commit()
+    return contador
+
+def _ajustar(usuario_id, **deltas):
+    valores = {}
+    for campo, delta in deltas.items():
+        coluna = getattr(ContadorPendencias, campo)
+        # Nunca deixa o contador ficar negativo
+        valores[campo] = case((coluna + delta < 0, 0), else_=coluna + delta)
+    ContadorPendencias.query.filter_by(usuario_id=usuario_id).update(valores, synchronize_session=False)
+
+def registrar_resposta(usuario_id, pergunta):
+    """Chamado quando o usuário responde uma pergunta (quiz ou atividade)."""
+    if pergunta.tipo == 'discursiva':
+        _ajustar(usuario_id, atividades_pendentes=-1)
+    elif pergunta.tipo in TIPOS_QUIZ:
+        _ajustar(usuario_id, quiz_pendentes=-1)
+
+def registrar_correcao(resposta, status_anterior):
+    """Ajusta os feedbacks novos quando uma atividade é (re)avaliada."""
+    if resposta.pergunta.tipo != 'discursiva' or resposta.feedback_visto:
+        return
+    antes = status_anterior in STATUS_FEEDBACK
+    depois = resposta.status_correcao in STATUS_FEEDBACK
+    if antes != depois:
+        _ajustar(resposta.usuario_id, feedbacks_novos=1 if depois else -1)
+
+def zerar_feedbacks(usuario_id):
+    ContadorPendencias.query.filter_by(usuario_id=usuario_id).update({'feedbacks_novos': 0}, synchronize_session=False)
+
+def departamentos_da_pergunta(pergunta):
+    """IDs dos setores que enxergam a pergunta (None = todos os setores)."""
+    if pergunta.para_todos_setores:
+        return None
+    return [d.id for d in pergunta.departamentos]
+
+def _filtrar_por_setores(query, departamento_ids):
+    if departamento_ids is None:
+        return query
+    sq_usuarios = db.session.query(Usuario.id).filter(Usuario.departamento_id.in_(departamento_ids))
+    return query.filter(ContadorPendencias.usuario_id.in_(sq_usuarios))
+
+def registrar_nova_pergunta(pergunta):
+    """Nova pergunta já liberada: soma 1 na pendência dos usuários dos setores alvo."""
+    hoje = _hoje()
+    if pergunta.data_liberacao > hoje:
+        return  # Entra na contagem na virada do dia
+    if pergunta.tipo == 'discursiva':
+        campo = 'atividades_pendentes'
+    elif pergunta.tipo in TIPOS_QUIZ:
+        campo = 'quiz_pendentes'
+    else:
+        return  # Tipo que nem o quiz nem as atividades mostram
+    query = ContadorPendencias.query.filter(ContadorPendencias.data_referencia == hoje)
+    query = _filtrar_por_setores(query, departamentos_da_pergunta(pergunta))
+    query.update({campo: getattr(ContadorPendencias, campo) + 1}, synchronize_session=False)
+
+def invalidar_contadores(departamento_ids=None, usuario_id=None):
+    """Marca contadores para recálculo (por setor, por usuário ou todos)."""
+    query = ContadorPendencias.query
+    if usuario_id is not None:
+        query = query.filter(ContadorPendencias.usuario_id == usuario_id)
+    else:
+        query = _filtrar_por_setores(query, departamento_ids)
+    query.update({'data_referencia': None}, synchronize_session=False)
+
+def recalcular_todos(tamanho_lote=200, progresso=None):
+    """Reconstrói todos os contadores (recuperação de divergências)."""
+    hoje = _hoje()
+    ids = [u_id for (u_id,) in db.session.query(Usuario.id).order_by(Usuario.id)]
+    total = len(ids)
+    processados = 0
+    for usuario_id in ids:
+        recalcular_contador(db.session.get(Usuario, usuario_id), hoje)
+        processados += 1
+        if processados % tamanho_lote == 0:
+            db.session.commit()
+            if progresso: progresso(processados, total)
+    db.session.commit()
+    if progresso: progresso(processados, total)
+    return processados
+
+
+def pendencias_por_usuario(hoje=None, somente_com_email=True):
+    """Pendências (quiz + atividades) de todos os usuários numa única consulta.
+    Devolve [(usuario, qtd)] só de quem tem alguma pendência, em ordem de id.
+    qtd = perguntas liberadas para o setor - perguntas do setor já respondidas; as duas
+    contagens são agrupadas (por setor e por usuário), sem NOT IN com listas de IDs."""
+    hoje = hoje or _hoje()
+    liberadas = db.session.query(
+        PerguntaElegivel.departamento_id,
+        func.count(PerguntaElegivel.pergunta_id).label('total')
+    ).filter(
+        PerguntaElegivel.data_liberacao <= hoje
+    ).group_by(PerguntaElegivel.departamento_id).subquery()
+
+    respondidas = db.session.query(
+        Resposta.usuario_id,
+        func.count(func.distinct(Resposta.pergunta_id)).label('total')
+    ).join(
+        Usuario, Usuario.id == Resposta.usuario_id
+    ).join(
+        PerguntaElegivel, and_(PerguntaElegivel.departamento_id == Usuario.departamento_id,
+                               PerguntaElegivel.pergunta_id == Resposta.pergunta_id)
+    ).filter(
+        PerguntaElegivel.data_liberacao <= hoje
+    ).group_by(Resposta.usuario_id).subquery()
+
+    qtd = liberadas.c.total - func.coalesce(respondidas.c.total, 0)
+    query = db.session.query(Usuario, qtd).join(
+        liberadas, liberadas.c.departamento_id == Usuario.departamento_id
+    ).outerjoin(
+        respondidas, respondidas.c.usuario_id == Usuario.id
+    ).filter(qtd > 0)
+    if somente_com_email:
+        query = query.filter(Usuario.email != None)
+    return query.order_by(Usuario.id).all()
\ No newline at end of file
@@ -0,0 +1,325 @@
+import os
+import random
+import re
+import smtplib
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from markupsafe import Markup, escape
+from sqlalchemy import insert, select, func
+from .extensions import db, mail
+from .models import EmailSaida
+
+# Envio de e-mails por uma caixa de saída no banco (tabela email_saida).
+# Quem manda e-mail só grava as mensagens (enfileirar / enfileirar_varios); o
+# despachante lê a fila com um pool de CORREIO_CONEXOES threads, cada uma com a
+# sua conexão SMTP, e grava o resultado de cada mensagem:
+#   pendente -> enviando -> enviado
+#                        -> pendente de novo (falha temporária, nova tentativa com espera exponencial)
+#                        -> erro (recusa definitiva do servidor ou CORREIO_MAX_TENTATIVAS esgotadas)
+#
+# Limites de envio (por processo): CORREIO_LIMITE_POR_MINUTO no total, que é o
+# limite da conta no provedor SMTP, e CORREIO_LIMITES_POR_DOMINIO para os
+# provedores de quem recebe ('gmail.com=60,hotmail.com=30').
+#
+# Quem despacha: o worker_emails.py (CORREIO_WORKER_EXTERNO=1) ou, se não houver
+# worker, uma thread do próprio processo que esvazia a fila depois de cada
+# enfileiramento. Como tudo fica no banco, um restart não perde mensagens: as que
+# ficaram em 'enviando' voltam para a fila depois de CORREIO_TIMEOUT_MINUTOS (o
+# worker faz isso ao iniciar; sem ele, a thread faz a cada vez que é acordada).
+#
+# Para testar sem mandar e-mail de verdade, um servidor SMTP de depuração local:
+#   python -m aiosmtpd -n -l localhost:1025
+#   MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0 python worker_emails.py --uma-vez
+
+def _config(nome, padrao):
+    return current_app.config.get(nome, padrao)
+
+# --- Enfileiramento ---
+
+def enfileirar_varios(mensagens, tipo=None):
+    """Grava as mensagens na caixa de saída (um INSERT em lote) e acorda o despachante.
+    mensagens: dicts com destinatario, assunto, corpo_texto e (opcional) corpo_html."""
+    agora = datetime.utcnow()
+    linhas = [{
+        'tipo': m.get('tipo', tipo),
+        'destinatario': m['destinatario'],
+        'assunto': m['assunto'][:255],
+        'corpo_texto': m.get('corpo_texto'),
+        'corpo_html': m.get('corpo_html'),
+        'status': 'pendente',
+        'tentativas': 0,
+        'proxima_tentativa': agora,
+        'criado_em': agora,
+    } for m in mensagens if m.get('destinatario')]
+    if not linhas:
+        return 0
+    for inicio in range(0, len(linhas), 1000):
+        db.session.execute(insert(EmailSaida), linhas[inicio:inicio + 1000])
+    db.session.commit()
+    acordar()
+    return len(linhas)
+
+def enfileirar(destinatario, assunto, corpo_texto=None, corpo_html=None, tipo=None):
+    return enfileirar_varios([{'destinatario': destinatario, 'assunto': assunto,
+                               'corpo_texto': corpo_texto, 'corpo_html': corpo_html}], tipo=tipo)
+
+def resumo():
+    """Quantidade de mensagens por status."""
+    return dict(db.session.query(EmailSaida.status, func.count()).group_by(EmailSaida.status).all())
+
+# --- Modelos (templates) de e-mail ---
+
+_MARCADOR = re.compile(r'\x00(\w+)\x00')
+
+class ModeloEmail:
+    """Template de e-mail (app/templates/emails) preparado uma vez por lote.
+    O Jinja renderiza o template uma única vez com as partes comuns a todos (lista de
+    perguntas, link...) e com marcadores no lugar dos campos `por_usuario`; cada
+    mensagem só substitui esses campos (escapados, nos .html). Por isso os campos por
+    usuário só podem ser exibidos no template, não usados em {% if %} ou filtros.
+
+        modelo = ModeloEmail('emails/lembrete.html', ['nome', 'qtd'], link_acesso=link)
+        html = modelo.render(nome=usuario.nome, qtd=3)
+    """
+
+    def __init__(self, nome_template, por_usuario, **compartilhado):
+        template = current_app.jinja_env.get_template(nome_template)
+        marcadores = {campo: Markup(f'\x00{campo}\x00') for campo in por_usuario}
+        self.partes = _MARCADOR.split(template.render(**compartilhado, **marcadores))
+        self.escapar = nome_template.endswith('.html')
+
+    def render(self, **valores):
+        partes = self.partes[:]
+        for i in range(1, len(partes), 2):  # posições ímpares = nomes dos campos
+            valor = valores[partes[i]]
+            partes[i] = escape(valor) if self.escapar else str(valor)
+        return ''.join(partes)
+
+# --- Limite de envio ---
+
+class _Limitador:
+    """Balde de fichas: até `por_minuto` envios por minuto, compartilhado entre as threads."""
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60.0 / por_minuto
+        self.capacidade = max(1.0, por_minuto / 10)  # permite rajadas curtas
+        self.fichas = self.capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) / self.intervalo)
+                self.ultimo = agora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) * self.intervalo
+            time.sleep(espera)
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+def _limites_por_dominio(config):
+    limites = config.get('CORREIO_LIMITES_POR_DOMINIO') or ''
+    if isinstance(limites, dict):
+        return limites
+    pares = (item.split('=', 1) for item in limites.split(',') if '=' in item)
+    return {dominio.strip().lower(): int(valor) for dominio, valor in pares}
+
+def _limitador(chave, por_minuto):
+    with _limitadores_lock:
+        limitador = _limitadores.get(chave)
+        if limitador is None:
+            limitador = _limitadores[chave] = _Limitador(por_minuto)
+        return limitador
+
+def _aguardar_vez(config, destinatario):
+    total = config.get('CORREIO_LIMITE_POR_MINUTO')
+    if total:
+        _limitador(('smtp', config.get('MAIL_SERVER')), total).aguardar()
+    dominio = destinatario.rsplit('@', 1)[-1].lower()
+    por_dominio = _limites_por_dominio(config).get(dominio)
+    if por_dominio:
+        _limitador(('dominio', dominio), por_dominio).aguardar()
+
+# --- Lado do despachante ---
+
+def identificador_worker():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def reservar_lote(worker, tamanho):
+    """Reserva até `tamanho` mensagens prontas para envio. O UPDATE é condicional
+    (status = 'pendente'), então duas threads/workers nunca pegam a mesma mensagem."""
+    agora = datetime.utcnow()
+    candidatas = db.session.execute(
+        select(EmailSaida.id).where(EmailSaida.status == 'pendente', EmailSaida.proxima_tentativa <= agora)
+        .order_by(EmailSaida.proxima_tentativa, EmailSaida.id).limit(tamanho)
+    ).scalars().all()
+    if not candidatas:
+        return []
+    EmailSaida.query.filter(EmailSaida.id.in_(candidatas), EmailSaida.status == 'pendente').update(
+        {'status': 'enviando', 'worker': worker, 'reservado_em': agora}, synchronize_session=False
+    )
+    db.session.commit()
+    return EmailSaida.query.filter(
+        EmailSaida.id.in_(candidatas), EmailSaida.status == 'enviando', EmailSaida.worker == worker
+    ).order_by(EmailSaida.id).all()
+
+def _espera_da_tentativa(tentativas):
+    base = _config('CORREIO_BACKOFF_SEGUNDOS', 30)
+    espera = min(base * 2 ** (tentativas - 1), _config('CORREIO_BACKOFF_MAXIMO_SEGUNDOS', 3600))
+    return espera * random.uniform(1.0, 1.2)  # espalha as novas tentativas
+
+def _falha_definitiva(erro):
+    # Respostas 5xx do SMTP (destinatário inexistente, remetente recusado...) não adiantam repetir
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        return all(codigo >= 500 for codigo, _ in erro.recipients.values())
+    if isinstance(erro, smtplib.SMTPResponseException):
+        return erro.smtp_code >= 500
+    return False
+
+def _conexao_perdida(erro):
+    # smtplib.SMTPException também é OSError; aqui só interessam queda de conexão e rede
+    if isinstance(erro, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(erro, OSError) and not isinstance(erro, smtplib.SMTPException)
+
+def _registrar_falha(mensagem, erro):
+    mensagem.tentativas += 1
+    mensagem.ultimo_erro = f"{type(erro).__name__}: {erro}"[:1000]
+    mensagem.worker = None
+    if _falha_definitiva(erro) or mensagem.tentativas >= _config('CORREIO_MAX_TENTATIVAS', 5):
+        mensagem.status = 'erro'
+    else:
+        mensagem.status = 'pendente'
+        mensagem.proxima_tentativa = datetime.utcnow() + timedelta(seconds=_espera_da_tentativa(mensagem.tentativas))
+
+def _para_mensagem(mensagem):
+    msg = Message(subject=mensagem.assunto, recipients=[mensagem.destinatario])
+    msg.body = mensagem.corpo_texto
+    if mensagem.corpo_html:
+        msg.html = mensagem.corpo_html
+    return msg
+
+def enviar_lote(mensagens):
+    """Envia as mensagens reservadas numa única conexão SMTP. Retorna (enviadas, falhas)."""
+    config = current_app.config
+    enviadas = falhas = 0
+    pendentes = list(mensagens)
+    try:
+        with mail.connect() as conn:
+            while pendentes:
+                mensagem = pendentes[0]
+                _aguardar_vez(config, mensagem.destinatario)
+                try:
+                    conn.send(_para_mensagem(mensagem))
+                    mensagem.status = 'enviado'
+                    mensagem.tentativas += 1
+                    mensagem.enviado_em = datetime.utcnow()
+                    mensagem.ultimo_erro = None
+                    enviadas += 1
+                except Exception as e:
+                    if _conexao_perdida(e):
+                        raise  # o resto do lote volta para a fila
+                    _registrar_falha(mensagem, e)
+                    falhas += 1
+                pendentes.pop(0)
+                db.session.commit()  # status gravado a cada mensagem: um restart não reenvia as que já foram
+    except Exception as e:
+        for mensagem in pendentes:
+            _registrar_falha(mensagem, e)
+        falhas += len(pendentes)
+        db.session.commit()
+    return enviadas, falhas
+
+def _ha_pendentes():
+    return db.session.execute(
+        select(func.min(EmailSaida.proxima_tentativa)).where(EmailSaida.status == 'pendente')
+    ).scalar()
+
+def _trabalhador(app, continuo, intervalo, totais, lock):
+    with app.app_context():
+        worker = identificador_worker()
+        tamanho = app.config.get('CORREIO_LOTE', 20)
+        try:
+            while True:
+                lote = reservar_lote(worker, tamanho)
+                if lote:
+                    enviadas, falhas = enviar_lote(lote)
+                    with lock:
+                        totais['enviadas'] += enviadas
+                        totais['falhas'] += falhas
+                    continue
+
+                proxima = _ha_pendentes()
+                db.session.remove()
+                if proxima is None and not continuo:
+                    return
+                # Dorme até a próxima tentativa agendada (ou o intervalo normal de consulta)
+                espera = intervalo if proxima is None else (proxima - datetime.utcnow()).total_seconds()
+                time.sleep(min(max(espera, 0.2), intervalo))
+        finally:
+            db.session.remove()
+
+def processar_fila(app, conexoes=None, continuo=False, intervalo=5):
+    """Roda o pool de envio. continuo=False: sai quando não houver mais nada pendente
+    (inclusive novas tentativas agendadas). Retorna {'enviadas': n, 'falhas': n}."""
+    conexoes = conexoes or app.config.get('CORREIO_CONEXOES', 3)
+    totais, lock = {'enviadas': 0, 'falhas': 0}, threading.Lock()
+    threads = [threading.Thread(target=_trabalhador, args=(app, continuo, intervalo, totais, lock),
+                                name=f'correio-{i}') for i in range(conexoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return totais
+
+_despachante = None
+_despachante_lock = threading.Lock()
+
+def acordar():
+    """Sem worker externo, esvazia a fila numa thread deste processo (uma por vez)."""
+    global _despachante
+    app = current_app._get_current_object()
+    if app.config.get('CORREIO_WORKER_EXTERNO'):
+        return
+    with _despachante_lock:
+        if _despachante is not None and _despachante.is_alive():
+            return  # o pool que já está rodando pega as mensagens novas
+        _despachante = threading.Thread(target=_despachar_no_processo, args=(app,), name='correio')
+        _despachante.start()
+
+def _despachar_no_processo(app):
+    # Sem o worker_emails.py, a limpeza que ele faz ao iniciar roda aqui
+    with app.app_context():
+        try:
+            recuperar_travadas()
+            expirar()
+        finally:
+            db.session.remove()
+    processar_fila(app, intervalo=2)
+
+def recuperar_travadas():
+    """Mensagens 'enviando' há mais de CORREIO_TIMEOUT_MINUTOS (worker morreu) voltam para a fila."""
+    limite = datetime.utcnow() - timedelta(minutes=_config('CORREIO_TIMEOUT_MINUTOS', 10))
+    total = EmailSaida.query.filter(
+        EmailSaida.status == 'enviando', EmailSaida.reservado_em < limite
+    ).update({'status': 'pendente', 'worker': None}, synchronize_session=False)
+    db.session.commit()
+    return total
+
+def expirar():
+    """Apaga mensagens enviadas há mais de CORREIO_EXPIRA_DIAS (as com erro ficam para consulta)."""
+    limite = datetime.utcnow() - timedelta(days=_config('CORREIO_EXPIRA_DIAS', 30))
+    total = EmailSaida.query.filter(
+        EmailSaida.status == 'enviado', EmailSaida.enviado_em < limite
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return total
\ No newline at end of file
@@ -0,0 +1,80 @@
+import math
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from .extensions import db
+from .cache import CacheTTL
+from .models import PerguntaEmitida, Resposta
+
+# Cronômetro do quiz do lado do servidor.
+# Quando /quiz mostra uma pergunta, o momento fica registrado (pergunta_emitida); na
+# resposta, a pontuação sai do tempo que passou no relógio do servidor contra o
+# Pergunta.tempo_limite, e não do tempo_restante que o navegador mandava (editável).
+# Recarregar a página não zera o relógio: vale a primeira vez que a pergunta apareceu.
+#
+# O início fica num CacheTTL do worker (a resposta costuma chegar ao mesmo processo
+# segundos depois) e no banco, para quando ela cair em outro worker ou após um restart.
+# Resposta sem início registrado (página aberta antes do deploy, banco restaurado, POST
+# que não veio do /quiz) não é gravada: o relógio começa naquele momento e a pergunta
+# é mostrada de novo. Os registros antigos que o manutencao.py cronometro apaga são
+# só os de perguntas já respondidas, para não reiniciar o relógio das abertas.
+
+TEMPO_PADRAO = 30  # segundos, para pergunta sem tempo_limite (o mesmo do quiz.html)
+
+_INSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+_inicios = CacheTTL(ttl_segundos=3600, max_itens=20000)
+
+def _config(nome, padrao):
+    return current_app.config.get(nome, padrao)
+
+def tempo_limite(pergunta):
+    return pergunta.tempo_limite or TEMPO_PADRAO
+
+def emitir(usuario_id, pergunta):
+    """Marca o início do cronômetro da pergunta para o usuário, se ainda não marcado.
+    Retorna os segundos inteiros que restam (o que o timer da página deve mostrar)."""
+    chave = (usuario_id, pergunta.id)
+    inicio = _inicios.obter(chave)
+    if inicio is None:
+        # Um comando só: grava agora ou devolve o início já gravado (recarga da página)
+        tabela = PerguntaEmitida.__table__
+        comando = _INSERT[db.engine.dialect.name](tabela).values(
+            usuario_id=usuario_id, pergunta_id=pergunta.id, emitida_em=datetime.utcnow()
+        ).on_conflict_do_update(
+            index_elements=['usuario_id', 'pergunta_id'], set_={'emitida_em': tabela.c.emitida_em}
+        ).returning(tabela.c.emitida_em)
+        inicio = db.session.execute(comando).scalar()
+        db.session.commit()
+        _inicios.definir(chave, inicio, ttl=_config('CRONOMETRO_TTL', 3600))
+    decorrido = (datetime.utcnow() - inicio).total_seconds()
+    return max(0, math.ceil(tempo_limite(pergunta) - decorrido))
+
+def tempo_restante(usuario_id, pergunta):
+    """Segundos que sobravam no relógio do servidor ao responder, já descontada a
+    tolerância de rede (negativo = tempo esgotado). None se a pergunta não foi emitida."""
+    chave = (usuario_id, pergunta.id)
+    inicio = _inicios.obter(chave)
+    if inicio is None:
+        inicio = db.session.query(PerguntaEmitida.emitida_em).filter_by(
+            usuario_id=usuario_id, pergunta_id=pergunta.id
+        ).scalar()
+    if inicio is None:
+        return None
+    decorrido = (datetime.utcnow() - inicio).total_seconds() - _config('CRONOMETRO_TOLERANCIA', 2)
+    return tempo_limite(pergunta) - max(0.0, decorrido)
+
+def concluir(usuario_id, pergunta_id):
+    """Pergunta respondida: o início não é mais necessário na memória deste worker."""
+    _inicios.remover((usuario_id, pergunta_id))
+
+def expirar():
+    """Apaga os inícios com mais de CRONOMETRO_EXPIRA_HORAS de perguntas já respondidas.
+    Os de perguntas ainda sem resposta ficam: sem eles a resposta seria aceita sem
+    cronômetro. Retorna quantos foram apagados."""
+    limite = datetime.utcnow() - timedelta(hours=_config('CRONOMETRO_EXPIRA_HORAS', 24))
+    respondida = db.session.query(Resposta.id).filter(
+        Resposta.usuario_id == PerguntaEmitida.usuario_id, Resposta.pergunta_id == PerguntaEmitida.pergunta_id
+    ).exists()
+    total = PerguntaEmitida.query.filter(PerguntaEmitida.emitida_em < limite, respondida).delete(synchronize_session=False)
+    db.session.commit()
+    return total
\ No newline at end of file
@@ -0,0 +1,98 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+from .extensions import db
+from .models import PerguntaElegivel, Pergunta, Departamento
+from .categorias import filtro_id
+
+# Índice de elegibilidade (setor -> perguntas visíveis).
+# Substitui o filtro or_(para_todos_setores, departamentos.any(...)) que virava um
+# EXISTS correlacionado em todas as telas do usuário. Precisa ser mantido em dia
+# sempre que uma pergunta é criada, editada, importada ou excluída, e quando um setor
+# é criado/excluído (por causa das perguntas "para todos").
+
+TIPOS_QUIZ = ['multipla_escolha', 'verdadeiro_falso']
+
+def _linhas_da_pergunta(pergunta, todos_setores_ids):
+    setores = todos_setores_ids if pergunta.para_todos_setores else [d.id for d in pergunta.departamentos]
+    return [{
+        'departamento_id': departamento_id,
+        'pergunta_id': pergunta.id,
+        'tipo': pergunta.tipo,
+        'categoria_id': pergunta.categoria_id,
+        'data_liberacao': pergunta.data_liberacao
+    } for departamento_id in setores]
+
+def _ids_setores():
+    return [d_id for (d_id,) in db.session.query(Departamento.id)]
+
+def sincronizar_pergunta(pergunta):
+    """Regrava as linhas de uma pergunta (criação/edição). Não faz commit."""
+    db.session.flush()
+    remover_pergunta(pergunta.id)
+    linhas = _linhas_da_pergunta(pergunta, _ids_setores() if pergunta.para_todos_setores else [])
+    if linhas:
+        db.session.execute(insert(PerguntaElegivel), linhas)
+
+def sincronizar_perguntas(perguntas):
+    """Versão em lote (importação): um DELETE e um INSERT para todas as perguntas."""
+    perguntas = list(perguntas)
+    if not perguntas:
+        return
+    db.session.flush()
+    PerguntaElegivel.query.filter(
+        PerguntaElegivel.pergunta_id.in_([p.id for p in perguntas])
+    ).delete(synchronize_session=False)
+    todos = _ids_setores()
+    linhas = [linha for p in perguntas for linha in _linhas_da_pergunta(p, todos)]
+    if linhas:
+        db.session.execute(insert(PerguntaElegivel), linhas)
+
+def remover_pergunta(pergunta_id):
+    PerguntaElegivel.query.filter_by(pergunta_id=pergunta_id).delete(synchronize_session=False)
+
+def adicionar_departamento(departamento):
+    """Setor novo passa a enxergar todas as perguntas 'para todos'."""
+    db.session.flush()
+    perguntas = Pergunta.query.filter(Pergunta.para_todos_setores == True).all()
+    linhas = [linha for p in perguntas for linha in _linhas_da_pergunta(p, [departamento.id])]
+    if linhas:
+        db.session.execute(insert(PerguntaElegivel), linhas)
+
+def remover_departamento(departamento_id):
+    PerguntaElegivel.query.filter_by(departamento_id=departamento_id).delete(synchronize_session=False)
+
+def filtros_elegiveis(departamento_id, origem, hoje, categoria=None):
+    """Condições sobre PerguntaElegivel para as telas do usuário.
+    origem: 'quiz' (múltipla escolha e V/F) ou 'atividades' (discursivas)."""
+    filtros = [
+        PerguntaElegivel.departamento_id == departamento_id,
+        PerguntaElegivel.tipo == 'discursiva' if origem == 'atividades' else PerguntaElegivel.tipo.in_(TIPOS_QUIZ),
+        PerguntaElegivel.data_liberacao <= hoje
+    ]
+    if categoria:
+        filtros.append(PerguntaElegivel.categoria_id == filtro_id(categoria))
+    return filtros
+
+def perguntas_elegiveis(departamento_id, origem, hoje, categoria=None):
+    """Query de Pergunta já restrita ao que o setor pode ver."""
+    return Pergunta.query.join(PerguntaElegivel, PerguntaElegivel.pergunta_id == Pergunta.id).filter(
+        *filtros_elegiveis(departamento_id, origem, hoje, categoria)
+    )
+
+def reconstruir(tamanho_lote=500, progresso=None):
+    """Apaga e recria o índice inteiro a partir de Pergunta/pergunta_departamento."""
+    PerguntaElegivel.query.delete(synchronize_session=False)
+    todos = _ids_setores()
+    ids = [p_id for (p_id,) in db.session.query(Pergunta.id).order_by(Pergunta.id)]
+    total = 0
+    for inicio in range(0, len(ids), tamanho_lote):
+        lote = Pergunta.query.options(selectinload(Pergunta.departamentos)).filter(
+            Pergunta.id.in_(ids[inicio:inicio + tamanho_lote])
+        ).all()
+        linhas = [linha for p in lote for linha in _linhas_da_pergunta(p, todos)]
+        if linhas:
+            db.session.execute(insert(PerguntaElegivel), linhas)
+        total += len(linhas)
+        db.session.commit()
+        if progresso: progresso(min(inicio + tamanho_lote, len(ids)), len(ids))
+    return total
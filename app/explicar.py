@@ -0,0 +1,61 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import event, inspect, text
+from .extensions import db
+
+# Conferência de índices com EXPLAIN.
+# Captura os SELECTs que uma rota executa de verdade (com os parâmetros) e pede o
+# plano de cada um ao banco. Varredura completa de uma tabela grande (SQLite: "SCAN
+# tabela" sem índice; PostgreSQL: "Seq Scan on tabela") vira um aviso com a consulta.
+# Usado por `python manutencao.py indices` contra um banco semeado (benchmark_carga.py).
+
+_SCAN_SQLITE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+_SCAN_POSTGRES = re.compile(r'Seq Scan on (\w+)')
+
+@contextmanager
+def capturar_consultas():
+    """Guarda (sql, parâmetros) de cada SELECT executado dentro do bloco."""
+    consultas = []
+
+    def _guardar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')) and not executemany:
+            consultas.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _guardar)
+    try:
+        yield consultas
+    finally:
+        event.remove(engine, 'before_cursor_execute', _guardar)
+
+def plano(statement, parameters):
+    """Linhas do plano de execução da consulta, como texto."""
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            return [linha[-1] for linha in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+        return [linha[0] for linha in conn.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+
+def _tabela(nome, tabelas):
+    # Apelidos do SQLAlchemy: resposta_1 -> resposta
+    if nome in tabelas:
+        return nome
+    base = re.sub(r'_\d+$', '', nome)
+    return base if base in tabelas else None
+
+def tamanhos_das_tabelas():
+    with db.engine.connect() as conn:
+        return {nome: conn.execute(text(f'SELECT COUNT(*) FROM {nome}')).scalar()
+                for nome in inspect(conn).get_table_names()}
+
+def varreduras_completas(linhas_plano, tamanhos, min_linhas=1000):
+    """[(tabela, linha do plano)] das varreduras completas em tabelas com >= min_linhas."""
+    achadas = []
+    for linha in linhas_plano:
+        linha = linha.strip()
+        encontrada = _SCAN_SQLITE.match(linha) or _SCAN_POSTGRES.search(linha)
+        if not encontrada:
+            continue
+        tabela = _tabela(encontrada.group(1), tamanhos)
+        if tabela and tamanhos[tabela] >= min_linhas:
+            achadas.append((tabela, linha))
+    return achadas
\ No newline at end of file
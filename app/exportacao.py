@@ -0,0 +1,144 @@
+import csv
+import io
+import tempfile
+from datetime import timedelta
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, or_, exists, func
+from openpyxl import Workbook
+from .extensions import db
+from .models import Resposta, Usuario, Departamento, Pergunta
+from .utils import _gerar_dados_relatorio
+
+# Exportação do relatório detalhado de respostas em streaming.
+# A consulta seleciona só as colunas usadas (com os joins feitos no banco, sem
+# carregar objetos nem disparar lazy loads) e é lida em blocos com yield_per, que
+# no PostgreSQL/MySQL usa cursor do lado do servidor. As linhas vão direto para um
+# CSV transmitido na resposta ou para um workbook write-only do openpyxl gravado
+# em arquivo temporário, então a memória não cresce com o número de respostas.
+
+COLUNAS_DETALHADO = ['Colaborador', 'Setor', 'Data da Resposta', 'Pergunta', 'Tipo de Pergunta',
+                     'Resposta Dada', 'Resposta Correta', 'Status/Resultado', 'Pontos', 'Feedback do Admin']
+
+def _filtros_detalhado(departamento_id=None, usuario_id=None, filtro_tipo='todos', filtro_acertos='erros'):
+    filtros = []
+    if departamento_id: filtros.append(Usuario.departamento_id == departamento_id)
+    if usuario_id: filtros.append(Resposta.usuario_id == usuario_id)
+    if filtro_tipo and filtro_tipo != 'todos':
+        filtros.append(Pergunta.tipo == filtro_tipo)
+    if filtro_acertos == 'acertos':
+        filtros.append(or_(Resposta.pontos > 0, Resposta.status_correcao.in_(['correto', 'parcialmente_correto'])))
+    elif filtro_acertos == 'erros':
+        filtros.append(or_(Resposta.pontos == 0, Resposta.status_correcao == 'incorreto'))
+    return filtros
+
+def _consulta_detalhado(filtros):
+    return select(
+        Usuario.nome.label('usuario_nome'), Departamento.nome.label('setor_nome'),
+        Resposta.data_resposta, Resposta.resposta_dada, Resposta.texto_discursivo,
+        Resposta.status_correcao, Resposta.pontos, Resposta.feedback_admin,
+        Pergunta.texto, Pergunta.tipo, Pergunta.resposta_correta,
+        Pergunta.opcao_a, Pergunta.opcao_b, Pergunta.opcao_c, Pergunta.opcao_d
+    ).select_from(Resposta).join(Usuario, Resposta.usuario_id == Usuario.id)\
+     .join(Departamento, Usuario.departamento_id == Departamento.id)\
+     .join(Pergunta, Resposta.pergunta_id == Pergunta.id)\
+     .where(*filtros).order_by(Departamento.nome, Usuario.nome, Resposta.data_resposta)
+
+def _texto_da_opcao(row, opcao):
+    # Mesma regra do get_texto_da_opcao, mas sobre a linha da consulta
+    if opcao in ('a', 'b', 'c', 'd'): return getattr(row, f'opcao_{opcao}')
+    if opcao == 'v': return "Verdadeiro"
+    if opcao == 'f': return "Falso"
+    return ""
+
+def _linha_detalhado(row):
+    if row.tipo == 'discursiva':
+        resposta_dada = row.texto_discursivo
+        resposta_correta = '(Avaliação Manual)'
+        status = row.status_correcao
+    else:
+        resposta_dada = _texto_da_opcao(row, row.resposta_dada)
+        resposta_correta = _texto_da_opcao(row, row.resposta_correta)
+        status = "Correto" if (row.pontos or 0) > 0 else "Incorreto"
+    return [
+        row.usuario_nome,
+        row.setor_nome,
+        (row.data_resposta - timedelta(hours=3)).strftime('%d/%m/%Y %H:%M'),
+        row.texto,
+        row.tipo,
+        resposta_dada,
+        resposta_correta,
+        status,
+        row.pontos or 0,
+        row.feedback_admin or ''
+    ]
+
+def _consulta_respostas(filtros):
+    return select(Resposta.id).join(Usuario, Resposta.usuario_id == Usuario.id)\
+        .join(Pergunta, Resposta.pergunta_id == Pergunta.id).where(*filtros)
+
+def existem_respostas(**filtros):
+    """Checagem barata antes de começar a gerar o arquivo."""
+    return db.session.execute(select(exists(_consulta_respostas(_filtros_detalhado(**filtros))))).scalar()
+
+def contar_respostas(**filtros):
+    """Total de linhas do relatório detalhado (para o progresso das tarefas)."""
+    return db.session.execute(select(func.count()).select_from(_consulta_respostas(_filtros_detalhado(**filtros)).subquery())).scalar()
+
+def linhas_detalhado(tamanho_lote=None, progresso=None, **filtros):
+    """Gera as linhas do relatório detalhado, lendo o banco em blocos.
+    progresso(linhas_lidas) é chamado ao fim de cada bloco, se informado."""
+    tamanho_lote = tamanho_lote or current_app.config.get('EXPORTACAO_TAMANHO_LOTE', 2000)
+    resultado = db.session.execute(
+        _consulta_detalhado(_filtros_detalhado(**filtros)).execution_options(yield_per=tamanho_lote)
+    )
+    try:
+        for i, row in enumerate(resultado, start=1):
+            yield _linha_detalhado(row)
+            if progresso and i % tamanho_lote == 0:
+                progresso(i)
+    finally:
+        resultado.close()
+
+def gerar_csv_detalhado(progresso=None, **filtros):
+    """Gerador de pedaços (bytes) do CSV, para resposta em streaming."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')  # BOM para o Excel reconhecer UTF-8
+    writer.writerow(COLUNAS_DETALHADO)
+    for i, linha in enumerate(linhas_detalhado(progresso=progresso, **filtros), start=1):
+        writer.writerow(linha)
+        if i % 500 == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def gerar_xlsx_detalhado(destino=None, progresso=None, **filtros):
+    """Grava o XLSX em um workbook write-only (as linhas vão para disco, não para a
+    memória). Retorna o arquivo (temporário, se `destino` não for informado) já no início."""
+    destino = destino or tempfile.TemporaryFile()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Relatorio_Completo')
+    ws.append(COLUNAS_DETALHADO)
+    for linha in linhas_detalhado(progresso=progresso, **filtros):
+        ws.append(linha)
+    wb.save(destino)
+    destino.seek(0)
+    return destino
+
+def gerar_xlsx_desempenho(departamento_id=None, destino=None):
+    """Relatório de desempenho (uma linha por colaborador). Retorna o arquivo ou None se vazio."""
+    dados_relatorio = _gerar_dados_relatorio(departamento_id)
+    if not dados_relatorio:
+        return None
+
+    df = pd.DataFrame(dados_relatorio)
+    df = df.rename(columns={'nome': 'Colaborador', 'setor': 'Setor', 'total_respostas': 'Respostas Totais', 'respostas_corretas': 'Respostas Corretas', 'aproveitamento': 'Aproveitamento (%)', 'pontuacao_total': 'Pontuação Total'})
+    df['Aproveitamento (%)'] = df['Aproveitamento (%)'].map('{:.1f}%'.format)
+
+    destino = destino or io.BytesIO()
+    with pd.ExcelWriter(destino, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Relatorio de Desempenho')
+    destino.seek(0)
+    return destino
\ No newline at end of file
@@ -0,0 +1,109 @@
+from collections import deque
+from threading import Lock
+from flask import current_app
+from .extensions import db
+from .cache import CacheTTL
+from .models import Usuario, Pergunta, Resposta, PerguntaElegivel
+from .elegibilidade import filtros_elegiveis, perguntas_elegiveis
+from .categorias import chave_categoria
+
+# Fila de próximas perguntas do quiz, por usuário e por categoria.
+# Montada sob demanda no primeiro acesso (uma consulta com o anti-join), depois
+# cada "próxima pergunta" é só olhar o início da fila. Responder remove o ID da
+# fila; publicar/editar/excluir pergunta invalida todas as filas deste worker.
+# Filas de outros workers expiram pelo TTL (FILA_QUIZ_TTL) e nunca guardam o "acabou"
+# (fila vazia é remontada do banco a cada acesso), e toda pergunta servida
+# é conferida de novo (ainda existe, liberada, elegível para o setor e sem Resposta),
+# então uma fila defasada nunca repete pergunta nem mostra uma que saiu do ar.
+
+_filas = CacheTTL(ttl_segundos=300, max_itens=5000)
+_lock = Lock()
+
+class _Fila:
+    def __init__(self, ids, completa, departamento_id):
+        self.ids = deque(ids)
+        self.completa = completa  # False = a consulta foi truncada, pode haver mais
+        self.departamento_id = departamento_id
+
+def _config(nome, padrao):
+    return current_app.config.get(nome, padrao)
+
+def _montar_fila(usuario_id, categoria, hoje):
+    usuario = db.session.get(Usuario, usuario_id)
+    limite = _config('FILA_QUIZ_TAMANHO', 100)
+    sq_respondidas = db.session.query(Resposta.pergunta_id).filter(Resposta.usuario_id == usuario_id)
+
+    ids = [p_id for (p_id,) in db.session.query(PerguntaElegivel.pergunta_id).filter(
+        *filtros_elegiveis(usuario.departamento_id, 'quiz', hoje, categoria),
+        ~PerguntaElegivel.pergunta_id.in_(sq_respondidas)
+    ).order_by(PerguntaElegivel.data_liberacao, PerguntaElegivel.pergunta_id).limit(limite + 1)]
+
+    return _Fila(ids[:limite], completa=len(ids) <= limite, departamento_id=usuario.departamento_id)
+
+def _filas_do_usuario(usuario_id):
+    filas = _filas.obter(usuario_id)
+    if filas is None:
+        filas = {}
+        _filas.definir(usuario_id, filas, ttl=_config('FILA_QUIZ_TTL', 300))
+    return filas
+
+def proxima_pergunta(usuario_id, categoria, hoje):
+    """Retorna a próxima Pergunta do quiz para o usuário (ou None se acabou)."""
+    chave = (chave_categoria(categoria) if categoria else None, hoje)
+
+    while True:
+        with _lock:
+            filas = _filas_do_usuario(usuario_id)
+            fila = filas.get(chave)
+        montada_agora = fila is None
+        if montada_agora:
+            fila = _montar_fila(usuario_id, categoria, hoje)
+            with _lock:
+                filas[chave] = fila
+
+        while fila.ids:
+            pergunta_id = fila.ids[0]
+            # Uma consulta: a pergunta pode ter sido excluída, adiada, trocada de setor,
+            # tipo ou categoria, ou respondida em outro worker depois de a fila ser montada
+            pergunta = perguntas_elegiveis(fila.departamento_id, 'quiz', hoje, categoria).filter(
+                Pergunta.id == pergunta_id,
+                ~Resposta.query.filter_by(usuario_id=usuario_id, pergunta_id=pergunta_id).exists()
+            ).first()
+            if pergunta:
+                return pergunta
+            _descartar(fila, pergunta_id)
+
+        # Fila vazia não fica no cache: uma pergunta publicada ou editada por outro worker
+        # (que só limpa as filas dele) apareceria só depois do TTL. Uma fila que esvaziou
+        # é remontada na hora; se acabou de ser montada e está completa, acabou mesmo.
+        with _lock:
+            filas.pop(chave, None)
+        if fila.completa and montada_agora:
+            return None
+
+def _descartar(fila, pergunta_id):
+    with _lock:
+        try:
+            fila.ids.remove(pergunta_id)
+        except ValueError:
+            pass
+
+def registrar_resposta(usuario_id, pergunta_id):
+    """Tira a pergunta respondida de todas as filas do usuário (geral e por categoria)."""
+    filas = _filas.obter(usuario_id)
+    if not filas:
+        return
+    for fila in list(filas.values()):
+        if fila.ids and fila.ids[0] == pergunta_id:
+            with _lock:
+                if fila.ids and fila.ids[0] == pergunta_id:
+                    fila.ids.popleft()
+        else:
+            _descartar(fila, pergunta_id)
+
+def invalidar_usuario(usuario_id):
+    _filas.remover(usuario_id)
+
+def invalidar():
+    """Pergunta publicada/editada/excluída: descarta todas as filas deste worker."""
+    _filas.limpar()
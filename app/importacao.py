@@ -0,0 +1,319 @@
+import csv
+import io
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+import pandas as pd
+from flask import current_app
+from sqlalchemy import insert
+from .extensions import db
+from .models import Pergunta, Departamento, PerguntaElegivel, ImportacaoPlanilha, LinhaImportacao, pergunta_departamento_association
+from . import categorias
+from .utils import validar_linha, validar_lote
+
+# Importação em massa de perguntas (planilha/CSV já validada no preview).
+# Em vez de um commit por linha: resolve todos os setores numa consulta só,
+# insere as perguntas em lote (INSERT ... RETURNING), grava a associação com
+# setores e o índice de elegibilidade com executemany e faz commit a cada
+# IMPORTACAO_TAMANHO_LOTE linhas. Se um lote falhar, ele é refeito linha a linha
+# (com savepoint) para que só as linhas problemáticas sejam contadas como erro.
+
+def _nomes_setores(row):
+    campo_setor = (row.get('setor') or '').strip()
+    if not campo_setor or campo_setor.lower() == 'todos':
+        return None  # Para todos os setores
+    return [s.strip() for s in campo_setor.split(',') if s.strip()]
+
+def _montar_pergunta(row):
+    return {
+        'tipo': row['tipo'],
+        'texto': row['texto'],
+        'explicacao': row.get('explicacao'),
+        'opcao_a': row.get('opcao_a') or None,
+        'opcao_b': row.get('opcao_b') or None,
+        'opcao_c': row.get('opcao_c') or None,
+        'opcao_d': row.get('opcao_d') or None,
+        'resposta_correta': row.get('resposta_correta') or None,
+        'data_liberacao': datetime.strptime(row['data_liberacao'], '%d/%m/%Y').date(),
+        'tempo_limite': int(float(row['tempo_limite'])) if row.get('tempo_limite') else None,
+        'categoria': row.get('categoria') or 'Geral',
+        'para_todos_setores': _nomes_setores(row) is None,
+    }
+
+def _gravar_lote(itens, setores_por_nome, todos_setores):
+    """Grava um lote: perguntas, associação com setores e índice de elegibilidade."""
+    ids = db.session.execute(
+        insert(Pergunta).returning(Pergunta.id, sort_by_parameter_order=True),
+        [valores for valores, _ in itens]
+    ).scalars().all()
+
+    associacoes = []
+    elegiveis = []
+    for pergunta_id, (valores, nomes) in zip(ids, itens):
+        if nomes is None:
+            setores = todos_setores
+        else:
+            setores = sorted({setores_por_nome[n] for n in nomes if n in setores_por_nome})
+            associacoes.extend({'pergunta_id': pergunta_id, 'departamento_id': d} for d in setores)
+        elegiveis.extend({
+            'departamento_id': d,
+            'pergunta_id': pergunta_id,
+            'tipo': valores['tipo'],
+            'categoria_id': valores['categoria_id'],
+            'data_liberacao': valores['data_liberacao']
+        } for d in setores)
+
+    if associacoes:
+        db.session.execute(pergunta_departamento_association.insert(), associacoes)
+    if elegiveis:
+        db.session.execute(insert(PerguntaElegivel), elegiveis)
+    return len(ids)
+
+def importar_linhas(linhas, tamanho_lote=None):
+    """Importa as linhas (dicts da planilha). Retorna (sucessos, erros)."""
+    tamanho_lote = tamanho_lote or current_app.config.get('IMPORTACAO_TAMANHO_LOTE', 500)
+    success_count = 0
+    error_count = 0
+
+    # 1. Valida (em lote) e converte; linhas inválidas já contam como erro
+    linhas = list(linhas)
+    validas, _ = validar_lote(pd.DataFrame(linhas)) if linhas else ([], [])
+    itens = []
+    for row, is_valid in zip(linhas, validas):
+        if not is_valid:
+            error_count += 1
+            continue
+        try:
+            itens.append((_montar_pergunta(row), _nomes_setores(row)))
+        except (ValueError, TypeError, KeyError):
+            error_count += 1
+
+    # 2. Resolve todos os setores citados de uma vez
+    todos_nomes = {n for _, nomes in itens if nomes for n in nomes}
+    setores_por_nome = {}
+    if todos_nomes:
+        setores_por_nome = dict(db.session.query(Departamento.nome, Departamento.id).filter(Departamento.nome.in_(todos_nomes)))
+    todos_setores = [d_id for (d_id,) in db.session.query(Departamento.id)]
+
+    # ... e todas as categorias (as novas são criadas e gravadas antes dos lotes)
+    categoria_ids = categorias.ids_por_nome([valores['categoria'] for valores, _ in itens])
+    db.session.commit()
+    for valores, _ in itens:
+        valores['categoria_id'] = categoria_ids[valores.pop('categoria')]
+
+    # 3. Grava em lotes, com commit por lote
+    for inicio in range(0, len(itens), tamanho_lote):
+        lote = itens[inicio:inicio + tamanho_lote]
+        try:
+            success_count += _gravar_lote(lote, setores_por_nome, todos_setores)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Refaz o lote linha a linha para isolar as que falham
+            for item in lote:
+                try:
+                    with db.session.begin_nested():
+                        _gravar_lote([item], setores_por_nome, todos_setores)
+                    success_count += 1
+                except Exception:
+                    error_count += 1
+            db.session.commit()
+
+    return success_count, error_count
+
+
+# --- Staging das planilhas no servidor ---
+# O upload grava as linhas validadas em LinhaImportacao e a sessão guarda só o ID
+# da importação. O preview é paginado, e cada POST traz só as linhas da página,
+# então o tamanho das requisições não depende do tamanho da planilha.
+
+def criar_importacao(headers, linhas_validadas, admin_id=None, tamanho_lote=1000):
+    """linhas_validadas: iterável de dicts {'data', 'is_valid', 'errors'}. Retorna o ID."""
+    importacao = ImportacaoPlanilha(id=uuid.uuid4().hex, admin_id=admin_id, headers=list(headers))
+    db.session.add(importacao)
+    db.session.flush()
+
+    total = validas = 0
+    lote = []
+    for item in linhas_validadas:
+        lote.append({'importacao_id': importacao.id, 'indice': total, 'dados': item['data'],
+                     'is_valid': item['is_valid'], 'erros': item['errors']})
+        total += 1
+        validas += 1 if item['is_valid'] else 0
+        if len(lote) >= tamanho_lote:
+            db.session.execute(insert(LinhaImportacao), lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(LinhaImportacao), lote)
+
+    importacao.total_linhas = total
+    importacao.linhas_validas = validas
+    db.session.commit()
+    return importacao.id
+
+def obter_importacao(importacao_id):
+    if not importacao_id:
+        return None
+    return db.session.get(ImportacaoPlanilha, importacao_id)
+
+def pagina_de_linhas(importacao_id, page, per_page):
+    return LinhaImportacao.query.filter_by(importacao_id=importacao_id)\
+        .order_by(LinhaImportacao.indice).paginate(page=page, per_page=per_page, error_out=False)
+
+def atualizar_linhas(importacao, linhas_editadas):
+    """Grava as correções feitas no preview (só as linhas da página enviada) e revalida."""
+    if not linhas_editadas:
+        return
+    linhas = LinhaImportacao.query.filter(
+        LinhaImportacao.importacao_id == importacao.id,
+        LinhaImportacao.indice.in_(list(linhas_editadas.keys()))
+    ).all()
+    for linha in linhas:
+        dados = dict(linha.dados)
+        dados.update(linhas_editadas[linha.indice])
+        is_valid, errors = validar_linha(dados)
+        linha.dados, linha.is_valid, linha.erros = dados, is_valid, errors
+    db.session.flush()
+    importacao.linhas_validas = LinhaImportacao.query.filter_by(importacao_id=importacao.id, is_valid=True).count()
+    db.session.commit()
+
+def importar_staging(importacao, tamanho_lote=None):
+    """Importa as linhas válidas da importação em blocos. Retorna (sucessos, erros)."""
+    tamanho_lote = tamanho_lote or current_app.config.get('IMPORTACAO_TAMANHO_LOTE', 500)
+    importacao_id = importacao.id
+    success_count = 0
+    error_count = importacao.total_linhas - importacao.linhas_validas
+
+    ultimo_indice = -1
+    while True:
+        # Paginação por chave (indice) para nunca carregar a planilha inteira na memória
+        lote = db.session.query(LinhaImportacao.indice, LinhaImportacao.dados).filter(
+            LinhaImportacao.importacao_id == importacao_id,
+            LinhaImportacao.is_valid == True,
+            LinhaImportacao.indice > ultimo_indice
+        ).order_by(LinhaImportacao.indice).limit(tamanho_lote).all()
+        if not lote:
+            break
+        ultimo_indice = lote[-1].indice
+        sucessos, erros = importar_linhas([linha.dados for linha in lote], tamanho_lote)
+        success_count += sucessos
+        error_count += erros
+
+    return success_count, error_count
+
+def descartar_importacao(importacao_id):
+    LinhaImportacao.query.filter_by(importacao_id=importacao_id).delete(synchronize_session=False)
+    ImportacaoPlanilha.query.filter_by(id=importacao_id).delete(synchronize_session=False)
+    db.session.commit()
+
+def descartar_importacoes_do_admin(admin_id):
+    """Apaga os previews em aberto do admin (só a sessão dele chegava neles). Sem commit:
+    vai junto com a exclusão do admin."""
+    importacoes = db.session.query(ImportacaoPlanilha.id).filter(ImportacaoPlanilha.admin_id == admin_id)
+    LinhaImportacao.query.filter(LinhaImportacao.importacao_id.in_(importacoes)).delete(synchronize_session=False)
+    ImportacaoPlanilha.query.filter_by(admin_id=admin_id).delete(synchronize_session=False)
+
+def expirar_importacoes():
+    """Remove importações abandonadas há mais de IMPORTACAO_EXPIRA_HORAS."""
+    limite = datetime.utcnow() - timedelta(hours=current_app.config.get('IMPORTACAO_EXPIRA_HORAS', 24))
+    antigas = db.session.query(ImportacaoPlanilha.id).filter(ImportacaoPlanilha.criado_em < limite)
+    LinhaImportacao.query.filter(LinhaImportacao.importacao_id.in_(antigas)).delete(synchronize_session=False)
+    ImportacaoPlanilha.query.filter(ImportacaoPlanilha.criado_em < limite).delete(synchronize_session=False)
+    db.session.commit()
+
+
+# --- Leitura da planilha em streaming ---
+# O arquivo é lido em blocos de IMPORTACAO_BLOCO_LEITURA linhas (CSV com o leitor
+# em chunks do pandas, XLSX com o openpyxl em modo read-only), e cada bloco é
+# normalizado e validado antes de ir para o staging. Assim a memória depende do
+# tamanho do bloco, não do tamanho do arquivo. O .xls antigo (xlrd) não tem
+# leitura incremental: é carregado inteiro e depois repartido em blocos.
+
+def _separador_csv(arquivo):
+    amostra = arquivo.read(64 * 1024)
+    arquivo.seek(0)
+    if isinstance(amostra, bytes):
+        amostra = amostra.decode('utf-8-sig', errors='ignore')
+    try:
+        return csv.Sniffer().sniff(amostra, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+def _blocos_csv(arquivo, tamanho_bloco):
+    try:
+        leitor = pd.read_csv(arquivo, sep=_separador_csv(arquivo), encoding='utf-8-sig',
+                             dtype=str, keep_default_na=False, chunksize=tamanho_bloco)
+    except pd.errors.EmptyDataError:
+        return
+    with leitor:
+        for bloco in leitor:
+            yield list(bloco.columns), bloco
+
+def _blocos_xlsx(arquivo, tamanho_bloco):
+    from openpyxl import load_workbook
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = wb.active.iter_rows(values_only=True)
+        primeira = next(linhas, None)
+        if primeira is None:
+            return
+        headers = [str(h) if h is not None else f'Unnamed: {i}' for i, h in enumerate(primeira)]
+        # Ignora linhas totalmente vazias (comuns no fim de planilhas do Excel)
+        linhas = (linha for linha in linhas if any(v is not None and v != '' for v in linha))
+        while True:
+            bloco = list(islice(linhas, tamanho_bloco))
+            if not bloco:
+                break
+            yield headers, pd.DataFrame([linha[:len(headers)] for linha in bloco], columns=headers, dtype=object)
+    finally:
+        wb.close()
+
+def _blocos_xls(arquivo, tamanho_bloco):
+    df = pd.read_excel(arquivo, dtype=object)
+    for inicio in range(0, len(df), tamanho_bloco):
+        yield list(df.columns), df.iloc[inicio:inicio + tamanho_bloco]
+
+def _normalizar_bloco(df):
+    """Mesma normalização que o upload sempre fez (datas em DD/MM/AAAA, sem '.0'), por bloco."""
+    df = df.fillna('')
+    if 'data_liberacao' in df.columns:
+        coluna = df['data_liberacao']
+        # Datas já em DD/MM/AAAA ficam como estão; datas do Excel e outros formatos são convertidos
+        ja_formatadas = coluna.astype(str).str.fullmatch(r'\d{2}/\d{2}/\d{4}')
+        restantes = coluna.where(~ja_formatadas)
+        convertidas = pd.to_datetime(restantes, errors='coerce', format='ISO8601')
+        convertidas = convertidas.fillna(pd.to_datetime(restantes.where(convertidas.isna()), errors='coerce', dayfirst=True, format='mixed'))
+        df['data_liberacao'] = coluna.where(ja_formatadas, convertidas.dt.strftime('%d/%m/%Y')).fillna(coluna)
+
+    for col in df.columns:
+        df[col] = df[col].astype(str).str.replace(r'\.0$', '', regex=True)
+    return df
+
+def _validar_bloco(df):
+    validas, erros = validar_lote(df)
+    for row, is_valid, errors in zip(df.to_dict(orient='records'), validas, erros):
+        yield {'data': row, 'is_valid': bool(is_valid), 'errors': errors}
+
+def ler_planilha(arquivo, nome_arquivo, tamanho_bloco=None):
+    """Lê a planilha em blocos. Retorna (headers, gerador de linhas validadas)
+    no formato que criar_importacao espera."""
+    tamanho_bloco = tamanho_bloco or current_app.config.get('IMPORTACAO_BLOCO_LEITURA', 2000)
+    nome = nome_arquivo.lower()
+    if nome.endswith('.csv'):
+        blocos = _blocos_csv(arquivo, tamanho_bloco)
+    elif nome.endswith('.xlsx'):
+        blocos = _blocos_xlsx(arquivo, tamanho_bloco)
+    else:
+        blocos = _blocos_xls(arquivo, tamanho_bloco)
+
+    primeiro = next(blocos, None)
+    if primeiro is None:
+        return [], iter(())
+    headers = primeiro[0]
+
+    def linhas_validadas():
+        yield from _validar_bloco(_normalizar_bloco(primeiro[1]))
+        for _, bloco in blocos:
+            yield from _validar_bloco(_normalizar_bloco(bloco))
+
+    return headers, linhas_validadas()
\ No newline at end of file
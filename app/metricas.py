@@ -0,0 +1,169 @@
+import json
+import logging
+import time
+from collections import deque
+from threading import Lock
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Instrumentação por requisição: quantidade de comandos SQL, tempo total no banco,
+# tempo de renderização de template e o comando mais lento. Os números ficam
+# agregados por endpoint (rota) na memória do processo e aparecem em /admin/metrics;
+# com METRICAS_LOG_JSON ligado, cada requisição também gera uma linha JSON no log.
+#
+# Os ganchos (eventos do SQLAlchemy e before/after_request do Flask) só são
+# registrados com METRICAS_ATIVAS=1; desligado, não há custo nenhum por consulta.
+# Cada worker do gunicorn tem as suas métricas (como o CacheTTL).
+
+logger = logging.getLogger('quiz.metricas')
+
+AMOSTRAS_POR_ROTA = 500   # latências guardadas por rota, para os percentis
+MAX_SQL = 300             # caracteres do comando mais lento guardados
+
+class _Rota:
+    __slots__ = ('requisicoes', 'erros', 'tempo_total', 'tempo_db', 'tempo_template',
+                 'consultas', 'max_consultas', 'latencias', 'mais_lenta')
+
+    def __init__(self):
+        self.requisicoes = 0
+        self.erros = 0
+        self.tempo_total = 0.0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+        self.consultas = 0
+        self.max_consultas = 0
+        self.latencias = deque(maxlen=AMOSTRAS_POR_ROTA)
+        self.mais_lenta = (0.0, None)  # (segundos, sql)
+
+_rotas = {}
+_lock = Lock()
+_log_json = False
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+# --- Ganchos do SQLAlchemy ---
+
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    # O início vai no contexto do próprio comando (e não numa pilha em conn.info): um
+    # comando que falha (IntegrityError dos savepoints) não dispara o _depois_sql e
+    # deixaria o valor preso na conexão do pool; o contexto é descartado com ele.
+    if context is not None and has_request_context() and 'metricas' in g:
+        context._metricas_inicio = time.perf_counter()
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_metricas_inicio', None)
+    if inicio is None or not (has_request_context() and 'metricas' in g):
+        return
+    duracao = time.perf_counter() - inicio
+    m = g.metricas
+    m['consultas'] += 1
+    m['tempo_db'] += duracao
+    if duracao > m['mais_lenta'][0]:
+        m['mais_lenta'] = (duracao, statement)
+
+# --- Ganchos do Flask ---
+
+def _antes_template(sender, template, context, **extra):
+    if 'metricas' in g:
+        g.metricas['template_inicio'] = time.perf_counter()
+
+def _depois_template(sender, template, context, **extra):
+    if 'metricas' in g and g.metricas.get('template_inicio'):
+        g.metricas['tempo_template'] += time.perf_counter() - g.metricas.pop('template_inicio')
+
+def _inicio_requisicao():
+    g.metricas = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_db': 0.0,
+                  'tempo_template': 0.0, 'mais_lenta': (0.0, None)}
+
+def _fim_requisicao(response):
+    m = g.pop('metricas', None)
+    if m is None:
+        return response
+    duracao = time.perf_counter() - m['inicio']
+    endpoint = request.endpoint or '(sem rota)'
+
+    with _lock:
+        rota = _rotas.get(endpoint)
+        if rota is None:
+            rota = _rotas[endpoint] = _Rota()
+        rota.requisicoes += 1
+        rota.erros += 1 if response.status_code >= 500 else 0
+        rota.tempo_total += duracao
+        rota.tempo_db += m['tempo_db']
+        rota.tempo_template += m['tempo_template']
+        rota.consultas += m['consultas']
+        rota.max_consultas = max(rota.max_consultas, m['consultas'])
+        rota.latencias.append(duracao)
+        if m['mais_lenta'][0] > rota.mais_lenta[0]:
+            rota.mais_lenta = (m['mais_lenta'][0], (m['mais_lenta'][1] or '')[:MAX_SQL])
+
+    if _log_json:
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'metodo': request.method,
+            'status': response.status_code,
+            'ms': round(duracao * 1000, 2),
+            'consultas': m['consultas'],
+            'db_ms': round(m['tempo_db'] * 1000, 2),
+            'template_ms': round(m['tempo_template'] * 1000, 2),
+            'mais_lenta_ms': round(m['mais_lenta'][0] * 1000, 2),
+        }, ensure_ascii=False))
+    return response
+
+def init_app(app):
+    """Liga a instrumentação se METRICAS_ATIVAS; cobre todos os blueprints registrados no app."""
+    global _log_json
+    if not app.config.get('METRICAS_ATIVAS'):
+        return
+    _log_json = app.config.get('METRICAS_LOG_JSON', False)
+    if _log_json and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    if not event.contains(Engine, 'before_cursor_execute', _antes_sql):
+        event.listen(Engine, 'before_cursor_execute', _antes_sql)
+        event.listen(Engine, 'after_cursor_execute', _depois_sql)
+    before_render_template.connect(_antes_template, app)
+    template_rendered.connect(_depois_template, app)
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
+
+def ativas(app):
+    return bool(app.config.get('METRICAS_ATIVAS'))
+
+def resumo():
+    """Lista de dicts por rota, ordenada pelo tempo total gasto (onde o tempo está indo)."""
+    with _lock:
+        itens = [(endpoint, rota, list(rota.latencias)) for endpoint, rota in _rotas.items()]
+    linhas = []
+    for endpoint, rota, latencias in itens:
+        n = rota.requisicoes or 1
+        linhas.append({
+            'endpoint': endpoint,
+            'requisicoes': rota.requisicoes,
+            'erros': rota.erros,
+            'media_ms': round(rota.tempo_total / n * 1000, 2),
+            'p50_ms': round(_percentil(latencias, 50) * 1000, 2),
+            'p95_ms': round(_percentil(latencias, 95) * 1000, 2),
+            'max_ms': round(max(latencias, default=0) * 1000, 2),
+            'total_s': round(rota.tempo_total, 3),
+            'consultas_media': round(rota.consultas / n, 1),
+            'consultas_max': rota.max_consultas,
+            'db_media_ms': round(rota.tempo_db / n * 1000, 2),
+            'template_media_ms': round(rota.tempo_template / n * 1000, 2),
+            'mais_lenta_ms': round(rota.mais_lenta[0] * 1000, 2),
+            'mais_lenta_sql': rota.mais_lenta[1],
+        })
+    linhas.sort(key=lambda linha: linha['total_s'], reverse=True)
+    return linhas
+
+def limpar():
+    with _lock:
+        _rotas.clear()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import importlib
+import pkgutil
+import re
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+from ..extensions import db
+from ..models import MigracaoAplicada
+from .contexto import Contexto
+
+# Migrações versionadas do esquema. Cada arquivo mNNNN_nome.py deste pacote é uma
+# migração, aplicada uma única vez e na ordem do número; as aplicadas ficam registradas
+# na tabela migracao_aplicada. Quem roda é o migrar.py (ou /admin/init_db no deploy).
+#
+# Uma migração define DESCRICAO e aplicar(ctx), onde ctx é um Contexto (contexto.py).
+# Ela NÃO roda numa transação única: índices e preenchimentos em lote confirmam aos
+# poucos para não travar as tabelas de um banco em uso. Por isso todo passo confere
+# antes se já foi feito — se a migração parar no meio, rodar de novo continua dela.
+#
+# Os passos de esquema usam SQL próprio (nunca os modelos, que já estão na versão
+# final). Recalcular dados derivados pelos módulos do app (placar, temas, contadores)
+# vai em ctx.ao_final(...): roda depois de todas as migrações pendentes, e a migração
+# só é registrada quando o recálculo termina.
+#
+# Para mudar o esquema: altere o modelo em app/models.py e crie o próximo arquivo
+# (m0007_..., m0008_...) levando os bancos existentes até ele. Nunca edite uma
+# migração que já foi aplicada em produção.
+
+PADRAO_ARQUIVO = re.compile(r'^m(\d{4})_\w+$')
+CHAVE_TRAVA = 8042317   # pg_advisory_lock: um processo aplicando migrações por vez
+
+def _modulos():
+    """{versao: módulo} de todas as migrações do pacote, em ordem."""
+    encontrados = {}
+    for info in pkgutil.iter_modules(__path__):
+        if PADRAO_ARQUIVO.match(info.name):
+            encontrados[info.name[1:]] = importlib.import_module(f'{__name__}.{info.name}')
+    return dict(sorted(encontrados.items()))
+
+def _numero(versao):
+    return int(str(versao)[:4])
+
+def aplicadas():
+    """{versao: MigracaoAplicada} do banco atual (cria a tabela de controle se faltar)."""
+    MigracaoAplicada.__table__.create(db.engine, checkfirst=True)
+    registros = {m.versao: m for m in MigracaoAplicada.query.all()}
+    db.session.commit()
+    return registros
+
+def pendentes(ate=None):
+    """[(versao, módulo)] ainda não aplicadas, até a versão 'ate' (número ou nome) se informada."""
+    feitas = aplicadas()
+    return [(versao, modulo) for versao, modulo in _modulos().items()
+            if versao not in feitas and (ate is None or _numero(versao) <= _numero(ate))]
+
+def status():
+    """[(versao, descrição, MigracaoAplicada ou None)] de todas as migrações conhecidas."""
+    feitas = aplicadas()
+    return [(versao, modulo.DESCRICAO, feitas.get(versao)) for versao, modulo in _modulos().items()]
+
+@contextmanager
+def _trava():
+    """No Postgres, segura um advisory lock enquanto aplica (dois deploys ao mesmo tempo
+    não aplicam a mesma migração). No SQLite não há concorrência a tratar."""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:chave)"), {'chave': CHAVE_TRAVA})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:chave)"), {'chave': CHAVE_TRAVA})
+            conn.commit()
+
+def _registrar(versao, modulo, duracao):
+    db.session.add(MigracaoAplicada(versao=versao, descricao=modulo.DESCRICAO, duracao=round(duracao, 3)))
+    db.session.commit()
+
+def _executar(passo):
+    try:
+        passo()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def aplicar_pendentes(ate=None, progresso=print):
+    """Aplica, em ordem, as migrações que faltam. Retorna as versões aplicadas agora."""
+    progresso = progresso or (lambda mensagem: None)
+    feitas_agora = []
+    with _trava():
+        # A lista é lida depois da trava: quem esperou não repete o que o outro aplicou
+        lista = pendentes(ate)
+        esquema_completo = len(lista) == len(pendentes())
+        recalculos, aguardando = [], []
+        for versao, modulo in lista:
+            progresso(f"→ {versao}: {modulo.DESCRICAO}")
+            inicio = time.perf_counter()
+            ctx = Contexto(progresso)
+            _executar(lambda: modulo.aplicar(ctx))
+            duracao = time.perf_counter() - inicio
+            if not ctx.recalculos:
+                _registrar(versao, modulo, duracao)
+                progresso(f"  ok ({duracao:.2f}s)")
+                feitas_agora.append(versao)
+            elif esquema_completo:
+                recalculos += ctx.recalculos
+                aguardando.append((versao, modulo, duracao))
+                progresso(f"  esquema ok ({duracao:.2f}s); recálculo no final")
+            else:
+                # Com --ate o esquema ainda não está na versão dos modelos: fica pendente
+                # (os passos já feitos são pulados na próxima vez)
+                progresso("  recálculo adiado: fica pendente até rodar as migrações seguintes")
+
+        for descricao, funcao in recalculos:
+            progresso(f"→ {descricao}")
+            inicio = time.perf_counter()
+            _executar(funcao)
+            progresso(f"  ok ({time.perf_counter() - inicio:.2f}s)")
+        for versao, modulo, duracao in aguardando:
+            _registrar(versao, modulo, duracao)
+            feitas_agora.append(versao)
+    return feitas_agora
+
+def exigir_em_dia():
+    """Para workers e scripts: encerra com aviso se o banco tiver migração pendente,
+    em vez de rodar com um esquema que o código não espera."""
+    faltam = [versao for versao, _ in pendentes()]
+    if faltam:
+        raise SystemExit(f"Banco desatualizado, migrações pendentes: {', '.join(faltam)}. Rode: python migrar.py")
\ No newline at end of file
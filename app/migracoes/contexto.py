@@ -0,0 +1,135 @@
+import time
+from flask import current_app
+from sqlalchemy import inspect, text, bindparam
+from ..extensions import db
+
+# Operações de esquema usadas pelas migrações, nos dois bancos (SQLite local, Postgres
+# em produção). Todas conferem antes se já foram feitas e confirmam na hora (fora da
+# sessão do ORM), então podem ser repetidas depois de uma migração interrompida.
+
+class Contexto:
+    def __init__(self, progresso=None):
+        self.progresso = progresso or (lambda mensagem: None)
+        self.tamanho_lote = current_app.config.get('MIGRACOES_TAMANHO_LOTE', 5000)
+        self.recalculos = []  # [(descrição, função)] para depois do esquema completo
+
+    def ao_final(self, descricao, funcao):
+        """Agenda um recálculo feito pelos módulos do app (placar, temas, contadores...).
+        Eles usam os modelos atuais, que podem ter colunas de migrações posteriores;
+        por isso só rodam depois que todas as migrações pendentes ajustaram o esquema."""
+        self.recalculos.append((descricao, funcao))
+
+    @property
+    def postgres(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    # --- Consultas ao esquema ---
+
+    def tem_tabela(self, tabela):
+        return inspect(db.engine).has_table(tabela)
+
+    def colunas(self, tabela):
+        inspetor = inspect(db.engine)
+        if not inspetor.has_table(tabela):
+            return set()
+        return {c['name'] for c in inspetor.get_columns(tabela)}
+
+    def indices(self, tabela):
+        inspetor = inspect(db.engine)
+        if not inspetor.has_table(tabela):
+            return set()
+        return {i['name'] for i in inspetor.get_indexes(tabela)}
+
+    def contar(self, sql, **parametros):
+        with db.engine.connect() as conn:
+            return conn.execute(text(sql), parametros).scalar() or 0
+
+    # --- Alterações ---
+
+    def executar(self, sql, **parametros):
+        """Um comando na sua própria transação. Retorna as linhas afetadas."""
+        with db.engine.begin() as conn:
+            return conn.execute(_texto(sql, parametros), parametros).rowcount
+
+    def criar_tabelas(self, *modelos):
+        """Cria as tabelas dos modelos (todas, sem argumentos) que ainda não existem,
+        com os índices delas. Tabelas existentes não são tocadas."""
+        tabelas = [modelo.__table__ for modelo in modelos] or db.metadata.sorted_tables
+        faltando = [tabela for tabela in tabelas if not self.tem_tabela(tabela.name)]
+        db.metadata.create_all(db.engine, tables=faltando, checkfirst=True)
+        for tabela in faltando:
+            self.progresso(f"  tabela {tabela.name} criada")
+        return [tabela.name for tabela in faltando]
+
+    def remover_tabela(self, tabela):
+        if self.tem_tabela(tabela):
+            self.executar(f"DROP TABLE {tabela}")
+            self.progresso(f"  tabela {tabela} removida")
+
+    def adicionar_coluna(self, tabela, coluna, definicao):
+        """ALTER TABLE ... ADD COLUMN se a coluna não existir. Coluna nova deve aceitar NULL
+        (ou ter DEFAULT): assim o Postgres não reescreve a tabela."""
+        if coluna in self.colunas(tabela):
+            return False
+        self.executar(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+        self.progresso(f"  coluna {tabela}.{coluna} criada")
+        return True
+
+    def criar_indice(self, indice):
+        """Cria um db.Index (ou índice de coluna) declarado no modelo, se ainda não existir.
+        No Postgres usa CREATE INDEX CONCURRENTLY, que não bloqueia escritas na tabela; um
+        índice deixado inválido por uma tentativa interrompida é apagado e refeito."""
+        tabela = indice.table.name
+        colunas = ', '.join(coluna.name for coluna in indice.columns)
+        unico = 'UNIQUE ' if indice.unique else ''
+        inicio = time.perf_counter()
+        if self.postgres:
+            # Uma transação aberta da sessão faria o CONCURRENTLY esperar por ela para sempre
+            db.session.commit()
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                valido = conn.execute(text(
+                    "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                    "WHERE c.relname = :nome"
+                ), {'nome': indice.name}).scalar()
+                if valido:
+                    return False
+                if valido is not None:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {indice.name}"))
+                conn.execute(text(f"CREATE {unico}INDEX CONCURRENTLY {indice.name} ON {tabela} ({colunas})"))
+        else:
+            if indice.name in self.indices(tabela):
+                return False
+            self.executar(f"CREATE {unico}INDEX {indice.name} ON {tabela} ({colunas})")
+        self.progresso(f"  índice {indice.name} criado ({time.perf_counter() - inicio:.2f}s)")
+        return True
+
+    def preencher_em_lotes(self, tabela, atribuicao, onde=None, tamanho_lote=None, **parametros):
+        """UPDATE tabela SET <atribuicao> [WHERE <onde>] em faixas de id, com um commit por
+        faixa: nenhuma transação longa segurando a tabela e o que já foi feito fica feito.
+        Parâmetros lista/tupla viram IN (...). Retorna quantas linhas foram alteradas."""
+        tamanho_lote = tamanho_lote or self.tamanho_lote
+        with db.engine.connect() as conn:
+            menor, maior = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {tabela}")).one()
+        if menor is None:
+            return 0
+        filtro = f" AND ({onde})" if onde else ''
+        comando = _texto(f"UPDATE {tabela} SET {atribuicao} WHERE id >= :_inicio AND id < :_fim{filtro}", parametros)
+        total = maior - menor + 1
+        alteradas = 0
+        proximo_aviso = 10
+        for inicio in range(menor, maior + 1, tamanho_lote):
+            with db.engine.begin() as conn:
+                alteradas += conn.execute(comando, {**parametros, '_inicio': inicio, '_fim': inicio + tamanho_lote}).rowcount
+            percentual = (min(inicio + tamanho_lote, maior + 1) - menor) * 100 // total
+            if percentual >= proximo_aviso:
+                self.progresso(f"  {tabela}: {percentual}% dos ids, {alteradas} linhas alteradas")
+                proximo_aviso = percentual // 10 * 10 + 10
+        return alteradas
+
+def indice_do_modelo(modelo, nome):
+    """O db.Index 'nome' da tabela do modelo (inclusive os de index=True na coluna)."""
+    return next(indice for indice in modelo.__table__.indexes if indice.name == nome)
+
+def _texto(sql, parametros):
+    listas = [nome for nome, valor in parametros.items() if isinstance(valor, (list, tuple))]
+    return text(sql).bindparams(*(bindparam(nome, expanding=True) for nome in listas))
\ No newline at end of file
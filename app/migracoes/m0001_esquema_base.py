@@ -0,0 +1,8 @@
+# Banco vazio: cria tudo. Banco anterior às migrações (inicializar_banco.py/create_all,
+# adicionar_coluna.py): cria só as tabelas que faltam; as que já existem são ajustadas
+# pelas migrações seguintes.
+
+DESCRICAO = 'Cria as tabelas que ainda não existem'
+
+def aplicar(ctx):
+    ctx.criar_tabelas()
\ No newline at end of file
@@ -0,0 +1,62 @@
+from collections import Counter, defaultdict
+from ..extensions import db
+from ..models import Categoria, Pergunta, PerguntaElegivel, ContadorCategoria
+from ..categorias import chave_categoria, GERAL, SEM_CLASSIFICACAO
+from .contexto import indice_do_modelo
+
+# Categorias em texto livre (pergunta.categoria) -> tabela 'categoria' + pergunta.categoria_id.
+# Junta as grafias diferentes do mesmo tema ('Vendas', 'vendas', ' VENDAS') numa categoria só,
+# com o nome mais usado; perguntas sem categoria vão para 'Sem Classificação'.
+# Os índices derivados no formato antigo (chave em texto) são recriados vazios e a
+# m0004 os preenche. A coluna antiga pergunta.categoria fica no banco (não é mais lida).
+
+DESCRICAO = 'Categorias em tabela própria (pergunta.categoria_id)'
+
+def aplicar(ctx):
+    for modelo in (PerguntaElegivel, ContadorCategoria):
+        if 'categoria' in ctx.colunas(modelo.__table__.name):
+            ctx.remover_tabela(modelo.__table__.name)
+    ctx.criar_tabelas(Categoria, PerguntaElegivel, ContadorCategoria)
+
+    ctx.adicionar_coluna('pergunta', 'categoria_id', 'INTEGER REFERENCES categoria(id)')
+    ctx.criar_indice(indice_do_modelo(Pergunta, 'ix_pergunta_categoria_id'))
+
+    if 'categoria' in ctx.colunas('pergunta'):
+        _juntar_grafias(ctx)
+
+    # Qualquer pergunta que ainda tenha ficado sem categoria vai para 'Geral'
+    if ctx.contar("SELECT COUNT(*) FROM pergunta WHERE categoria_id IS NULL"):
+        geral = _obter_ou_criar(chave_categoria(GERAL), GERAL)
+        ctx.preencher_em_lotes('pergunta', 'categoria_id = :categoria_id', onde='categoria_id IS NULL',
+                               categoria_id=geral.id)
+
+def _juntar_grafias(ctx):
+    """Aponta as perguntas sem categoria_id para a categoria da chave normalizada do texto antigo."""
+    grafias = defaultdict(Counter)
+    with db.engine.connect() as conn:
+        for nome, qtd in conn.exec_driver_sql(
+            "SELECT categoria, COUNT(*) FROM pergunta WHERE categoria_id IS NULL GROUP BY categoria"
+        ):
+            nome = (nome or '').strip() or SEM_CLASSIFICACAO
+            grafias[chave_categoria(nome)][nome] += qtd
+
+    for chave, contagem in sorted(grafias.items()):
+        # Nome de exibição: a grafia mais usada (empate: ordem alfabética)
+        nome = sorted(contagem.items(), key=lambda item: (-item[1], item[0]))[0][0]
+        categoria = _obter_ou_criar(chave, nome)
+        variantes = list(contagem)
+        onde = 'categoria_id IS NULL AND TRIM(categoria) IN :variantes'
+        if chave == chave_categoria(SEM_CLASSIFICACAO):
+            onde = "categoria_id IS NULL AND (categoria IS NULL OR TRIM(categoria) IN :variantes OR TRIM(categoria) = '')"
+        ctx.preencher_em_lotes('pergunta', 'categoria_id = :categoria_id', onde=onde,
+                               categoria_id=categoria.id, variantes=variantes)
+        if len(contagem) > 1:
+            ctx.progresso(f"  {', '.join(repr(g) for g in sorted(contagem))} -> '{categoria.nome}'")
+
+def _obter_ou_criar(chave, nome):
+    categoria = Categoria.query.filter_by(chave=chave).first()
+    if categoria is None:
+        categoria = Categoria(nome=nome, chave=chave)
+        db.session.add(categoria)
+    db.session.commit()
+    return categoria
\ No newline at end of file
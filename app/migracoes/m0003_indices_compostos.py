@@ -0,0 +1,46 @@
+from ..models import Pergunta, Resposta, ImagemPergunta, AnexoResposta
+from .. import placar, temas
+from ..contadores import recalcular_todos
+from .contexto import indice_do_modelo
+
+# Índices compostos de Resposta e Pergunta (ver __table_args__ em app/models.py),
+# incluindo o índice único (usuario_id, pergunta_id) de Resposta, e os das chaves
+# estrangeiras de imagens e anexos (carregados em lote nas listagens).
+# Antes do índice único, junta as respostas repetidas (duplo clique, reenvio do
+# formulário): fica a primeira de cada (usuário, pergunta) e os anexos das repetidas
+# passam para ela. O índice único só é criado depois de placar, temas e contadores
+# recalculados (ctx.ao_final): enquanto ele faltar, o recálculo ainda é devido.
+
+DESCRICAO = 'Índices compostos das consultas quentes e resposta única por pergunta'
+
+PRIMEIRAS = "SELECT MIN(id) FROM resposta GROUP BY usuario_id, pergunta_id"
+UNICO = 'ux_resposta_usuario_pergunta'
+
+def aplicar(ctx):
+    repetidas = ctx.contar(f"SELECT COUNT(*) FROM resposta WHERE id NOT IN ({PRIMEIRAS})")
+    if repetidas:
+        ctx.progresso(f"  {repetidas} respostas repetidas; mantendo a primeira de cada pergunta.")
+        ctx.executar(
+            "UPDATE anexo_resposta SET resposta_id = ("
+            " SELECT MIN(r2.id) FROM resposta r1 JOIN resposta r2"
+            " ON r2.usuario_id = r1.usuario_id AND r2.pergunta_id = r1.pergunta_id"
+            " WHERE r1.id = anexo_resposta.resposta_id)"
+            f" WHERE resposta_id NOT IN ({PRIMEIRAS})"
+        )
+        ctx.executar(f"DELETE FROM resposta WHERE id NOT IN ({PRIMEIRAS})")
+
+    for modelo in (Pergunta, Resposta, ImagemPergunta, AnexoResposta):
+        for indice in sorted(modelo.__table__.indexes, key=lambda i: i.name):
+            if indice.name != UNICO:
+                ctx.criar_indice(indice)
+
+    if UNICO not in ctx.indices('resposta'):
+        ctx.ao_final('Recalcula placar, temas e contadores e cria o índice único de Resposta',
+                     lambda: _recalcular(ctx))
+
+def _recalcular(ctx):
+    placar.reconstruir()
+    temas.reconstruir()
+    recalcular_todos()
+    ctx.progresso("  placar, temas e contadores recalculados.")
+    ctx.criar_indice(indice_do_modelo(Resposta, UNICO))
\ No newline at end of file
@@ -0,0 +1,33 @@
+from .. import elegibilidade, placar, temas
+from ..contadores import recalcular_todos
+
+# Primeira carga das tabelas derivadas (contadores, índice de elegibilidade, placares,
+# respondidas por tema) num banco que já tinha dados quando elas foram criadas.
+# Só preenche as que estão vazias enquanto a tabela de origem tem linhas; num banco
+# novo não faz nada. Usa os módulos do app, então roda no ctx.ao_final. Depois disso
+# quem as mantém são as rotas (e o manutencao.py).
+
+DESCRICAO = 'Preenche as tabelas derivadas criadas vazias num banco com dados'
+
+def aplicar(ctx):
+    ctx.ao_final('Primeira carga das tabelas derivadas vazias', lambda: _carregar(ctx))
+
+def _carregar(ctx):
+    def vazia(tabela, origem):
+        return ctx.contar(f"SELECT COUNT(*) FROM {origem}") and not ctx.contar(f"SELECT COUNT(*) FROM {tabela}")
+
+    # Os contadores do dashboard são calculados a partir do índice de elegibilidade:
+    # se ele acabou de ser preenchido, os contadores são refeitos também
+    carregou_elegibilidade = vazia('pergunta_elegivel', 'pergunta')
+    if carregou_elegibilidade:
+        total = elegibilidade.reconstruir(progresso=lambda feitas, de: ctx.progresso(f"  elegibilidade: {feitas}/{de} perguntas"))
+        ctx.progresso(f"  índice de elegibilidade: {total} linhas")
+    if carregou_elegibilidade or vazia('contador_pendencias', 'usuario'):
+        recalcular_todos()
+        ctx.progresso("  contadores do dashboard recalculados")
+    if vazia('placar_usuario', 'resposta'):
+        placar.reconstruir()
+        ctx.progresso("  placares recalculados")
+    if vazia('contador_categoria', 'resposta'):
+        temas.reconstruir()
+        ctx.progresso("  respondidas por tema recalculadas")
\ No newline at end of file
@@ -0,0 +1,7 @@
+# Token do envio do formulário do quiz (app/respostas.py). Respostas antigas ficam
+# sem token (NULL), então não há preenchimento: só a coluna nova.
+
+DESCRICAO = 'Coluna resposta.token_envio (envio idempotente do quiz)'
+
+def aplicar(ctx):
+    ctx.adicionar_coluna('resposta', 'token_envio', 'VARCHAR(32)')
\ No newline at end of file
@@ -0,0 +1,10 @@
+from ..models import PerguntaEmitida
+
+# Início do cronômetro do quiz no servidor (app/cronometro.py). Tabela nova e vazia:
+# quem estava com uma pergunta aberta no deploy recebe a mesma pergunta de novo ao
+# responder, com o relógio começando ali (a resposta não é gravada nem perdida).
+
+DESCRICAO = 'Tabela pergunta_emitida (cronômetro do quiz no servidor)'
+
+def aplicar(ctx):
+    ctx.criar_tabelas(PerguntaEmitida)
\ No newline at end of file
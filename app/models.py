@@ -33,6 +33,13 @@ class Administrador(db.Model):
     def check_senha(self, senha):
         return check_password_hash(self.senha_hash, senha)
 
+class Categoria(db.Model):
+    """Tema das perguntas. 'chave' é o nome normalizado (minúsculas, sem espaços nas pontas),
+    única: 'Vendas', 'vendas' e ' VENDAS' são a mesma categoria."""
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(50), nullable=False)
+    chave = db.Column(db.String(50), nullable=False, unique=True)
+
 class Pergunta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(20), nullable=False, default='multipla_escolha', index=True)
@@ -46,11 +53,16 @@ class Pergunta(db.Model):
     data_liberacao = db.Column(db.Date, nullable=False, index=True)
     tempo_limite = db.Column(db.Integer, nullable=True)
     imagem_pergunta = db.Column(db.String(300), nullable=True)
-    categoria = db.Column(db.String(50), nullable=True, default='Geral', index=True)
+    categoria_id = db.Column(db.Integer, db.ForeignKey('categoria.id'), nullable=False, index=True)
+    categoria = db.relationship('Categoria')
     para_todos_setores = db.Column(db.Boolean, default=False, nullable=False)
     departamentos = db.relationship('Departamento', secondary=pergunta_departamento_association, lazy='subquery',
         backref=db.backref('perguntas', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_pergunta_tipo_data', 'tipo', 'data_liberacao', 'id'),  # listagens por tipo, mais recentes primeiro
+    )
+
 class Resposta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     pontos = db.Column(db.Integer, nullable=True)
@@ -64,15 +76,154 @@ class Resposta(db.Model):
     status_correcao = db.Column(db.String(20), nullable=False, default='nao_respondido', index=True)
     feedback_admin = db.Column(db.Text, nullable=True)
     feedback_visto = db.Column(db.Boolean, default=False, nullable=False)
+    token_envio = db.Column(db.String(32), nullable=True)  # envio do formulário do quiz (app/respostas.py)
+
+    # Índices compostos no formato das consultas quentes (app/migracoes/m0003_indices_compostos.py cria nos bancos existentes)
+    __table_args__ = (
+        db.Index('ux_resposta_usuario_pergunta', 'usuario_id', 'pergunta_id', unique=True),  # uma resposta por pergunta
+        db.Index('ix_resposta_usuario_data', 'usuario_id', 'data_resposta', 'id'),            # histórico do usuário
+        db.Index('ix_resposta_status_data', 'status_correcao', 'data_resposta', 'id'),        # fila de correções
+    )
 
 class ImagemPergunta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(300), nullable=False)
-    pergunta_id = db.Column(db.Integer, db.ForeignKey('pergunta.id'), nullable=False)
+    pergunta_id = db.Column(db.Integer, db.ForeignKey('pergunta.id'), nullable=False, index=True)
     pergunta = db.relationship('Pergunta', backref=db.backref('imagens_extra', lazy=True, cascade='all, delete-orphan'))
 
 class AnexoResposta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(300), nullable=False)
-    resposta_id = db.Column(db.Integer, db.ForeignKey('resposta.id'), nullable=False)
-    resposta = db.relationship('Resposta', backref=db.backref('anexos_extra', lazy=True, cascade='all, delete-orphan'))
\ No newline at end of file
+    resposta_id = db.Column(db.Integer, db.ForeignKey('resposta.id'), nullable=False, index=True)
+    resposta = db.relationship('Resposta', backref=db.backref('anexos_extra', lazy=True, cascade='all, delete-orphan'))
+
+class ContadorPendencias(db.Model):
+    """Contadores materializados do dashboard (um registro por usuário).
+    data_referencia = dia (UTC-3) em que os números foram calculados; se for NULL
+    ou de outro dia, o contador é recalculado na próxima leitura."""
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    quiz_pendentes = db.Column(db.Integer, nullable=False, default=0)
+    atividades_pendentes = db.Column(db.Integer, nullable=False, default=0)
+    feedbacks_novos = db.Column(db.Integer, nullable=False, default=0)
+    data_referencia = db.Column(db.Date, nullable=True)
+
+
+class PerguntaElegivel(db.Model):
+    """Índice de elegibilidade: uma linha por (setor, pergunta) que o setor enxerga.
+    Perguntas 'para todos' são expandidas para todos os setores, então as telas do
+    usuário viram uma única varredura por faixa em (departamento_id, tipo, categoria_id, data)."""
+    __tablename__ = 'pergunta_elegivel'
+    departamento_id = db.Column(db.Integer, db.ForeignKey('departamento.id'), primary_key=True)
+    pergunta_id = db.Column(db.Integer, db.ForeignKey('pergunta.id'), primary_key=True, index=True)
+    tipo = db.Column(db.String(20), nullable=False)
+    categoria_id = db.Column(db.Integer, db.ForeignKey('categoria.id'), nullable=False, index=True)
+    data_liberacao = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_pergunta_elegivel_busca', 'departamento_id', 'tipo', 'categoria_id', 'data_liberacao', 'pergunta_id'),
+    )
+
+
+class PlacarUsuario(db.Model):
+    """Totais acumulados do ranking por usuário (mantidos a cada resposta/correção)."""
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    departamento_id = db.Column(db.Integer, db.ForeignKey('departamento.id'), nullable=False, index=True)
+    pontos = db.Column(db.Integer, nullable=False, default=0)
+    respostas = db.Column(db.Integer, nullable=False, default=0)
+    acertos = db.Column(db.Integer, nullable=False, default=0)
+
+class PlacarDepartamento(db.Model):
+    """Totais acumulados do ranking por setor."""
+    departamento_id = db.Column(db.Integer, db.ForeignKey('departamento.id'), primary_key=True)
+    pontos = db.Column(db.Integer, nullable=False, default=0)
+    respostas = db.Column(db.Integer, nullable=False, default=0)
+    acertos = db.Column(db.Integer, nullable=False, default=0)
+    num_usuarios = db.Column(db.Integer, nullable=False, default=0)
+
+class ContadorCategoria(db.Model):
+    """Perguntas já respondidas pelo usuário por tema (categoria), para a tela de escolha de tema.
+    origem = 'quiz' (múltipla escolha e V/F) ou 'atividades' (discursivas)."""
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    origem = db.Column(db.String(12), primary_key=True)
+    categoria_id = db.Column(db.Integer, db.ForeignKey('categoria.id'), primary_key=True)
+    respondidas = db.Column(db.Integer, nullable=False, default=0)
+
+class PontuacaoDiaria(db.Model):
+    """Rollup diário (dia local UTC-3) dos pontos de cada usuário, para rankings por período."""
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    dia = db.Column(db.Date, primary_key=True, index=True)
+    pontos = db.Column(db.Integer, nullable=False, default=0)
+    respostas = db.Column(db.Integer, nullable=False, default=0)
+    acertos = db.Column(db.Integer, nullable=False, default=0)
+
+class PerguntaEmitida(db.Model):
+    """Primeira vez que o quiz mostrou a pergunta ao usuário: início do cronômetro (app/cronometro.py)."""
+    __tablename__ = 'pergunta_emitida'
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    pergunta_id = db.Column(db.Integer, db.ForeignKey('pergunta.id'), primary_key=True)
+    emitida_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class ImportacaoPlanilha(db.Model):
+    """Planilha enviada aguardando revisão no preview (staging no servidor, fora do cookie de sessão)."""
+    id = db.Column(db.String(32), primary_key=True)
+    admin_id = db.Column(db.Integer, db.ForeignKey('administrador.id'), nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    headers = db.Column(db.JSON, nullable=False)
+    total_linhas = db.Column(db.Integer, nullable=False, default=0)
+    linhas_validas = db.Column(db.Integer, nullable=False, default=0)
+
+class LinhaImportacao(db.Model):
+    importacao_id = db.Column(db.String(32), db.ForeignKey('importacao_planilha.id'), primary_key=True)
+    indice = db.Column(db.Integer, primary_key=True)
+    dados = db.Column(db.JSON, nullable=False)
+    is_valid = db.Column(db.Boolean, nullable=False, default=False)
+    erros = db.Column(db.JSON, nullable=False, default=dict)
+
+
+class TarefaRelatorio(db.Model):
+    """Relatório/exportação pedido pelo admin e gerado pelo worker_relatorios.py."""
+    id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False)      # 'desempenho' | 'detalhado'
+    formato = db.Column(db.String(10), nullable=False, default='xlsx')
+    parametros = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)  # pendente | processando | concluido | erro
+    progresso = db.Column(db.Integer, nullable=False, default=0)  # linhas já gravadas
+    total = db.Column(db.Integer, nullable=True)
+    arquivo = db.Column(db.String(500), nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+    admin_id = db.Column(db.Integer, db.ForeignKey('administrador.id'), nullable=True, index=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+
+class EmailSaida(db.Model):
+    """Caixa de saída: um e-mail por linha, enviado pelo despachante (app/correio.py)."""
+    __tablename__ = 'email_saida'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(30), nullable=True)        # 'nova_pergunta' | 'resumo_do_dia' | 'lembrete' ...
+    destinatario = db.Column(db.String(120), nullable=False)
+    assunto = db.Column(db.String(255), nullable=False)
+    corpo_texto = db.Column(db.Text, nullable=True)
+    corpo_html = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente | enviando | enviado | erro
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    reservado_em = db.Column(db.DateTime, nullable=True)
+    enviado_em = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # A fila é lida por (status, proxima_tentativa)
+        db.Index('ix_email_saida_fila', 'status', 'proxima_tentativa'),
+    )
+
+class MigracaoAplicada(db.Model):
+    """Migração de esquema já aplicada neste banco (ver app/migracoes)."""
+    __tablename__ = 'migracao_aplicada'
+    versao = db.Column(db.String(100), primary_key=True)  # nome do arquivo sem o 'm': '0002_categorias'
+    descricao = db.Column(db.String(255), nullable=False)
+    aplicada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    duracao = db.Column(db.Float, nullable=True)  # segundos
\ No newline at end of file
@@ -0,0 +1,115 @@
+from datetime import date, datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_
+from .cache import CacheTTL
+
+# Paginação por cursor (keyset) para as listagens longas.
+# Em vez de .paginate() (OFFSET + COUNT(*) a cada página), a consulta continua a
+# partir da última linha mostrada: WHERE (data, id) < (data_da_ultima, id_da_ultima)
+# ORDER BY data DESC, id DESC LIMIT n+1. A página 50 custa o mesmo que a página 1.
+# Os links de próxima/anterior levam um token opaco (assinado com a SECRET_KEY) com
+# os valores da linha de fronteira. O total de páginas vem de um COUNT guardado em
+# cache por PAGINACAO_CONTAGEM_TTL segundos (é só para o "Página X de Y").
+
+_contagens = CacheTTL(ttl_segundos=60, max_itens=5000)
+
+def _serializador():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='paginacao')
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return ['dt', valor.isoformat()]
+    if isinstance(valor, date):
+        return ['d', valor.isoformat()]
+    return ['v', valor]
+
+def _decodificar_valor(item):
+    tipo, valor = item
+    if tipo == 'dt':
+        return datetime.fromisoformat(valor)
+    if tipo == 'd':
+        return date.fromisoformat(valor)
+    return valor
+
+def _normalizar(ordem):
+    # Cada item: (coluna, decrescente) ou (coluna, decrescente, lambda linha: valor)
+    # quando a coluna é de uma tabela do join e não um atributo da própria linha.
+    return [(item[0], item[1], item[2] if len(item) > 2 else (lambda linha, nome=item[0].key: getattr(linha, nome)))
+            for item in ordem]
+
+def _condicao(ordem, valores, para_tras):
+    """Linhas depois (ou antes) de 'valores' na ordem dada: (a, b) < (va, vb) expandido,
+    respeitando a direção de cada coluna."""
+    alternativas = []
+    for i, (coluna, decrescente, _) in enumerate(ordem):
+        depois = decrescente != para_tras
+        comparacao = coluna < valores[i] if depois else coluna > valores[i]
+        alternativas.append(and_(*[c == v for (c, _, _), v in zip(ordem[:i], valores[:i])], comparacao))
+    return or_(*alternativas)
+
+class PaginaCursor:
+    """Página de uma listagem por cursor. Mesmos nomes de .paginate() onde faz sentido
+    (items, page, pages, total, has_next, has_prev) + next_cursor/prev_cursor para os links."""
+
+    def __init__(self, items, page, total, por_pagina, next_cursor, prev_cursor):
+        self.items = items
+        self.page = page
+        self.total = total
+        self.per_page = por_pagina
+        self.pages = max(page, -(-total // por_pagina))
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.has_next = next_cursor is not None
+        self.has_prev = prev_cursor is not None
+
+def _contar(query, chave_contagem):
+    if chave_contagem is None:
+        return query.order_by(None).count()
+    total = _contagens.obter(chave_contagem)
+    if total is None:
+        total = query.order_by(None).count()
+        _contagens.definir(chave_contagem, total, ttl=current_app.config.get('PAGINACAO_CONTAGEM_TTL', 60))
+    return total
+
+def _ler_cursor(cursor, colunas):
+    """(para_tras, pagina, valores) do token; token ausente ou inválido = primeira página."""
+    if cursor:
+        try:
+            direcao, pagina, codificados = _serializador().loads(cursor)
+            if len(codificados) == colunas and pagina > 1:
+                return direcao == 'antes', pagina, [_decodificar_valor(v) for v in codificados]
+        except (BadSignature, ValueError, TypeError):
+            pass
+    return False, 1, None
+
+def paginar(query, ordem, cursor=None, por_pagina=10, chave_contagem=None):
+    """Pagina 'query' na ordem [(coluna, decrescente[, extrair]), ...]; a última coluna
+    precisa ser única (o id) para a ordem ser total. 'cursor' é o token da URL.
+    chave_contagem identifica listagem + filtros no cache do total (None = conta sempre)."""
+    ordem = _normalizar(ordem)
+    para_tras, pagina, valores = _ler_cursor(cursor, len(ordem))
+
+    pagina_query = query
+    if valores is not None:
+        pagina_query = query.filter(_condicao(ordem, valores, para_tras))
+    criterios = [(c.asc() if decrescente == para_tras else c.desc()) for c, decrescente, _ in ordem]
+    linhas = pagina_query.order_by(*criterios).limit(por_pagina + 1).all()
+    mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if para_tras:
+        linhas.reverse()
+        if not mais:
+            pagina = 1  # voltou até o começo (a lista pode ter mudado no caminho)
+
+    def token(linha, direcao, numero):
+        return _serializador().dumps([direcao, numero, [_codificar_valor(extrair(linha)) for _, _, extrair in ordem]])
+
+    tem_proxima = True if para_tras else mais
+    tem_anterior = mais if para_tras else pagina > 1
+    proximo = token(linhas[-1], 'depois', pagina + 1) if linhas and tem_proxima else None
+    anterior = token(linhas[0], 'antes', pagina - 1) if linhas and tem_anterior else None
+
+    # Primeira página que já coube inteira: o total é conhecido sem COUNT
+    total = len(linhas) if pagina == 1 and not proximo else _contar(query, chave_contagem)
+    return PaginaCursor(linhas, pagina, total, por_pagina, proximo, anterior)
\ No newline at end of file
@@ -0,0 +1,235 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models import PlacarUsuario, PlacarDepartamento, PontuacaoDiaria, Usuario, Departamento, Resposta
+
+# Placar (leaderboard) incremental.
+# As rotas de ranking leem estas tabelas já somadas; quem grava Resposta aplica
+# a diferença de pontos/respostas/acertos com UPDATEs atômicos (sem ler-e-somar
+# em Python), então duas respostas simultâneas nunca se sobrescrevem.
+# Cada resposta também cai num balde diário (PontuacaoDiaria), o que deixa o
+# ranking da semana/mês em O(dias x usuários) em vez de varrer Resposta.
+
+def _acerto(pontos):
+    return 1 if (pontos or 0) > 0 else 0
+
+def dia_local(momento=None):
+    """Dia (UTC-3) em que a resposta conta para o ranking por período."""
+    return ((momento or datetime.utcnow()) - timedelta(hours=3)).date()
+
+def _departamento_do_usuario(usuario_id):
+    return db.session.query(Usuario.departamento_id).filter(Usuario.id == usuario_id).scalar()
+
+def _somar(modelo, filtro, valores_iniciais, **deltas):
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    atualizadas = modelo.query.filter_by(**filtro).update(
+        {campo: getattr(modelo, campo) + delta for campo, delta in deltas.items()},
+        synchronize_session=False
+    )
+    if atualizadas:
+        return
+    # Primeira pontuação: cria a linha (se outra requisição criou antes, soma nela)
+    try:
+        with db.session.begin_nested():
+            db.session.add(modelo(**filtro, **{**valores_iniciais, **deltas}))
+    except IntegrityError:
+        modelo.query.filter_by(**filtro).update(
+            {campo: getattr(modelo, campo) + delta for campo, delta in deltas.items()},
+            synchronize_session=False
+        )
+
+def aplicar(usuario_id, dia, departamento_id=None, pontos=0, respostas=0, acertos=0):
+    """Soma (ou subtrai, com valores negativos) nos placares do usuário, do setor e do dia."""
+    _somar(PontuacaoDiaria, {'usuario_id': usuario_id, 'dia': dia}, {},
+           pontos=pontos, respostas=respostas, acertos=acertos)
+    if departamento_id is None:
+        departamento_id = _departamento_do_usuario(usuario_id)
+    _somar(PlacarUsuario, {'usuario_id': usuario_id}, {'departamento_id': departamento_id},
+           pontos=pontos, respostas=respostas, acertos=acertos)
+    _somar(PlacarDepartamento, {'departamento_id': departamento_id}, {},
+           pontos=pontos, respostas=respostas, acertos=acertos)
+
+def registrar_resposta(resposta):
+    """Nova Resposta gravada (quiz ou atividade discursiva)."""
+    aplicar(resposta.usuario_id, dia_local(resposta.data_resposta),
+            pontos=resposta.pontos or 0, respostas=1, acertos=_acerto(resposta.pontos))
+
+def registrar_correcao(resposta, pontos_anteriores):
+    """Reavaliação (ex.: 100 -> 50 -> 0): aplica só a diferença."""
+    aplicar(resposta.usuario_id, dia_local(resposta.data_resposta),
+            pontos=(resposta.pontos or 0) - (pontos_anteriores or 0),
+            acertos=_acerto(resposta.pontos) - _acerto(pontos_anteriores))
+
+def remover_respostas_da_pergunta(pergunta_id):
+    """Antes de excluir as respostas de uma pergunta, desconta-as dos placares."""
+    respostas = db.session.query(
+        Resposta.usuario_id, Usuario.departamento_id, Resposta.data_resposta, Resposta.pontos
+    ).join(Usuario, Usuario.id == Resposta.usuario_id).filter(Resposta.pergunta_id == pergunta_id)
+
+    totais = defaultdict(lambda: [0, 0, 0])
+    for usuario_id, departamento_id, data_resposta, pontos in respostas:
+        total = totais[(usuario_id, departamento_id, dia_local(data_resposta))]
+        total[0] += pontos or 0
+        total[1] += 1
+        total[2] += _acerto(pontos)
+
+    for (usuario_id, departamento_id, dia), (pontos, qtd, acertos) in totais.items():
+        aplicar(usuario_id, dia, departamento_id, pontos=-pontos, respostas=-qtd, acertos=-acertos)
+
+def adicionar_usuario(usuario):
+    db.session.flush()
+    db.session.add(PlacarUsuario(usuario_id=usuario.id, departamento_id=usuario.departamento_id))
+    _somar(PlacarDepartamento, {'departamento_id': usuario.departamento_id}, {}, num_usuarios=1)
+
+def remover_usuario(usuario):
+    placar = db.session.get(PlacarUsuario, usuario.id)
+    if placar:
+        _somar(PlacarDepartamento, {'departamento_id': placar.departamento_id}, {},
+               pontos=-placar.pontos, respostas=-placar.respostas, acertos=-placar.acertos)
+        db.session.delete(placar)
+    PontuacaoDiaria.query.filter_by(usuario_id=usuario.id).delete(synchronize_session=False)
+    _somar(PlacarDepartamento, {'departamento_id': usuario.departamento_id}, {}, num_usuarios=-1)
+
+def mover_usuario(usuario, novo_departamento_id):
+    """Troca de setor: os pontos do usuário vão junto para o novo setor."""
+    novo_departamento_id = int(novo_departamento_id)
+    antigo = usuario.departamento_id
+    if antigo == novo_departamento_id:
+        return
+    placar = db.session.get(PlacarUsuario, usuario.id)
+    pontos, respostas, acertos = (placar.pontos, placar.respostas, placar.acertos) if placar else (0, 0, 0)
+    if placar:
+        placar.departamento_id = novo_departamento_id
+    _somar(PlacarDepartamento, {'departamento_id': antigo}, {},
+           pontos=-pontos, respostas=-respostas, acertos=-acertos, num_usuarios=-1)
+    _somar(PlacarDepartamento, {'departamento_id': novo_departamento_id}, {},
+           pontos=pontos, respostas=respostas, acertos=acertos, num_usuarios=1)
+
+def _agregado_usuarios():
+    """Totais calculados direto de Resposta (fonte da verdade)."""
+    return select(
+        Usuario.id,
+        Usuario.departamento_id,
+        func.coalesce(func.sum(Resposta.pontos), 0),
+        func.count(Resposta.id),
+        func.coalesce(func.sum(case((Resposta.pontos > 0, 1), else_=0)), 0)
+    ).select_from(Usuario).outerjoin(Resposta, Resposta.usuario_id == Usuario.id).group_by(
+        Usuario.id, Usuario.departamento_id
+    )
+
+def _baldes_diarios():
+    """Rollups diários recalculados de Resposta (lidos em blocos, agregados em Python
+    porque a conversão para o dia local não é portável entre SQLite e Postgres)."""
+    baldes = defaultdict(lambda: [0, 0, 0])
+    linhas = db.session.query(Resposta.usuario_id, Resposta.data_resposta, Resposta.pontos).execution_options(yield_per=5000)
+    for usuario_id, data_resposta, pontos in linhas:
+        balde = baldes[(usuario_id, dia_local(data_resposta))]
+        balde[0] += pontos or 0
+        balde[1] += 1
+        balde[2] += _acerto(pontos)
+    return baldes
+
+def reconstruir(tamanho_lote=1000):
+    """Recalcula os dois placares com dois INSERT ... SELECT e refaz os baldes diários."""
+    PontuacaoDiaria.query.delete(synchronize_session=False)
+    linhas = [{'usuario_id': u, 'dia': d, 'pontos': p, 'respostas': r, 'acertos': a}
+              for (u, d), (p, r, a) in _baldes_diarios().items()]
+    for inicio in range(0, len(linhas), tamanho_lote):
+        db.session.execute(insert(PontuacaoDiaria), linhas[inicio:inicio + tamanho_lote])
+
+    PlacarDepartamento.query.delete(synchronize_session=False)
+    PlacarUsuario.query.delete(synchronize_session=False)
+
+    db.session.execute(insert(PlacarUsuario).from_select(
+        ['usuario_id', 'departamento_id', 'pontos', 'respostas', 'acertos'], _agregado_usuarios()
+    ))
+    db.session.execute(insert(PlacarDepartamento).from_select(
+        ['departamento_id', 'pontos', 'respostas', 'acertos', 'num_usuarios'],
+        select(
+            PlacarUsuario.departamento_id,
+            func.sum(PlacarUsuario.pontos),
+            func.sum(PlacarUsuario.respostas),
+            func.sum(PlacarUsuario.acertos),
+            func.count(PlacarUsuario.usuario_id)
+        ).group_by(PlacarUsuario.departamento_id)
+    ))
+    db.session.commit()
+
+def verificar():
+    """Compara o placar salvo com o recalculado. Retorna a lista de divergências."""
+    esperado = {row[0]: tuple(row[1:]) for row in db.session.execute(_agregado_usuarios())}
+    salvo = {p.usuario_id: (p.departamento_id, p.pontos, p.respostas, p.acertos) for p in PlacarUsuario.query}
+
+    divergencias = []
+    for usuario_id in sorted(set(esperado) | set(salvo)):
+        if esperado.get(usuario_id) != salvo.get(usuario_id):
+            divergencias.append(('usuario', usuario_id, salvo.get(usuario_id), esperado.get(usuario_id)))
+
+    por_setor = {}
+    for departamento_id, pontos, respostas, acertos in esperado.values():
+        atual = por_setor.get(departamento_id, (0, 0, 0, 0))
+        por_setor[departamento_id] = (atual[0] + pontos, atual[1] + respostas, atual[2] + acertos, atual[3] + 1)
+    salvo_setor = {p.departamento_id: (p.pontos, p.respostas, p.acertos, p.num_usuarios)
+                   for p in PlacarDepartamento.query if p.num_usuarios or p.respostas}
+    for departamento_id in sorted(set(por_setor) | set(salvo_setor)):
+        if por_setor.get(departamento_id) != salvo_setor.get(departamento_id):
+            divergencias.append(('setor', departamento_id, salvo_setor.get(departamento_id), por_setor.get(departamento_id)))
+
+    baldes = {chave: tuple(valores) for chave, valores in _baldes_diarios().items()}
+    salvo_baldes = {(b.usuario_id, b.dia): (b.pontos, b.respostas, b.acertos)
+                    for b in PontuacaoDiaria.query if b.respostas}
+    for chave in sorted(set(baldes) | set(salvo_baldes)):
+        if baldes.get(chave) != salvo_baldes.get(chave):
+            divergencias.append(('dia', chave, salvo_baldes.get(chave), baldes.get(chave)))
+    return divergencias
+
+def remover_departamento(departamento_id):
+    PlacarDepartamento.query.filter_by(departamento_id=departamento_id).delete(synchronize_session=False)
+
+def _soma_periodo(inicio, fim):
+    return db.session.query(
+        PontuacaoDiaria.usuario_id.label('usuario_id'),
+        func.sum(PontuacaoDiaria.pontos).label('pontos'),
+        func.sum(PontuacaoDiaria.respostas).label('respostas'),
+        func.sum(PontuacaoDiaria.acertos).label('acertos')
+    ).filter(PontuacaoDiaria.dia.between(inicio, fim))
+
+def ranking_setores(inicio=None, fim=None):
+    """Setores ordenados pela média de pontos por membro (geral ou no período)."""
+    query = db.session.query(Departamento.id, Departamento.nome, PlacarDepartamento.num_usuarios)\
+        .join(PlacarDepartamento, PlacarDepartamento.departamento_id == Departamento.id)\
+        .filter(PlacarDepartamento.num_usuarios > 0)
+
+    if inicio is None:
+        pontos = PlacarDepartamento.pontos
+    else:
+        soma = _soma_periodo(inicio, fim).join(Usuario, Usuario.id == PontuacaoDiaria.usuario_id)\
+            .with_entities(Usuario.departamento_id.label('departamento_id'), func.sum(PontuacaoDiaria.pontos).label('pontos'))\
+            .group_by(Usuario.departamento_id).subquery()
+        query = query.outerjoin(soma, soma.c.departamento_id == Departamento.id)
+        pontos = func.coalesce(soma.c.pontos, 0)
+
+    return query.add_columns(pontos.label('pontos_totais'))\
+        .order_by((pontos * 1.0 / PlacarDepartamento.num_usuarios).desc()).all()
+
+def ranking_usuarios(departamento_id, inicio=None, fim=None):
+    """Membros do setor com pontos, respostas e acertos (geral ou no período)."""
+    if inicio is None:
+        fonte = PlacarUsuario.__table__.alias('fonte')
+    else:
+        membros = db.session.query(Usuario.id).filter(Usuario.departamento_id == departamento_id)
+        fonte = _soma_periodo(inicio, fim).filter(PontuacaoDiaria.usuario_id.in_(membros))\
+            .group_by(PontuacaoDiaria.usuario_id).subquery('fonte')
+
+    return db.session.query(
+        Usuario.nome,
+        func.coalesce(fonte.c.pontos, 0).label('pontos_totais'),
+        func.coalesce(fonte.c.respostas, 0).label('total_respostas'),
+        func.coalesce(fonte.c.acertos, 0).label('total_acertos')
+    ).outerjoin(fonte, fonte.c.usuario_id == Usuario.id)\
+     .filter(Usuario.departamento_id == departamento_id)\
+     .order_by(Usuario.nome).all()
@@ -0,0 +1,41 @@
+import secrets
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import make_transient_to_detached
+from .extensions import db
+from .models import Resposta
+
+# Gravação de uma resposta nova num único comando: INSERT ... ON CONFLICT DO NOTHING
+# sobre o índice único (usuario_id, pergunta_id). Um envio repetido (duplo clique,
+# botão voltar, reenvio de conexão lenta) não grava nada, sem erro nem rollback:
+# quem chamou recebe None e decide o que mostrar.
+#
+# O quiz manda junto um token_envio (gerado ao exibir a pergunta, campo escondido
+# do quiz.html) que fica salvo na resposta. O mesmo token chegando de novo é a
+# repetição do mesmo envio: a rota mostra o resultado já gravado, não um aviso.
+
+_INSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+def novo_token():
+    return secrets.token_urlsafe(16)
+
+def inserir(**valores):
+    """Grava a Resposta se o usuário ainda não respondeu a pergunta. Retorna a Resposta
+    (já na sessão, sem nova leitura do banco) ou None se a pergunta já tinha resposta."""
+    valores.setdefault('data_resposta', datetime.utcnow())
+    comando = _INSERT[db.engine.dialect.name](Resposta).values(**valores).on_conflict_do_nothing(
+        index_elements=['usuario_id', 'pergunta_id']
+    ).returning(Resposta.id)
+    resposta_id = db.session.execute(comando).scalar()
+    if resposta_id is None:
+        return None
+    resposta = Resposta(id=resposta_id, **valores)
+    make_transient_to_detached(resposta)  # a linha já existe: entra na sessão sem outro INSERT
+    db.session.add(resposta)
+    return resposta
+
+def resultado(resposta):
+    """'correto' | 'incorreto' | 'esgotado' de uma resposta do quiz já gravada."""
+    if resposta.resposta_dada == 'esgotado':
+        return 'esgotado'
+    return 'correto' if (resposta.pontos or 0) > 0 else 'incorreto'
\ No newline at end of file
@@ -1,15 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, request, session, flash, send_file
-from app.models import Usuario, Departamento, Administrador, Pergunta, Resposta, ImagemPergunta, AnexoResposta
+from flask import Blueprint, render_template, redirect, url_for, request, session, flash, send_file, current_app, Response, stream_with_context, jsonify
+from app.models import Usuario, Departamento, Administrador, Pergunta, Resposta, ImagemPergunta, AnexoResposta, ContadorPendencias, PerguntaElegivel, PerguntaEmitida, TarefaRelatorio
 from app.extensions import db
-from app.utils import validar_linha, allowed_file, _gerar_dados_relatorio, get_texto_da_opcao
+from app.utils import allowed_file, _gerar_dados_relatorio, get_texto_da_opcao
 from sqlalchemy import or_, func, case, desc, extract
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from collections import defaultdict
 import pandas as pd
 import io
+import os
 import cloudinary.uploader
 from app.utils import enviar_notificacao_nova_pergunta
+from app.contadores import registrar_correcao, registrar_nova_pergunta, invalidar_contadores, departamentos_da_pergunta
+from app import elegibilidade, fila_quiz, placar, tarefas, metricas, temas, categorias, paginacao
+from app.carregamento import com_perfil
+from app.exportacao import existem_respostas, gerar_csv_detalhado, gerar_xlsx_detalhado, gerar_xlsx_desempenho
+from app.importacao import (criar_importacao, obter_importacao, pagina_de_linhas, atualizar_linhas,
+                            importar_staging, descartar_importacao, descartar_importacoes_do_admin,
+                            expirar_importacoes, ler_planilha)
 from app.models import Usuario
 
 # Cria o Blueprint com o prefixo '/admin'
@@ -18,11 +26,9 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 # --- DASHBOARD PRINCIPAL (SEM PERGUNTAS) ---
 @admin_bp.route('/', methods=['GET', 'POST'])
 def pagina_admin():
-    # Limpeza de sessão de CSV
-    if 'csv_data' in session:
-        session.pop('csv_data', None)
-        session.pop('has_valid_rows', None)
-        session.pop('csv_headers', None)
+    # Limpeza da importação de planilha em andamento (Cancelar no preview volta para cá)
+    if 'importacao_id' in session:
+        descartar_importacao(session.pop('importacao_id'))
 
     esta_logado = session.get('admin_logged_in', False)
     
@@ -77,12 +83,8 @@ def pagina_admin_perguntas():
     # --- FILTRO 1: Setor ---
     filtro_setor_id = request.args.get('filtro_setor', type=int)
     if filtro_setor_id:
-        query_perguntas = query_perguntas.filter(
-            or_(
-                Pergunta.para_todos_setores == True,
-                Pergunta.departamentos.any(Departamento.id == filtro_setor_id)
-            )
-        )
+        sq_setor = db.session.query(PerguntaElegivel.pergunta_id).filter(PerguntaElegivel.departamento_id == filtro_setor_id)
+        query_perguntas = query_perguntas.filter(Pergunta.id.in_(sq_setor))
         filtros_ativos['filtro_setor'] = filtro_setor_id
 
     # --- FILTRO 2: Tipo de Pergunta
@@ -91,22 +93,21 @@ def pagina_admin_perguntas():
         query_perguntas = query_perguntas.filter(Pergunta.tipo == filtro_tipo)
         filtros_ativos['filtro_tipo'] = filtro_tipo
 
-    # --- PAGINAÇÃO ---
-    page = request.args.get('page', 1, type=int)
+    # --- PAGINAÇÃO (por cursor) ---
+    cursor = request.args.get('cursor')
     per_page = 10 
     
     # Ordena por data (mais recente primeiro) e depois por ID
-    perguntas_pagination = query_perguntas.order_by(
-        Pergunta.data_liberacao.desc(), 
-        Pergunta.id.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
+    perguntas_pagination = paginacao.paginar(
+        query_perguntas, [(Pergunta.data_liberacao, True), (Pergunta.id, True)], cursor, per_page,
+        chave_contagem=('admin_perguntas', filtro_setor_id, filtro_tipo))
 
-    categorias_existentes = db.session.query(Pergunta.categoria).distinct().all()
-    lista_categorias = [c[0] for c in categorias_existentes if c[0]]
+    lista_categorias = categorias.nomes()
 
     return render_template('admin_perguntas.html', 
                            perguntas=perguntas_pagination, 
                            departamentos=departamentos,
+                           categorias_db=lista_categorias,
                            filtros=filtros_ativos) # Passamos os filtros para o HTML
 
 # --- CRUD: ADMINISTRADORES ---
@@ -166,6 +167,9 @@ def excluir_admin(admin_id):
 
     admin = Administrador.query.get_or_404(admin_id)
     try:
+        # Relatórios pedidos por ele continuam na fila/disponíveis, só sem dono
+        TarefaRelatorio.query.filter_by(admin_id=admin.id).update({'admin_id': None}, synchronize_session=False)
+        descartar_importacoes_do_admin(admin.id)
         db.session.delete(admin)
         db.session.commit()
         flash(f'Administrador "{admin.nome}" excluído com sucesso.', 'success')
@@ -183,6 +187,7 @@ def adicionar_setor():
     if nome_setor and not Departamento.query.filter_by(nome=nome_setor).first():
         novo_depto = Departamento(nome=nome_setor)
         db.session.add(novo_depto)
+        elegibilidade.adicionar_departamento(novo_depto)
         db.session.commit()
         flash(f'Setor "{nome_setor}" adicionado com sucesso!', 'success')
     else:
@@ -196,6 +201,8 @@ def excluir_setor(departamento_id):
     if depto.usuarios:
         flash(f'Não é possível excluir o setor "{depto.nome}" pois ele possui usuários.', 'danger')
     else:
+        elegibilidade.remover_departamento(depto.id)
+        placar.remover_departamento(depto.id)
         db.session.delete(depto)
         db.session.commit()
         flash(f'Setor "{depto.nome}" excluído com sucesso.', 'success')
@@ -224,6 +231,7 @@ def adicionar_usuario():
         departamento_id=request.form['departamento_id']
     )
     db.session.add(novo_usuario)
+    placar.adicionar_usuario(novo_usuario)
     db.session.commit()
     flash('Usuário adicionado com sucesso!', 'success')
     return redirect(url_for('admin.pagina_admin'))
@@ -255,7 +263,15 @@ def atualizar_usuario(usuario_id):
     usuario.nome = request.form['nome']
     usuario.email = novo_email or None
     usuario.codigo_acesso = novo_codigo
+    mudou_setor = str(usuario.departamento_id) != str(request.form['departamento_id'])
+    if mudou_setor:
+        invalidar_contadores(usuario_id=usuario.id)
+        fila_quiz.invalidar_usuario(usuario.id)
+        placar.mover_usuario(usuario, request.form['departamento_id'])
     usuario.departamento_id = request.form['departamento_id']
+    if mudou_setor:
+        db.session.flush()
+        temas.recalcular_usuarios([usuario.id])  # o que ele respondeu e o novo setor não vê deixa de contar
     
     db.session.commit()
     flash(f'Usuário "{usuario.nome}" atualizado com sucesso!', 'success')
@@ -289,7 +305,11 @@ def excluir_usuario(usuario_id):
             # 3. Agora que está sem anexos, podemos apagar a resposta
             db.session.delete(resposta)
             
-        # 4. Finalmente, apaga o usuário
+        # 4. Finalmente, apaga o usuário (e o contador do dashboard e os inícios do cronômetro)
+        ContadorPendencias.query.filter_by(usuario_id=usuario.id).delete()
+        PerguntaEmitida.query.filter_by(usuario_id=usuario.id).delete()
+        placar.remover_usuario(usuario)
+        temas.remover_usuario(usuario.id)
         db.session.delete(usuario)
         db.session.commit()
         
@@ -307,9 +327,9 @@ def editar_pergunta(pergunta_id):
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
     pergunta = Pergunta.query.get_or_404(pergunta_id)
     todos_departamentos = Departamento.query.order_by(Departamento.nome).all()
-    categorias_existentes = db.session.query(Pergunta.categoria).distinct().all()
-    lista_categorias = [c[0] for c in categorias_existentes if c[0]]
-    return render_template('edit_question.html', pergunta=pergunta, todos_departamentos=todos_departamentos)
+    lista_categorias = categorias.nomes()
+    return render_template('edit_question.html', pergunta=pergunta, todos_departamentos=todos_departamentos,
+                           categorias_db=lista_categorias)
 
 @admin_bp.route('/add_question', methods=['POST'])
 def adicionar_pergunta():
@@ -324,7 +344,7 @@ def adicionar_pergunta():
         flash('Data inválida.', 'danger')
         return redirect(url_for('admin.pagina_admin_perguntas'))
 
-    categoria_recebida = request.form.get('categoria', 'Geral') # Pega do form ou usa 'Geral'
+    categoria_recebida = categorias.obter_ou_criar(request.form.get('categoria', 'Geral')) # Pega do form ou usa 'Geral'
     nova_pergunta = Pergunta(
         tipo=tipo,
         texto=request.form.get('texto'),
@@ -372,7 +392,11 @@ def adicionar_pergunta():
         nova_pergunta.opcao_c = None
         nova_pergunta.opcao_d = None
 
+    elegibilidade.sincronizar_pergunta(nova_pergunta)
+    registrar_nova_pergunta(nova_pergunta)
     db.session.commit()
+    fila_quiz.invalidar()
+    temas.invalidar_totais()
 
     # --- INÍCIO DA LÓGICA DE NOTIFICAÇÃO ---
 #    try:
@@ -436,10 +460,11 @@ def notificar_lote():
 def atualizar_pergunta(pergunta_id):
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
     pergunta = Pergunta.query.get_or_404(pergunta_id)
+    setores_antes = departamentos_da_pergunta(pergunta)
     
     pergunta.tipo = request.form.get('tipo')
     pergunta.texto = request.form.get('texto')
-    pergunta.categoria = request.form.get('categoria', 'Geral')
+    pergunta.categoria = categorias.obter_ou_criar(request.form.get('categoria', 'Geral'))
     pergunta.explicacao = request.form.get('explicacao')
     
     try:
@@ -481,8 +506,20 @@ def atualizar_pergunta(pergunta_id):
     else:
         pergunta.resposta_correta, pergunta.tempo_limite = None, None
         pergunta.opcao_a, pergunta.opcao_b, pergunta.opcao_c, pergunta.opcao_d = None, None, None, None
+
+    elegibilidade.sincronizar_pergunta(pergunta)
+    temas.recalcular_por_perguntas([pergunta.id])
+
+    # Tipo, data ou setores podem ter mudado: recalcula os contadores de quem via antes ou vê agora
+    setores_depois = departamentos_da_pergunta(pergunta)
+    if setores_antes is None or setores_depois is None:
+        invalidar_contadores()
+    else:
+        invalidar_contadores(set(setores_antes) | set(setores_depois))
         
     db.session.commit()
+    fila_quiz.invalidar()
+    temas.invalidar_totais()
     flash('Pergunta atualizada com sucesso!', 'success')
     return redirect(url_for('admin.pagina_admin_perguntas'))
 
@@ -504,9 +541,16 @@ def excluir_pergunta(pergunta_id):
     except Exception:
         pass
 
+    invalidar_contadores(departamentos_da_pergunta(pergunta))
+    elegibilidade.remover_pergunta(pergunta.id)
+    temas.recalcular_por_perguntas([pergunta.id])
+    placar.remover_respostas_da_pergunta(pergunta.id)
     Resposta.query.filter_by(pergunta_id=pergunta.id).delete()
+    PerguntaEmitida.query.filter_by(pergunta_id=pergunta.id).delete()
     db.session.delete(pergunta)
     db.session.commit()
+    fila_quiz.invalidar()
+    temas.invalidar_totais()
     flash('Pergunta e todas as suas respostas foram excluídas com sucesso.', 'success')
     return redirect(url_for('admin.pagina_admin_perguntas'))
 
@@ -521,31 +565,17 @@ def upload_planilha():
         return redirect(url_for('admin.pagina_admin_perguntas'))
     
     try:
-        if arquivo.filename.lower().endswith('.csv'):
-            df = pd.read_csv(arquivo, sep=None, engine='python', encoding='utf-8')
-        else:
-            df = pd.read_excel(arquivo)
-            
-        df = df.fillna('')
-        if 'data_liberacao' in df.columns:
-            df['data_liberacao'] = pd.to_datetime(df['data_liberacao'], errors='coerce').dt.strftime('%d/%m/%Y').fillna(df['data_liberacao'])
-
-        for col in df.columns:
-            df[col] = df[col].astype(str).str.replace(r'\.0$', '', regex=True)
-
-        headers = df.columns.tolist()
-        dados_da_planilha = df.to_dict(orient='records')
-        
-        validated_data = []
-        has_valid_rows = False
-        for row in dados_da_planilha:
-            is_valid, errors = validar_linha(row)
-            if is_valid: has_valid_rows = True
-            validated_data.append({'data': row, 'is_valid': is_valid, 'errors': errors})
-            
-        session['csv_headers'] = headers
-        session['csv_data'] = validated_data
-        session['has_valid_rows'] = has_valid_rows
+        # Leitura em streaming: blocos normalizados e validados vão direto para o staging
+        headers, validated_data = ler_planilha(arquivo.stream, arquivo.filename)
+        if not headers:
+            flash('A planilha está vazia.', 'warning')
+            return redirect(url_for('admin.pagina_admin_perguntas'))
+
+        # Staging no servidor: a sessão guarda só o ID da importação
+        expirar_importacoes()
+        if 'importacao_id' in session:
+            descartar_importacao(session.pop('importacao_id'))
+        session['importacao_id'] = criar_importacao(headers, validated_data, session.get('admin_id'))
         
         return redirect(url_for('admin.preview_csv'))
         
@@ -556,15 +586,29 @@ def upload_planilha():
 @admin_bp.route('/preview_csv')
 def preview_csv():
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
-    validated_data = session.get('csv_data', [])
-    has_valid_rows = session.get('has_valid_rows', False)
-    headers = session.get('csv_headers', [])
-    return render_template('preview_csv.html', data=validated_data, has_valid_rows=has_valid_rows, headers=headers)
+    importacao = obter_importacao(session.get('importacao_id'))
+    if not importacao:
+        flash('A importação expirou ou não foi encontrada. Envie a planilha novamente.', 'warning')
+        return redirect(url_for('admin.pagina_admin_perguntas'))
+
+    page = request.args.get('page', 1, type=int)
+    linhas_pagination = pagina_de_linhas(importacao.id, page, current_app.config.get('IMPORTACAO_LINHAS_POR_PAGINA', 50))
+    return render_template('preview_csv.html', 
+                           data=linhas_pagination.items, 
+                           linhas=linhas_pagination,
+                           importacao=importacao,
+                           has_valid_rows=importacao.linhas_validas > 0, 
+                           headers=importacao.headers)
 
 @admin_bp.route('/processar_edicao_csv', methods=['POST'])
 def processar_edicao_csv():
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
 
+    importacao = obter_importacao(session.get('importacao_id'))
+    if not importacao:
+        flash('A importação expirou ou não foi encontrada. Envie a planilha novamente.', 'warning')
+        return redirect(url_for('admin.pagina_admin_perguntas'))
+
     rows_data = defaultdict(dict)
     for key, value in request.form.items():
         if key.startswith('row-'):
@@ -573,50 +617,24 @@ def processar_edicao_csv():
             col_name = parts[2]
             rows_data[row_index][col_name] = value
 
-    success_count = 0
-    error_count = 0
-    
-    for row_index in sorted(rows_data.keys()):
-        row = rows_data[row_index]
-        is_valid, errors = validar_linha(row) 
-        
-        if is_valid:
-            try:
-                data_obj = datetime.strptime(row['data_liberacao'], '%d/%m/%Y').date()
-                nova_pergunta = Pergunta(
-                    tipo=row['tipo'], 
-                    texto=row['texto'],
-                    explicacao=row.get('explicacao'),
-                    opcao_a=row.get('opcao_a') or None, 
-                    opcao_b=row.get('opcao_b') or None,
-                    opcao_c=row.get('opcao_c') or None, 
-                    opcao_d=row.get('opcao_d') or None,
-                    resposta_correta=row.get('resposta_correta') or None, 
-                    data_liberacao=data_obj,
-                    tempo_limite=int(float(row['tempo_limite'])) if row.get('tempo_limite') else None
-                )
-                campo_setor = row.get('setor', '').strip()
-                if not campo_setor or campo_setor.lower() == 'todos':
-                    nova_pergunta.para_todos_setores = True
-                else:
-                    nova_pergunta.para_todos_setores = False
-                    nomes_setores = [s.strip() for s in campo_setor.split(',') if s.strip()]
-                    if nomes_setores:
-                        deptos = Departamento.query.filter(Departamento.nome.in_(nomes_setores)).all()
-                        nova_pergunta.departamentos = deptos
-                
-                db.session.add(nova_pergunta)
-                db.session.commit()
-                success_count += 1
-            except Exception:
-                db.session.rollback()
-                error_count += 1
-        else:
-            error_count += 1
+    # Salva as correções da página atual no staging
+    atualizar_linhas(importacao, rows_data)
+
+    # Navegação entre páginas do preview (sem importar ainda)
+    ir_para = request.form.get('ir_para', type=int)
+    if ir_para:
+        return redirect(url_for('admin.preview_csv', page=ir_para))
 
-    session.pop('csv_data', None)
-    session.pop('has_valid_rows', None)
-    session.pop('csv_headers', None)
+    # OTIMIZAÇÃO: Importação em lote (setores resolvidos de uma vez, inserts em massa, commit por bloco)
+    success_count, error_count = importar_staging(importacao)
+
+    if success_count > 0:
+        invalidar_contadores()
+        db.session.commit()
+        fila_quiz.invalidar()
+        temas.invalidar_totais()
+
+    descartar_importacao(session.pop('importacao_id'))
     
     if error_count > 0:
         flash(f'Importação parcial: {success_count} salvas. {error_count} ignoradas.', 'warning')
@@ -630,17 +648,22 @@ def processar_edicao_csv():
 def pagina_correcoes():
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
     
-    usuarios_disponiveis = Usuario.query.order_by(Usuario.nome).all()
+    # O filtro mostra o setor de cada usuário: carrega junto (sem uma consulta por setor)
+    usuarios_disponiveis = Usuario.query.options(joinedload(Usuario.departamento)).order_by(Usuario.nome).all()
     usuario_selecionado_id = request.args.get('usuario_id', type=int)
     status_selecionado = request.args.get('status', 'pendente')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 10 
     
     query = Resposta.query.join(Pergunta).filter(Pergunta.tipo == 'discursiva')
     if status_selecionado != 'todos': query = query.filter(Resposta.status_correcao == status_selecionado)
     if usuario_selecionado_id: query = query.filter(Resposta.usuario_id == usuario_selecionado_id)
     
-    respostas_pagination = query.join(Usuario).order_by(Resposta.data_resposta.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    # Perfil de carregamento: usuário/setor/pergunta/imagens/anexos em número fixo de consultas
+    query = com_perfil(query, 'correcoes')
+    respostas_pagination = paginacao.paginar(
+        query.join(Usuario), [(Resposta.data_resposta, True), (Resposta.id, True)], cursor, per_page,
+        chave_contagem=('correcoes', status_selecionado, usuario_selecionado_id))
     
     return render_template('correcoes.html', 
                            respostas=respostas_pagination, 
@@ -656,11 +679,15 @@ def corrigir_resposta(resposta_id):
     feedback_texto = request.form.get('feedback', '')
     
     if novo_status in ['correto', 'incorreto', 'parcialmente_correto']:
+        status_anterior = resposta.status_correcao
+        pontos_anteriores = resposta.pontos
         resposta.status_correcao = novo_status
         resposta.feedback_admin = feedback_texto
         if novo_status == 'correto': resposta.pontos = 100
         elif novo_status == 'parcialmente_correto': resposta.pontos = 50
         else: resposta.pontos = 0
+        registrar_correcao(resposta, status_anterior)
+        placar.registrar_correcao(resposta, pontos_anteriores)
         db.session.commit()
         flash('Resposta avaliada com sucesso!', 'success')
     return redirect(url_for('admin.pagina_correcoes'))
@@ -680,19 +707,15 @@ def pagina_relatorios():
 def exportar_relatorios():
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
     depto_selecionado_id = request.args.get('departamento_id', type=int)
-    dados_relatorio = _gerar_dados_relatorio(depto_selecionado_id)
-    if not dados_relatorio:
-        flash("Nenhum dado para exportar.", "warning")
-        return redirect(url_for('admin.pagina_relatorios'))
 
-    df = pd.DataFrame(dados_relatorio)
-    df = df.rename(columns={'nome': 'Colaborador', 'setor': 'Setor', 'total_respostas': 'Respostas Totais', 'respostas_corretas': 'Respostas Corretas', 'aproveitamento': 'Aproveitamento (%)', 'pontuacao_total': 'Pontuação Total'})
-    df['Aproveitamento (%)'] = df['Aproveitamento (%)'].map('{:.1f}%'.format)
+    # Com RELATORIOS_EM_SEGUNDO_PLANO=1 o arquivo é gerado pelo worker_relatorios.py, fora do gunicorn
+    if current_app.config.get('RELATORIOS_EM_SEGUNDO_PLANO'):
+        return _enfileirar_relatorio('desempenho', {'departamento_id': depto_selecionado_id}, 'admin.pagina_relatorios')
 
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Relatorio de Desempenho')
-    output.seek(0)
+    output = gerar_xlsx_desempenho(depto_selecionado_id)
+    if output is None:
+        flash("Nenhum dado para exportar.", "warning")
+        return redirect(url_for('admin.pagina_relatorios'))
     return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='relatorio_desempenho_quiz.xlsx')
 
 @admin_bp.route('/relatorios/exportar_detalhado')
@@ -704,60 +727,82 @@ def exportar_respostas_detalhado():
     usuario_selecionado_id = request.args.get('usuario_id', type=int)
     filtro_tipo = request.args.get('filtro_tipo', 'todos')
     filtro_acertos = request.args.get('filtro_acertos', 'erros')
+    formato = request.args.get('formato', 'xlsx')
 
-    query = Resposta.query.join(Usuario).join(Departamento).join(Pergunta)
-
-    # Aplica filtros
-    if depto_selecionado_id: query = query.filter(Usuario.departamento_id == depto_selecionado_id)
-    if usuario_selecionado_id: query = query.filter(Resposta.usuario_id == usuario_selecionado_id)
-    
-    if filtro_tipo and filtro_tipo != 'todos':
-        query = query.filter(Pergunta.tipo == filtro_tipo)
+    filtros = dict(departamento_id=depto_selecionado_id, usuario_id=usuario_selecionado_id,
+                   filtro_tipo=filtro_tipo, filtro_acertos=filtro_acertos)
 
-    if filtro_acertos == 'acertos':
-        query = query.filter(or_(Resposta.pontos > 0, Resposta.status_correcao.in_(['correto', 'parcialmente_correto'])))
-    elif filtro_acertos == 'erros':
-        query = query.filter(or_(Resposta.pontos == 0, Resposta.status_correcao == 'incorreto'))
-
-    todas_as_respostas = query.order_by(Departamento.nome, Usuario.nome, Resposta.data_resposta).all()
-
-    if not todas_as_respostas:
+    if not existem_respostas(**filtros):
         flash("Nenhuma resposta encontrada para exportar com os filtros selecionados.", "warning")
         return redirect(url_for('admin.pagina_analytics'))
 
-    # Gera Excel (Igual ao anterior)
-    dados_para_planilha = []
-    for r in todas_as_respostas:
-        if r.pergunta.tipo == 'discursiva':
-            resposta_dada = r.texto_discursivo
-            resposta_correta = '(Avaliação Manual)'
-            status = r.status_correcao
-        else:
-            resposta_dada = get_texto_da_opcao(r.pergunta, r.resposta_dada)
-            resposta_correta = get_texto_da_opcao(r.pergunta, r.pergunta.resposta_correta)
-            status = "Correto" if (r.pontos or 0) > 0 else "Incorreto"
-
-        dados_para_planilha.append({
-            'Colaborador': r.usuario.nome,
-            'Setor': r.usuario.departamento.nome,
-            'Data da Resposta': (r.data_resposta - timedelta(hours=3)).strftime('%d/%m/%Y %H:%M'),
-            'Pergunta': r.pergunta.texto,
-            'Tipo de Pergunta': r.pergunta.tipo,
-            'Resposta Dada': resposta_dada,
-            'Resposta Correta': resposta_correta,
-            'Status/Resultado': status,
-            'Pontos': r.pontos or 0,
-            'Feedback do Admin': r.feedback_admin or ''
-        })
-        
-    df = pd.DataFrame(dados_para_planilha)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Relatorio_Completo')
-    output.seek(0)
+    if current_app.config.get('RELATORIOS_EM_SEGUNDO_PLANO'):
+        return _enfileirar_relatorio('detalhado', filtros, 'admin.pagina_analytics', formato)
 
+    # OTIMIZAÇÃO: Exportação em streaming (consulta em blocos, sem montar lista/DataFrame na memória)
+    if formato == 'csv':
+        return Response(stream_with_context(gerar_csv_detalhado(**filtros)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=relatorio_completo_respostas.csv'})
+
+    output = gerar_xlsx_detalhado(**filtros)
     return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='relatorio_completo_respostas.xlsx')
 
+def _enfileirar_relatorio(tipo, parametros, pagina_origem, formato='xlsx'):
+    try:
+        tarefa_id = tarefas.enfileirar(tipo, parametros, formato, session.get('admin_id'))
+    except tarefas.LimiteDeTarefas as e:
+        flash(str(e), 'warning')
+        return redirect(url_for(pagina_origem))
+    flash('Relatório enviado para a fila. Ele será gerado em segundo plano.', 'info')
+    return redirect(url_for('admin.status_relatorio', tarefa_id=tarefa_id))
+
+# --- MÉTRICAS DE DESEMPENHO ---
+@admin_bp.route('/metrics')
+def pagina_metricas():
+    if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
+    rotas = metricas.resumo()
+    if request.args.get('formato') == 'json':
+        return jsonify({'ativas': metricas.ativas(current_app), 'rotas': rotas})
+    return render_template('admin_metricas.html', rotas=rotas, ativas=metricas.ativas(current_app))
+
+@admin_bp.route('/metrics/limpar', methods=['POST'])
+def limpar_metricas():
+    if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
+    metricas.limpar()
+    flash('Métricas zeradas.', 'success')
+    return redirect(url_for('admin.pagina_metricas'))
+
+# --- RELATÓRIOS EM SEGUNDO PLANO ---
+@admin_bp.route('/relatorios/tarefas/<tarefa_id>')
+def status_relatorio(tarefa_id):
+    if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
+    tarefa = tarefas.obter(tarefa_id)
+    if not tarefa:
+        flash('Relatório não encontrado (pode ter expirado).', 'warning')
+        return redirect(url_for('admin.pagina_relatorios'))
+    return render_template('relatorio_tarefa.html', tarefa=tarefa, situacao=tarefas.situacao(tarefa))
+
+@admin_bp.route('/relatorios/tarefas/<tarefa_id>/status')
+def status_relatorio_json(tarefa_id):
+    if not session.get('admin_logged_in'): return jsonify({'erro': 'não autenticado'}), 401
+    tarefa = tarefas.obter(tarefa_id)
+    if not tarefa:
+        return jsonify({'erro': 'tarefa não encontrada'}), 404
+    dados = tarefas.situacao(tarefa)
+    if tarefa.status == 'concluido':
+        dados['download_url'] = url_for('admin.baixar_relatorio', tarefa_id=tarefa.id)
+    return jsonify(dados)
+
+@admin_bp.route('/relatorios/tarefas/<tarefa_id>/download')
+def baixar_relatorio(tarefa_id):
+    if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
+    tarefa = tarefas.obter(tarefa_id)
+    if not tarefa or tarefa.status != 'concluido' or not tarefa.arquivo or not os.path.exists(tarefa.arquivo):
+        flash('Arquivo indisponível. Gere o relatório novamente.', 'warning')
+        return redirect(url_for('admin.pagina_relatorios'))
+    mimetype = 'text/csv' if tarefa.formato == 'csv' else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return send_file(tarefa.arquivo, mimetype=mimetype, as_attachment=True, download_name=tarefas.nome_download(tarefa))
+
 @admin_bp.route('/analytics')
 def pagina_analytics():
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
@@ -813,11 +858,17 @@ def pagina_analytics():
     if usuario_selecionado_id: query_detalhada = query_detalhada.filter(Resposta.usuario_id == usuario_selecionado_id)
     if depto_selecionado_id: query_detalhada = query_detalhada.filter(Usuario.departamento_id == depto_selecionado_id)
     
-    # Paginação
-    page = request.args.get('page', 1, type=int)
+    # Paginação por cursor (setor, usuário, data, id)
+    cursor = request.args.get('cursor')
     per_page = 10 
     
-    respostas_pagination = query_detalhada.order_by(Departamento.nome, Usuario.nome, Resposta.data_resposta.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    query_detalhada = com_perfil(query_detalhada, 'analytics')
+    respostas_pagination = paginacao.paginar(query_detalhada, [
+        (Departamento.nome, False, lambda r: r.usuario.departamento.nome),
+        (Usuario.nome, False, lambda r: r.usuario.nome),
+        (Resposta.data_resposta, True),
+        (Resposta.id, True),
+    ], cursor, per_page, chave_contagem=('analytics', filtro_tipo, filtro_acertos, usuario_selecionado_id, depto_selecionado_id))
     
     # Agrupamento Visual
     dados_agrupados = defaultdict(lambda: defaultdict(list))
@@ -848,10 +899,12 @@ def pagina_analytics():
 def init_db(secret_key):
     if secret_key != 'resetar-banco-123': return "Chave secreta inválida.", 403
     try:
-        from app.models import Departamento, Usuario, Pergunta, Resposta, Administrador
-        db.drop_all()
-        db.create_all()
-        return "<h1>Banco de dados reinicializado com sucesso!</h1>"
+        # Aplica as migrações pendentes (app/migracoes); nunca apaga os dados
+        from app import migracoes
+        feitas = migracoes.aplicar_pendentes(progresso=None)
+        if not feitas:
+            return "<h1>Banco de dados já está na última versão.</h1>"
+        return f"<h1>Banco de dados atualizado!</h1><p>Migrações aplicadas: {', '.join(feitas)}</p>"
     except Exception as e:
         return f"<h1>Ocorreu um erro:</h1><p>{e}</p>", 500
 
@@ -861,10 +914,7 @@ def gerenciar_categorias():
     
     # Busca categorias e conta quantas perguntas existem em cada uma
     # Ex: [('Vendas', 15), ('Sincronização', 3)]
-    categorias_stats = db.session.query(
-        Pergunta.categoria, 
-        func.count(Pergunta.id)
-    ).group_by(Pergunta.categoria).order_by(Pergunta.categoria).all()
+    categorias_stats = categorias.estatisticas()
     
     return render_template('admin_categorias.html', estatisticas=categorias_stats)
 
@@ -876,16 +926,44 @@ def renomear_categoria():
     novo_nome = request.form.get('novo_nome')
     
     if nome_antigo and novo_nome:
-        # Atualiza TODAS as perguntas que tinham o nome antigo
-        perguntas = Pergunta.query.filter_by(categoria=nome_antigo).all()
-        for p in perguntas:
-            p.categoria = novo_nome
-        
-        db.session.commit()
-        flash(f'Categoria "{nome_antigo}" renomeada para "{novo_nome}" em {len(perguntas)} perguntas.', 'success')
+        # Um UPDATE na categoria (ou, se o novo nome já existe, junta as duas)
+        qtd = categorias.renomear(nome_antigo, novo_nome)
+        if qtd is not None:
+            db.session.commit()
+            fila_quiz.invalidar()
+            temas.invalidar_totais()
+            flash(f'Categoria "{nome_antigo}" renomeada para "{novo_nome}" em {qtd} perguntas.', 'success')
     
     return redirect(url_for('admin.gerenciar_categorias'))
 
+@admin_bp.route('/categorias/juntar', methods=['POST'])
+def juntar_categorias():
+    if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
+
+    origens = request.form.getlist('origens')
+    destino = (request.form.get('destino') or '').strip()
+
+    if origens and destino and request.form.get('simular'):
+        # Prévia: só conta, e devolve a tela com as mesmas categorias marcadas para confirmar
+        qtd = categorias.juntar(origens, destino, simular=True)
+        return render_template('admin_categorias.html', estatisticas=categorias.estatisticas(),
+                               simulacao=qtd, marcadas=origens, destino=destino)
+    if origens and destino:
+        # Um UPDATE por tabela para todas as categorias marcadas
+        qtd = categorias.juntar(origens, destino)
+        if qtd is not None:
+            db.session.commit()
+            fila_quiz.invalidar()
+            temas.invalidar_totais()
+            # qtd é o rowcount do UPDATE: conta só as perguntas que de fato mudaram
+            flash(f'Categorias marcadas juntadas em "{destino}" ({qtd} perguntas movidas).', 'success')
+        else:
+            flash(f'Nenhuma categoria marcada foi alterada (já eram "{destino}" ou não existem mais).', 'warning')
+    else:
+        flash('Marque as categorias e informe o nome da categoria de destino.', 'warning')
+
+    return redirect(url_for('admin.gerenciar_categorias'))
+
 @admin_bp.route('/categorias/excluir', methods=['POST'])
 def excluir_categoria():
     if not session.get('admin_logged_in'): return redirect(url_for('admin.pagina_admin'))
@@ -893,17 +971,14 @@ def excluir_categoria():
     nome_categoria = request.form.get('nome_categoria')
     
     if nome_categoria:
-        # Busca todas as perguntas dessa categoria
-        perguntas = Pergunta.query.filter_by(categoria=nome_categoria).all()
-        qtd = len(perguntas)
-        
-        # EM VEZ DE DELETAR, A GENTE MOVE PARA 'Geral'
-        for p in perguntas:
-            p.categoria = 'Geral' 
-            
-        db.session.commit()
-        
-        # A categoria antiga some porque ninguém mais usa ela
-        flash(f'Categoria "{nome_categoria}" removida! As {qtd} perguntas foram movidas para "Geral".', 'success')
+        # EM VEZ DE DELETAR AS PERGUNTAS, A GENTE MOVE PARA 'Geral' (um UPDATE por tabela)
+        qtd = categorias.excluir(nome_categoria)
+        if qtd is not None:
+            db.session.commit()
+            fila_quiz.invalidar()
+            temas.invalidar_totais()
+            flash(f'Categoria "{nome_categoria}" removida! As {qtd} perguntas foram movidas para "Geral".', 'success')
+        else:
+            flash(f'A categoria "{nome_categoria}" não pode ser removida.', 'warning')
     
     return redirect(url_for('admin.gerenciar_categorias'))
\ No newline at end of file
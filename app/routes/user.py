@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for, request, session, flash
-from app.models import Usuario, Pergunta, Resposta, Departamento, AnexoResposta
+from app.models import Usuario, Pergunta, Resposta, Departamento, AnexoResposta, PerguntaElegivel
 from app.extensions import db
 from app.utils import allowed_file
+from app.contadores import obter_contador, registrar_resposta, zerar_feedbacks
+from app.elegibilidade import perguntas_elegiveis
+from app import fila_quiz, placar, temas, paginacao, respostas, cronometro
+from app.carregamento import com_perfil
 from sqlalchemy import or_, func, desc
 from datetime import date
 import cloudinary.uploader
@@ -13,77 +17,30 @@ user_bp = Blueprint('user', __name__)
 def dashboard():
     if 'usuario_id' not in session: return redirect(url_for('auth.pagina_login'))
 
-    usuario_id = session['usuario_id']
-    usuario = Usuario.query.get(usuario_id)
-    hoje = (datetime.utcnow() - timedelta(hours=3)).date()
-    
-    # OTIMIZAÇÃO: Subquery
-    sq_respondidas = db.session.query(Resposta.pergunta_id).filter(Resposta.usuario_id == usuario_id).subquery()
+    # OTIMIZAÇÃO: Contadores materializados (uma busca por chave primária)
+    contador = obter_contador(session['usuario_id'])
 
-    contagem_quiz_pendente = Pergunta.query.filter(
-        Pergunta.tipo != 'discursiva',
-        Pergunta.data_liberacao <= hoje,
-        ~Pergunta.id.in_(sq_respondidas),
-        or_(Pergunta.para_todos_setores == True, Pergunta.departamentos.any(Departamento.id == usuario.departamento_id))
-    ).count()
-
-    contagem_atividades_pendentes = Pergunta.query.filter(
-        Pergunta.tipo == 'discursiva',
-        Pergunta.data_liberacao <= hoje,
-        ~Pergunta.id.in_(sq_respondidas),
-        or_(Pergunta.para_todos_setores == True, Pergunta.departamentos.any(Departamento.id == usuario.departamento_id))
-    ).count()
-
-    contagem_novos_feedbacks = Resposta.query.join(Pergunta).filter(
-        Resposta.usuario_id == usuario_id,
-        Pergunta.tipo == 'discursiva',
-        Resposta.status_correcao.in_(['correto', 'incorreto']),
-        Resposta.feedback_visto == False
-    ).count()
-    
     return render_template('dashboard.html', 
                            nome=session['usuario_nome'],
-                           contagem_quiz=contagem_quiz_pendente,
-                           contagem_atividades=contagem_atividades_pendentes,
-                           contagem_feedbacks=contagem_novos_feedbacks)
+                           contagem_quiz=contador.quiz_pendentes,
+                           contagem_atividades=contador.atividades_pendentes,
+                           contagem_feedbacks=contador.feedbacks_novos)
 
 @user_bp.route('/quiz')
 @user_bp.route('/quiz/<categoria>')
 def pagina_quiz(categoria=None):
     if 'usuario_id' not in session: return redirect(url_for('auth.pagina_login'))
-    usuario_id = session['usuario_id']
-    usuario = Usuario.query.get(usuario_id)
     hoje = (datetime.utcnow() - timedelta(hours=3)).date()
-    
-    sq_respondidas = db.session.query(Resposta.pergunta_id).filter(Resposta.usuario_id == usuario_id).subquery()
 
-    # Monta a busca básica
-    query = Pergunta.query.filter(
-        Pergunta.tipo != 'discursiva',
-        Pergunta.data_liberacao <= hoje,
-        ~Pergunta.id.in_(sq_respondidas),
-        or_(Pergunta.para_todos_setores == True, Pergunta.departamentos.any(Departamento.id == usuario.departamento_id))
-    )
-
-    if categoria:
-        # --- CORREÇÃO AQUI ---
-        # Verifica se é "Sem Classificação" para tratar nulos OU texto,
-        # e usa func.lower() para garantir que "duvidas_atividades" encontre "Duvidas_Atividades"
-        if categoria == "Sem Classificação":
-             query = query.filter(or_(
-                 Pergunta.categoria.is_(None), 
-                 Pergunta.categoria == '',
-                 func.lower(Pergunta.categoria) == 'sem classificação' # Caso esteja escrito no banco
-             ))
-        else:
-             # Compara transformando tudo em minúsculo
-             query = query.filter(func.lower(Pergunta.categoria) == categoria.lower())
-        # ---------------------
-
-    proxima_pergunta = query.order_by(Pergunta.data_liberacao).first()
+    # OTIMIZAÇÃO: Fila de próximas perguntas por usuário/categoria (montada uma vez, depois O(1))
+    proxima_pergunta = fila_quiz.proxima_pergunta(session['usuario_id'], categoria, hoje)
 
     if proxima_pergunta:
-        return render_template('quiz.html', pergunta=proxima_pergunta, categoria_atual=categoria)
+        # O cronômetro começa no servidor; recarregar a página continua de onde estava
+        tempo_restante = cronometro.emitir(session['usuario_id'], proxima_pergunta)
+        # token_envio: identifica este envio do formulário (reenvios não gravam de novo)
+        return render_template('quiz.html', pergunta=proxima_pergunta, categoria_atual=categoria,
+                               tempo_restante=tempo_restante, token_envio=respostas.novo_token())
     else:
         msg = f'Você finalizou o módulo {categoria}!' if categoria else 'Parabéns, todas as perguntas respondidas!'
         flash(msg, 'success')
@@ -102,29 +59,13 @@ def pagina_atividades(categoria=None):
 
     sq_respondidas = db.session.query(Resposta.pergunta_id).filter(Resposta.usuario_id == usuario_id).subquery()
 
-    # Busca básica
-    query_atividades = Pergunta.query.filter(
-        Pergunta.tipo == 'discursiva',
-        Pergunta.data_liberacao <= hoje,
-        ~Pergunta.id.in_(sq_respondidas),
-        or_(Pergunta.para_todos_setores == True, Pergunta.departamentos.any(Departamento.id == usuario.departamento_id))
+    # Busca pelo índice de elegibilidade (setor + tipo + categoria + data)
+    query_atividades = perguntas_elegiveis(usuario.departamento_id, 'atividades', hoje, categoria).filter(
+        ~Pergunta.id.in_(sq_respondidas)
     )
 
-    if categoria:
-        # --- CORREÇÃO AQUI ---
-        if categoria == "Sem Classificação":
-            query_atividades = query_atividades.filter(or_(
-                Pergunta.categoria.is_(None), 
-                Pergunta.categoria == '',
-                func.lower(Pergunta.categoria) == 'sem classificação'
-            ))
-        else:
-            # Compara transformando tudo em minúsculo
-            query_atividades = query_atividades.filter(func.lower(Pergunta.categoria) == categoria.lower())
-        # ---------------------
-
     # Ordena e Pagina
-    query_atividades = query_atividades.order_by(Pergunta.data_liberacao.desc())
+    query_atividades = query_atividades.order_by(PerguntaElegivel.data_liberacao.desc())
     atividades_pagination = query_atividades.paginate(page=page, per_page=per_page, error_out=False)
 
     return render_template('atividades.html', 
@@ -139,13 +80,19 @@ def responder_atividade(pergunta_id):
 
     if request.method == 'POST':
         texto_resposta = request.form['texto_discursivo']
-        nova_resposta = Resposta(
+        nova_resposta = respostas.inserir(
             usuario_id=session['usuario_id'],
             pergunta_id=pergunta.id,
             texto_discursivo=texto_resposta,
             status_correcao='pendente'
         )
-        db.session.add(nova_resposta)
+        if nova_resposta is None:
+            # Índice único (usuario_id, pergunta_id): envio repetido, nada muda
+            flash('Você já respondeu esta atividade.', 'info')
+            return redirect(url_for('user.pagina_atividades'))
+        registrar_resposta(session['usuario_id'], pergunta)
+        placar.registrar_resposta(nova_resposta)
+        temas.registrar_resposta(session['usuario_id'], pergunta)
         db.session.commit()
 
         arquivos = request.files.getlist('anexo_resposta')
@@ -170,6 +117,7 @@ def processa_resposta():
     
     pergunta_id = request.form['pergunta_id']
     resposta_usuario = request.form.get('resposta', '')
+    token_envio = request.form.get('token_envio') or None
     
     # --- NOVO: Captura a categoria que veio oculta do formulário ---
     categoria_recebida = request.form.get('categoria')
@@ -181,27 +129,56 @@ def processa_resposta():
     pontos = 0
     resultado = ''
 
+    # Tempo pelo relógio do servidor (app/cronometro.py), não pelo que o navegador informa
+    tempo_restante = cronometro.tempo_restante(session['usuario_id'], pergunta)
+    if tempo_restante is None and not Resposta.query.filter_by(usuario_id=session['usuario_id'], pergunta_id=pergunta.id).first():
+        # Sem início registrado (página aberta antes do deploy do cronômetro, banco restaurado
+        # ou POST que não veio do /quiz): o relógio começa agora e a pergunta volta para a tela.
+        # Nem vale pontos sem cronômetro, nem fica perdida como esgotada.
+        cronometro.emitir(session['usuario_id'], pergunta)
+        flash('O tempo desta pergunta foi reiniciado. Responda novamente.', 'warning')
+        return redirect(url_for('user.pagina_quiz', categoria=categoria_recebida) if categoria_recebida else url_for('user.pagina_quiz'))
+    if tempo_restante is not None and tempo_restante < 0:
+        resposta_usuario = 'esgotado'
+
     if resposta_usuario == 'esgotado':
         resultado = 'esgotado'
         pontos = 0
     else:
         if pergunta.resposta_correta == resposta_usuario:
-            tempo_restante = float(request.form['tempo_restante'])
-            pontos = 100 + int(tempo_restante * 5)
+            pontos = 100 + int(max(tempo_restante or 0, 0) * 5)
             resultado = 'correto'
         else:
             resultado = 'incorreto'
             pontos = 0
     
-    nova_resposta = Resposta(
+    # OTIMIZAÇÃO: Um único INSERT ... ON CONFLICT DO NOTHING (sem checagem prévia nem rollback)
+    nova_resposta = respostas.inserir(
         pontos=pontos, 
         usuario_id=session['usuario_id'], 
-        pergunta_id=pergunta_id, 
+        pergunta_id=pergunta.id, 
         resposta_dada=resposta_usuario, 
-        status_correcao='correto' if pontos > 0 else 'incorreto'
+        status_correcao='correto' if pontos > 0 else 'incorreto',
+        token_envio=token_envio
     )
-    db.session.add(nova_resposta)
+    if nova_resposta is None:
+        # A pergunta já foi respondida. Com o mesmo token é o mesmo envio repetido
+        # (duplo clique, F5, reenvio): mostra o resultado que ficou gravado.
+        anterior = Resposta.query.filter_by(usuario_id=session['usuario_id'], pergunta_id=pergunta.id).first()
+        if token_envio and anterior and anterior.token_envio == token_envio:
+            return render_template('feedback_quiz.html',
+                                   resultado=respostas.resultado(anterior),
+                                   pontos=anterior.pontos,
+                                   pergunta=pergunta,
+                                   categoria_atual=categoria_recebida)
+        flash('Esta pergunta já foi respondida.', 'info')
+        return redirect(url_for('user.pagina_quiz', categoria=categoria_recebida) if categoria_recebida else url_for('user.pagina_quiz'))
+    registrar_resposta(session['usuario_id'], pergunta)
+    placar.registrar_resposta(nova_resposta)
+    temas.registrar_resposta(session['usuario_id'], pergunta)
     db.session.commit()
+    fila_quiz.registrar_resposta(session['usuario_id'], pergunta.id)
+    cronometro.concluir(session['usuario_id'], pergunta.id)
     
     # --- AJUSTE: Passamos a 'categoria_atual' para o template ---
     return render_template('feedback_quiz.html', 
@@ -225,11 +202,12 @@ def minhas_respostas():
     if feedbacks_nao_vistos:
         for resposta in feedbacks_nao_vistos:
             resposta.feedback_visto = True
+        zerar_feedbacks(usuario_id)
         db.session.commit()
     
     filtro_tipo = request.args.get('filtro_tipo', '')
     filtro_resultado = request.args.get('filtro_resultado', '')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 5 
 
     query = Resposta.query.filter_by(usuario_id=usuario_id)
@@ -245,51 +223,66 @@ def minhas_respostas():
     elif filtro_resultado == 'pendentes':
         query = query.filter(Resposta.status_correcao == 'pendente')
     
-    respostas_pagination = query.order_by(Resposta.data_resposta.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    query = com_perfil(query, 'minhas_respostas')
+    # Paginação por cursor em (data_resposta, id): a página N custa o mesmo que a primeira
+    respostas_pagination = paginacao.paginar(
+        query, [(Resposta.data_resposta, True), (Resposta.id, True)], cursor, per_page,
+        chave_contagem=('minhas_respostas', usuario_id, filtro_tipo, filtro_resultado))
 
     return render_template('minhas_respostas.html', respostas=respostas_pagination, filtro_tipo=filtro_tipo, filtro_resultado=filtro_resultado)
 
+def _periodo_selecionado():
+    """Lê ?periodo=geral|semana|mes|personalizado (&inicio=&fim=) e devolve (periodo, inicio, fim)."""
+    periodo = request.args.get('periodo', 'geral')
+    hoje = (datetime.utcnow() - timedelta(hours=3)).date()
+
+    if periodo == 'semana':
+        return periodo, hoje - timedelta(days=hoje.weekday()), hoje
+    if periodo == 'mes':
+        return periodo, hoje.replace(day=1), hoje
+    if periodo == 'personalizado':
+        try:
+            inicio = datetime.strptime(request.args.get('inicio', ''), '%Y-%m-%d').date()
+            fim = datetime.strptime(request.args.get('fim', ''), '%Y-%m-%d').date()
+            if inicio <= fim:
+                return periodo, inicio, fim
+        except ValueError:
+            pass
+        flash('Período inválido. Mostrando o ranking geral.', 'warning')
+    return 'geral', None, None
+
 @user_bp.route('/ranking')
 def pagina_ranking():
     if 'usuario_id' not in session: return redirect(url_for('auth.pagina_login'))
+    periodo, inicio, fim = _periodo_selecionado()
     
-    # OTIMIZAÇÃO: Query Única
-    ranking_query = db.session.query(
-        Departamento.id,
-        Departamento.nome,
-        func.coalesce(func.sum(Resposta.pontos), 0).label('pontos_totais'),
-        func.count(func.distinct(Usuario.id)).label('num_usuarios')
-    ).join(Usuario, Departamento.id == Usuario.departamento_id)\
-     .outerjoin(Resposta, Usuario.id == Resposta.usuario_id)\
-     .group_by(Departamento.id, Departamento.nome).all()
-
+    # OTIMIZAÇÃO: Placar já somado por setor (ou baldes diários do período), lido em ordem de média
     ranking_final = []
-    for row in ranking_query:
-        media = row.pontos_totais / row.num_usuarios if row.num_usuarios > 0 else 0
+    for row in placar.ranking_setores(inicio, fim):
         ranking_final.append({
             'id': row.id, 
             'nome': row.nome, 
             'pontos_totais': row.pontos_totais, 
             'num_usuarios': row.num_usuarios, 
-            'pontuacao_proporcional': round(media)
+            'pontuacao_proporcional': round(row.pontos_totais / row.num_usuarios)
         })
         
-    ranking_final.sort(key=lambda x: x['pontuacao_proporcional'], reverse=True)
-    return render_template('ranking.html', ranking=ranking_final)
+    return render_template('ranking.html', ranking=ranking_final, periodo=periodo, inicio=inicio, fim=fim)
 
 @user_bp.route('/ranking/<int:departamento_id>')
 def pagina_ranking_detalhe(departamento_id):
     if 'usuario_id' not in session: return redirect(url_for('auth.pagina_login'))
     departamento = Departamento.query.get_or_404(departamento_id)
-    ranking_individual_query = db.session.query(Usuario.nome, func.coalesce(func.sum(Resposta.pontos), 0).label('pontos_totais'), func.coalesce(func.count(Resposta.id), 0).label('total_respostas'), func.coalesce(func.sum(case((Resposta.pontos > 0, 1), else_=0)), 0).label('total_acertos')).select_from(Usuario).outerjoin(Resposta).filter(Usuario.departamento_id == departamento_id).group_by(Usuario.nome).all()
+    periodo, inicio, fim = _periodo_selecionado()
+
+    # OTIMIZAÇÃO: Placar já somado por usuário (quem nunca respondeu aparece zerado)
     ranking_final = []
-    for membro in ranking_individual_query:
+    for membro in placar.ranking_usuarios(departamento_id, inicio, fim):
         total_respostas = membro.total_respostas
         total_acertos = membro.total_acertos
         percentual = (total_acertos / total_respostas) * 100 if total_respostas > 0 else 0
         ranking_final.append({'nome': membro.nome, 'pontos_totais': membro.pontos_totais, 'total_respostas': total_respostas, 'total_acertos': total_acertos, 'percentual_acertos': round(percentual, 1)})
-    ranking_final.sort(key=lambda x: x['nome'])
-    return render_template('ranking_detalhe.html', departamento=departamento, ranking=ranking_final)
+    return render_template('ranking_detalhe.html', departamento=departamento, ranking=ranking_final, periodo=periodo, inicio=inicio, fim=fim)
 
 # app/routes/user.py
 
@@ -305,64 +298,10 @@ def selecionar_tema(tipo_origem):
     usuario = Usuario.query.get(usuario_id)
     hoje = (datetime.utcnow() - timedelta(hours=3)).date()
     
-    tipo_filtro = 'discursiva' if tipo_origem == 'atividades' else 'multipla_escolha'
-    
-    # Filtros Comuns (Para não repetir código)
-    filtros_base = [
-        Pergunta.tipo == tipo_filtro if tipo_origem == 'atividades' else Pergunta.tipo != 'discursiva',
-        Pergunta.data_liberacao <= hoje,
-        or_(Pergunta.para_todos_setores == True, Pergunta.departamentos.any(Departamento.id == usuario.departamento_id))
-    ]
-
-    # 1. Consulta TOTAL de perguntas por categoria
-    query_total = db.session.query(
-        Pergunta.categoria, 
-        func.count(Pergunta.id)
-    ).filter(*filtros_base).group_by(Pergunta.categoria).all()
-
-    # 2. Consulta RESPONDIDAS pelo usuário por categoria
-    # Primeiro, pega os IDs que o usuário já respondeu
-    sq_respondidas = db.session.query(Resposta.pergunta_id).filter(Resposta.usuario_id == usuario_id).subquery()
-    
-    query_respondidas = db.session.query(
-        Pergunta.categoria,
-        func.count(Pergunta.id)
-    ).filter(
-        *filtros_base,
-        Pergunta.id.in_(sq_respondidas) # <--- Filtra só as que ele já fez
-    ).group_by(Pergunta.categoria).all()
+    origem = 'atividades' if tipo_origem == 'atividades' else 'quiz'
     
-    # 3. Processamento Inteligente (Mescla Total vs Respondidas)
-    dados_categorias = {}
-
-    # Passo A: Preenche os totais
-    for nome, qtd in query_total:
-        if nome: 
-            nome_limpo = nome.strip().title()
-            if nome_limpo not in dados_categorias:
-                dados_categorias[nome_limpo] = {'total': 0, 'respondidas': 0}
-            dados_categorias[nome_limpo]['total'] += qtd
-
-    # Passo B: Preenche as respondidas
-    for nome, qtd in query_respondidas:
-        if nome:
-            nome_limpo = nome.strip().title()
-            if nome_limpo in dados_categorias:
-                dados_categorias[nome_limpo]['respondidas'] += qtd
-
-    # 4. Monta a lista final com o cálculo de restantes
-    lista_categorias = []
-    for nome, dados in dados_categorias.items():
-        restantes = dados['total'] - dados['respondidas']
-        lista_categorias.append({
-            'nome': nome, 
-            'total': dados['total'],
-            'respondidas': dados['respondidas'],
-            'restantes': restantes
-        })
-
-    # Ordena alfabeticamente
-    lista_categorias = sorted(lista_categorias, key=lambda x: x['nome'])
+    # OTIMIZAÇÃO: totais por tema do setor em cache + respondidas já somadas por tema
+    lista_categorias = temas.visao_geral(usuario, origem, hoje)
 
     return render_template('selecao_temas.html', 
                            categorias=lista_categorias, 
@@ -0,0 +1,190 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, func, update, text
+from sqlalchemy.orm import aliased
+from .extensions import db
+from .models import TarefaRelatorio
+from . import exportacao
+
+# Fila de relatórios pesados, guardada no banco (tabela tarefa_relatorio).
+# As rotas de exportação só enfileiram a tarefa e devolvem o ID; quem gera o
+# arquivo é o worker_relatorios.py, um processo separado do gunicorn. Assim uma
+# exportação grande nunca ocupa um worker web.
+#
+# Limites: no máximo RELATORIOS_MAX_SIMULTANEOS tarefas rodando ao mesmo tempo
+# (somando todos os workers de relatório) e RELATORIOS_MAX_PENDENTES_POR_ADMIN
+# tarefas na fila por admin. A reserva de uma tarefa é um UPDATE condicional
+# (status = 'pendente' e menos de RELATORIOS_MAX_SIMULTANEOS rodando), então dois
+# workers nunca pegam a mesma nem passam juntos do limite.
+
+TIPOS = {
+    # tipo: (formatos aceitos, nome do arquivo para download)
+    'desempenho': (('xlsx',), 'relatorio_desempenho_quiz'),
+    'detalhado': (('xlsx', 'csv'), 'relatorio_completo_respostas'),
+}
+
+CHAVE_TRAVA = 8042318  # pg_advisory_xact_lock: uma reserva de tarefa por vez
+
+class LimiteDeTarefas(Exception):
+    pass
+
+def _config(nome, padrao):
+    return current_app.config.get(nome, padrao)
+
+def _diretorio():
+    diretorio = _config('RELATORIOS_DIR', None) or os.path.join(current_app.instance_path, 'relatorios')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+def nome_download(tarefa):
+    return f"{TIPOS[tarefa.tipo][1]}.{tarefa.formato}"
+
+def enfileirar(tipo, parametros, formato='xlsx', admin_id=None):
+    """Cria a tarefa e retorna o ID. Levanta LimiteDeTarefas se o admin já tem tarefas demais na fila."""
+    formatos, _ = TIPOS[tipo]
+    if formato not in formatos:
+        formato = formatos[0]
+
+    if admin_id is not None:
+        em_aberto = TarefaRelatorio.query.filter(
+            TarefaRelatorio.admin_id == admin_id,
+            TarefaRelatorio.status.in_(['pendente', 'processando'])
+        ).count()
+        if em_aberto >= _config('RELATORIOS_MAX_PENDENTES_POR_ADMIN', 3):
+            raise LimiteDeTarefas(f"Você já tem {em_aberto} relatórios em andamento. Aguarde terminarem.")
+
+    tarefa = TarefaRelatorio(id=uuid.uuid4().hex, tipo=tipo, formato=formato, parametros=parametros, admin_id=admin_id)
+    db.session.add(tarefa)
+    db.session.commit()
+    return tarefa.id
+
+def obter(tarefa_id):
+    return db.session.get(TarefaRelatorio, tarefa_id)
+
+def situacao(tarefa):
+    """Dados de status para o endpoint JSON / página de acompanhamento."""
+    percentual = None
+    if tarefa.status == 'concluido':
+        percentual = 100
+    elif tarefa.total:
+        percentual = min(99, int(tarefa.progresso * 100 / tarefa.total))
+    return {
+        'id': tarefa.id,
+        'tipo': tarefa.tipo,
+        'formato': tarefa.formato,
+        'status': tarefa.status,
+        'progresso': tarefa.progresso,
+        'total': tarefa.total,
+        'percentual': percentual,
+        'erro': tarefa.erro,
+        'criado_em': tarefa.criado_em.isoformat() if tarefa.criado_em else None,
+        'concluido_em': tarefa.concluido_em.isoformat() if tarefa.concluido_em else None,
+    }
+
+# --- Lado do worker ---
+
+def identificador_worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def reservar_proxima(worker):
+    """Pega a tarefa pendente mais antiga, respeitando o limite de tarefas simultâneas.
+    Retorna a TarefaRelatorio reservada ou None."""
+    maximo = _config('RELATORIOS_MAX_SIMULTANEOS', 2)
+    outra = aliased(TarefaRelatorio)
+    rodando = select(func.count()).select_from(outra).where(outra.status == 'processando').scalar_subquery()
+    # Atalho para o caso comum de limite cheio; quem garante o limite é o UPDATE abaixo
+    if db.session.execute(select(rodando)).scalar() >= maximo:
+        return None
+
+    candidatas = db.session.execute(
+        select(TarefaRelatorio.id).where(TarefaRelatorio.status == 'pendente')
+        .order_by(TarefaRelatorio.criado_em).limit(5)
+    ).scalars().all()
+    for tarefa_id in candidatas:
+        # Contagem e reserva no mesmo UPDATE. No Postgres (READ COMMITTED) duas reservas
+        # simultâneas ainda contariam as mesmas tarefas, então passam uma de cada vez
+        # pela trava da transação; no SQLite a escrita já é serializada.
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {'chave': CHAVE_TRAVA})
+        reservada = db.session.execute(
+            update(TarefaRelatorio)
+            .where(TarefaRelatorio.id == tarefa_id, TarefaRelatorio.status == 'pendente', rodando < maximo)
+            .values(status='processando', worker=worker, iniciado_em=datetime.utcnow(), progresso=0)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if reservada:
+            return db.session.get(TarefaRelatorio, tarefa_id)
+    return None
+
+def _registrar_progresso(tarefa_id, linhas):
+    # Conexão própria: a sessão está no meio da leitura em blocos (cursor aberto) e um
+    # commit nela fecharia o cursor. Quem consulta o status vê o avanço na hora.
+    # No SQLite (desenvolvimento) a escrita esperaria o cursor de leitura: sem progresso parcial.
+    if db.engine.dialect.name == 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        conn.execute(update(TarefaRelatorio).where(TarefaRelatorio.id == tarefa_id).values(progresso=linhas))
+
+def executar(tarefa):
+    """Gera o arquivo da tarefa (já reservada) e marca como concluída ou com erro."""
+    tarefa_id = tarefa.id
+    caminho = os.path.join(_diretorio(), f"{tarefa_id}.{tarefa.formato}")
+    parametros = dict(tarefa.parametros or {})
+    progresso = lambda linhas: _registrar_progresso(tarefa_id, linhas)
+
+    try:
+        if tarefa.tipo == 'detalhado':
+            tarefa.total = exportacao.contar_respostas(**parametros)
+            db.session.commit()
+            with open(caminho, 'wb') as destino:
+                if tarefa.formato == 'csv':
+                    for pedaco in exportacao.gerar_csv_detalhado(progresso=progresso, **parametros):
+                        destino.write(pedaco)
+                else:
+                    exportacao.gerar_xlsx_detalhado(destino, progresso=progresso, **parametros)
+        else:
+            with open(caminho, 'wb') as destino:
+                if exportacao.gerar_xlsx_desempenho(parametros.get('departamento_id'), destino) is None:
+                    raise ValueError("Nenhum dado para exportar.")
+
+        tarefa = db.session.get(TarefaRelatorio, tarefa_id)
+        tarefa.status = 'concluido'
+        tarefa.arquivo = caminho
+        tarefa.progresso = tarefa.total or tarefa.progresso
+        tarefa.concluido_em = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        TarefaRelatorio.query.filter_by(id=tarefa_id).update(
+            {'status': 'erro', 'erro': str(e)[:1000], 'concluido_em': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        raise
+
+def recuperar_travadas():
+    """Tarefas 'processando' há mais de RELATORIOS_TIMEOUT_MINUTOS (worker morreu) voltam para a fila."""
+    limite = datetime.utcnow() - timedelta(minutes=_config('RELATORIOS_TIMEOUT_MINUTOS', 30))
+    total = TarefaRelatorio.query.filter(
+        TarefaRelatorio.status == 'processando', TarefaRelatorio.iniciado_em < limite
+    ).update({'status': 'pendente', 'worker': None}, synchronize_session=False)
+    db.session.commit()
+    return total
+
+def expirar():
+    """Apaga tarefas (e arquivos) finalizadas há mais de RELATORIOS_EXPIRA_HORAS."""
+    limite = datetime.utcnow() - timedelta(hours=_config('RELATORIOS_EXPIRA_HORAS', 24))
+    antigas = TarefaRelatorio.query.filter(
+        TarefaRelatorio.status.in_(['concluido', 'erro']), TarefaRelatorio.concluido_em < limite
+    ).all()
+    for tarefa in antigas:
+        if tarefa.arquivo and os.path.exists(tarefa.arquivo):
+            os.remove(tarefa.arquivo)
+        db.session.delete(tarefa)
+    db.session.commit()
+    return len(antigas)
\ No newline at end of file
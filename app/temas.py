@@ -0,0 +1,172 @@
+from flask import current_app
+from sqlalchemy import case, func, insert, select, literal
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .cache import CacheTTL
+from .models import Categoria, ContadorCategoria, PerguntaElegivel, Resposta, Usuario
+
+# Visão geral por tema (tela "escolha o tema" do quiz e das atividades).
+# Total de perguntas por tema: depende só do setor e do dia, então vem de um
+# cache em memória (uma consulta com agregação condicional monta quiz e
+# atividades juntos). Publicar/editar/excluir pergunta limpa o cache deste
+# worker; nos outros ele expira pelo TEMAS_CACHE_TTL.
+# Respondidas por tema: tabela ContadorCategoria, somada a cada resposta e
+# recalculada (INSERT ... SELECT) para quem respondeu uma pergunta que mudou de
+# tema, setor ou foi excluída, e para quem mudou de setor.
+# A tela lê um dict do cache + as linhas do usuário: custo fixo, sem olhar Resposta.
+
+_totais = CacheTTL(ttl_segundos=300, max_itens=2000)
+
+def _origem(tipo):
+    return 'atividades' if tipo == 'discursiva' else 'quiz'
+
+def _origem_sql(coluna_tipo):
+    return case((coluna_tipo == 'discursiva', 'atividades'), else_='quiz')
+
+# --- Totais por setor (cache) ---
+
+def totais_por_categoria(departamento_id, hoje):
+    """{'quiz': {categoria_id: (nome, total)}, 'atividades': {...}} das perguntas já liberadas para o setor."""
+    chave = (departamento_id, hoje)
+    totais = _totais.obter(chave)
+    if totais is None:
+        discursiva = PerguntaElegivel.tipo == 'discursiva'
+        linhas = db.session.query(
+            Categoria.id,
+            Categoria.nome,
+            func.sum(case((discursiva, 0), else_=1)),
+            func.sum(case((discursiva, 1), else_=0))
+        ).join(Categoria, Categoria.id == PerguntaElegivel.categoria_id).filter(
+            PerguntaElegivel.departamento_id == departamento_id,
+            PerguntaElegivel.data_liberacao <= hoje
+        ).group_by(Categoria.id, Categoria.nome).all()
+
+        totais = {'quiz': {}, 'atividades': {}}
+        for categoria_id, nome, quiz, atividades in linhas:
+            if quiz:
+                totais['quiz'][categoria_id] = (nome, quiz)
+            if atividades:
+                totais['atividades'][categoria_id] = (nome, atividades)
+        _totais.definir(chave, totais, ttl=current_app.config.get('TEMAS_CACHE_TTL', 300))
+    return totais
+
+def invalidar_totais():
+    """Pergunta publicada, editada ou excluída, ou categoria renomeada: limpa os totais deste worker."""
+    _totais.limpar()
+
+# --- Respondidas por usuário (tabela) ---
+
+def visao_geral(usuario, origem, hoje):
+    """Lista [{'nome', 'total', 'respondidas', 'restantes'}] em ordem alfabética."""
+    totais = totais_por_categoria(usuario.departamento_id, hoje)[origem]
+    respondidas = dict(db.session.query(ContadorCategoria.categoria_id, ContadorCategoria.respondidas).filter(
+        ContadorCategoria.usuario_id == usuario.id, ContadorCategoria.origem == origem
+    ))
+
+    categorias = []
+    for categoria_id, (nome, total) in totais.items():
+        # Pergunta respondida e depois adiada para o futuro não entra no total de hoje
+        feitas = min(respondidas.get(categoria_id, 0), total)
+        categorias.append({
+            'nome': nome,
+            'total': total,
+            'respondidas': feitas,
+            'restantes': total - feitas
+        })
+    return sorted(categorias, key=lambda x: x['nome'])
+
+def registrar_resposta(usuario_id, pergunta):
+    """Soma 1 no tema da pergunta respondida. Não faz commit."""
+    filtro = {'usuario_id': usuario_id, 'origem': _origem(pergunta.tipo), 'categoria_id': pergunta.categoria_id}
+    if ContadorCategoria.query.filter_by(**filtro).update(
+        {'respondidas': ContadorCategoria.respondidas + 1}, synchronize_session=False
+    ):
+        return
+    # Primeira resposta no tema: cria a linha (se outra requisição criou antes, soma nela)
+    try:
+        with db.session.begin_nested():
+            db.session.add(ContadorCategoria(**filtro, respondidas=1))
+    except IntegrityError:
+        ContadorCategoria.query.filter_by(**filtro).update(
+            {'respondidas': ContadorCategoria.respondidas + 1}, synchronize_session=False
+        )
+
+def _respondidas_agrupadas(usuario_ids=None):
+    # Respostas a perguntas que o setor do usuário enxerga, por (usuário, origem, tema)
+    consulta = select(
+        Resposta.usuario_id,
+        _origem_sql(PerguntaElegivel.tipo),
+        PerguntaElegivel.categoria_id,
+        func.count(func.distinct(Resposta.pergunta_id))
+    ).join(
+        Usuario, Usuario.id == Resposta.usuario_id
+    ).join(
+        PerguntaElegivel, (PerguntaElegivel.departamento_id == Usuario.departamento_id)
+                          & (PerguntaElegivel.pergunta_id == Resposta.pergunta_id)
+    )
+    if usuario_ids is not None:
+        consulta = consulta.where(Resposta.usuario_id.in_(usuario_ids))
+    return consulta.group_by(Resposta.usuario_id, _origem_sql(PerguntaElegivel.tipo), PerguntaElegivel.categoria_id)
+
+def recalcular_usuarios(usuario_ids=None):
+    """Refaz as linhas dos usuários (lista, subconsulta ou None = todos). Não faz commit."""
+    apagar = ContadorCategoria.query
+    if usuario_ids is not None:
+        apagar = apagar.filter(ContadorCategoria.usuario_id.in_(usuario_ids))
+    apagar.delete(synchronize_session=False)
+    db.session.execute(insert(ContadorCategoria).from_select(
+        ['usuario_id', 'origem', 'categoria_id', 'respondidas'], _respondidas_agrupadas(usuario_ids)
+    ))
+
+def recalcular_por_perguntas(pergunta_ids):
+    """Depois de mudar tema/setores/tipo das perguntas no índice de elegibilidade
+    (e antes de apagar as respostas, na exclusão): refaz quem respondeu. Não faz commit."""
+    if not pergunta_ids:
+        return
+    db.session.flush()
+    quem_respondeu = [u_id for (u_id,) in db.session.query(Resposta.usuario_id).filter(
+        Resposta.pergunta_id.in_(pergunta_ids)
+    ).distinct()]
+    if quem_respondeu:
+        recalcular_usuarios(quem_respondeu)
+
+def juntar_categorias(origem_ids, destino_id):
+    """Categorias juntadas: soma as linhas das de origem na de destino (os conjuntos de
+    perguntas não se sobrepõem, então a soma é exata) e apaga as de origem. Não faz commit."""
+    origem = aliased(ContadorCategoria)
+    mesma_linha = (origem.usuario_id == ContadorCategoria.usuario_id) & (origem.origem == ContadorCategoria.origem) \
+        & origem.categoria_id.in_(origem_ids)
+    ContadorCategoria.query.filter(
+        ContadorCategoria.categoria_id == destino_id, select(origem.usuario_id).where(mesma_linha).exists()
+    ).update({'respondidas': ContadorCategoria.respondidas + select(func.sum(origem.respondidas)).where(
+        mesma_linha).scalar_subquery()}, synchronize_session=False)
+
+    destino = aliased(ContadorCategoria)
+    db.session.execute(insert(ContadorCategoria).from_select(
+        ['usuario_id', 'origem', 'categoria_id', 'respondidas'],
+        select(origem.usuario_id, origem.origem, literal(destino_id), func.sum(origem.respondidas)).where(
+            origem.categoria_id.in_(origem_ids),
+            ~select(destino.usuario_id).where(
+                destino.usuario_id == origem.usuario_id, destino.origem == origem.origem,
+                destino.categoria_id == destino_id
+            ).exists()
+        ).group_by(origem.usuario_id, origem.origem)
+    ))
+    ContadorCategoria.query.filter(ContadorCategoria.categoria_id.in_(origem_ids)).delete(synchronize_session=False)
+
+def remover_usuario(usuario_id):
+    ContadorCategoria.query.filter_by(usuario_id=usuario_id).delete(synchronize_session=False)
+
+def reconstruir():
+    """Recalcula a tabela inteira (recuperação de divergências / primeira carga)."""
+    recalcular_usuarios()
+    db.session.commit()
+    invalidar_totais()
+
+def verificar():
+    """Compara o que está salvo com o recalculado. Retorna a lista de divergências."""
+    esperado = {(u, o, c): n for u, o, c, n in db.session.execute(_respondidas_agrupadas())}
+    salvo = {(c.usuario_id, c.origem, c.categoria_id): c.respondidas for c in ContadorCategoria.query if c.respondidas}
+    return [(chave, salvo.get(chave), esperado.get(chave))
+            for chave in sorted(set(esperado) | set(salvo)) if salvo.get(chave) != esperado.get(chave)]
\ No newline at end of file
@@ -1,121 +1,46 @@
-from flask_mail import Message
 from flask import current_app, url_for
-from .extensions import mail
-from threading import Thread
+from . import correio
 from datetime import datetime, timedelta
 from .models import Usuario, Departamento, Resposta
 from .extensions import db
 from sqlalchemy import func, case, or_
+import numpy as np
+import pandas as pd
 
-def enviar_emails_em_lote(app, usuarios, pergunta_texto, link_acesso):
-    """
-    Função que roda em segundo plano.
-    Recebe o 'link_acesso' já pronto para não precisar de usar url_for aqui.
-    """
-    with app.app_context():
-        with mail.connect() as conn:
-            for usuario in usuarios:
-                if not usuario.email:
-                    continue
-                
-                try:
-                    # Tratamento do Assunto
-                    assunto_curto = (pergunta_texto[:50] + '...') if len(pergunta_texto) > 50 else pergunta_texto
-
-                    msg = Message(
-                        subject=f"Nova Pergunta: {assunto_curto}",
-                        recipients=[usuario.email]
-                    )
-                    
-                    msg.body = f"""
-                    Olá, {usuario.nome}!
-                    
-                    Uma nova pergunta acabou de ser liberada no Quiz:
-                    
-                    "{pergunta_texto}"
-                    
-                    Entre agora para responder e garantir seus pontos!
-                    Link: {link_acesso}
-                    
-                    Atenciosamente,
-                    Equipe de Treinamento
-                    """
-                    
-                    conn.send(msg)
-                    print(f"Notificação enviada para: {usuario.nome}")
-                    
-                except Exception as e:
-                    print(f"Falha ao enviar para {usuario.nome}: {e}")
+# GIFs dos e-mails (você pode trocar por qualquer link da internet)
+GIF_RESUMO = "https://media.giphy.com/media/l0MYt5jPR6QX5pnqM/giphy.gif"    # um sino tocando / foguete
+GIF_LEMBRETE = "https://media.giphy.com/media/tXL4FHPSnVJ0A/giphy.gif"  # Mr. Bean olhando o relógio
 
 def enviar_notificacao_nova_pergunta(usuarios, pergunta_texto):
     """
-    Função chamada pela rota. Gera o link e inicia a Thread.
+    Função chamada pela rota. Gera o link e grava os e-mails na caixa de saída.
     """
-    app = current_app._get_current_object()
-    
-    # CORREÇÃO: Geramos o link AQUI, onde ainda temos o contexto da requisição
+    # Geramos o link AQUI, onde ainda temos o contexto da requisição
     link_acesso = url_for('auth.pagina_login', _external=True)
-    
-    # Passamos o link pronto como argumento para a thread
-    Thread(target=enviar_emails_em_lote, args=(app, usuarios, pergunta_texto, link_acesso)).start()
-
-
-def enviar_emails_resumo_thread(app, usuarios, titulos, link_acesso):
-    with app.app_context():
-        with mail.connect() as conn:
-            for usuario in usuarios:
-                try:
-                    qtd = len(titulos)
-                    msg = Message(
-                        subject=f"Temos {qtd} Novas Perguntas no Quiz!",
-                        recipients=[usuario.email]
-                    )
-                    
-                    # Cria a lista em formato HTML (com quebras de linha <br>)
-                    lista_txt = "<br>".join([f"• {t[:60]}..." for t in titulos])
-                    
-                    # URL do GIF (Você pode trocar por qualquer link da internet)
-                    # Exemplo: Um sino tocando ou um foguete
-                    url_gif = "https://media.giphy.com/media/l0MYt5jPR6QX5pnqM/giphy.gif" 
 
-                    # Define o corpo em HTML para suportar imagens/gifs
-                    msg.html = f"""
-                    <div style="font-family: Arial, sans-serif; color: #333;">
-                        <h2>Olá, {usuario.nome}! 👋</h2>
-                        
-                        <p>Temos novidades! Hoje foram liberadas <strong>{qtd} novas perguntas</strong> para você testar seus conhecimentos:</p>
-                        
-                        <div style="background-color: #f9f9f9; padding: 15px; border-left: 4px solid #17a2b8; margin: 20px 0;">
-                            {lista_txt}
-                        </div>
+    # Tratamento do Assunto
+    assunto_curto = (pergunta_texto[:50] + '...') if len(pergunta_texto) > 50 else pergunta_texto
+    modelo = correio.ModeloEmail('emails/nova_pergunta.txt', ['nome'], pergunta_texto=pergunta_texto, link_acesso=link_acesso)
+    mensagens = [{
+        'destinatario': u.email,
+        'assunto': f"Nova Pergunta: {assunto_curto}",
+        'corpo_texto': modelo.render(nome=u.nome)
+    } for u in usuarios if u.email]
+    return correio.enfileirar_varios(mensagens, tipo='nova_pergunta')
 
-                        <div style="text-align: center; margin: 20px 0;">
-                            <img src="{url_gif}" alt="Novidade" width="300" style="border-radius: 8px;">
-                        </div>
-
-                        <p>Acesse agora e garanta sua pontuação:</p>
-                        
-                        <a href="{link_acesso}" style="background-color: #28a745; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                            🚀 Responder Agora
-                        </a>
-                        
-                        <br><br>
-                        <p style="font-size: 12px; color: #999;">Boa sorte!<br>Equipe de Treinamento</p>
-                    </div>
-                    """
-                    
-                    # Mantemos o body (texto puro) como backup para e-mails antigos que não abrem HTML
-                    msg.body = f"Olá {usuario.nome}, temos {qtd} novas perguntas! Acesse: {link_acesso}"
-
-                    conn.send(msg)
-                except Exception as e:
-                    print(f"Erro ao enviar para {usuario.nome}: {e}")
-
-# 2. E atualize esta também para aceitar 'link_acesso' e passá-lo para a thread
 def enviar_email_resumo_do_dia(usuarios, titulos_perguntas, link_acesso): 
-    app = current_app._get_current_object()
-    # Adicionamos o link_acesso na lista de argumentos (args)
-    Thread(target=enviar_emails_resumo_thread, args=(app, usuarios, titulos_perguntas, link_acesso)).start()
+    qtd = len(titulos_perguntas)
+    # A lista de perguntas é igual para todos: entra no template uma vez só
+    modelo = correio.ModeloEmail('emails/resumo_do_dia.html', ['nome'], qtd=qtd, titulos=titulos_perguntas,
+                                 link_acesso=link_acesso, url_gif=GIF_RESUMO)
+    mensagens = [{
+        'destinatario': u.email,
+        'assunto': f"Temos {qtd} Novas Perguntas no Quiz!",
+        'corpo_html': modelo.render(nome=u.nome),
+        # Mantemos o body (texto puro) como backup para e-mails antigos que não abrem HTML
+        'corpo_texto': f"Olá {u.nome}, temos {qtd} novas perguntas! Acesse: {link_acesso}"
+    } for u in usuarios if u.email]
+    return correio.enfileirar_varios(mensagens, tipo='resumo_do_dia')
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -145,32 +70,110 @@ def get_texto_da_opcao(pergunta, opcao):
     if opcao == 'f': return "Falso"
     return ""
 
+TIPOS_VALIDOS = ['multipla_escolha', 'verdadeiro_falso', 'discursiva']
+MENSAGENS_VALIDACAO = {
+    'texto': "O texto não pode ser vazio.",
+    'tipo': "Tipo inválido.",
+    'resposta_multipla': "Deve ser a, b, c ou d.",
+    'resposta_vf': "Deve ser v ou f.",
+    'data_liberacao': "Formato inválido. Use DD/MM/AAAA.",
+    'tempo_limite': "Deve ser um número.",
+}
+
 def validar_linha(row):
     """Valida uma linha da planilha de importação."""
     errors = {}
-    if not row.get('texto'): errors['texto'] = "O texto não pode ser vazio."
+    if not row.get('texto'): errors['texto'] = MENSAGENS_VALIDACAO['texto']
     tipo = str(row.get('tipo') or '').lower()
-    if tipo not in ['multipla_escolha', 'verdadeiro_falso', 'discursiva']:
-        errors['tipo'] = "Tipo inválido."
+    if tipo not in TIPOS_VALIDOS:
+        errors['tipo'] = MENSAGENS_VALIDACAO['tipo']
     resposta = str(row.get('resposta_correta') or '').lower()
     if tipo == 'multipla_escolha' and resposta not in ['a', 'b', 'c', 'd']:
-        errors['resposta_correta'] = "Deve ser a, b, c ou d."
+        errors['resposta_correta'] = MENSAGENS_VALIDACAO['resposta_multipla']
     elif tipo == 'verdadeiro_falso' and resposta not in ['v', 'f']:
-        errors['resposta_correta'] = "Deve ser v ou f."
+        errors['resposta_correta'] = MENSAGENS_VALIDACAO['resposta_vf']
     try:
         if isinstance(row.get('data_liberacao'), datetime):
              row['data_liberacao'] = row['data_liberacao'].strftime('%d/%m/%Y')
         datetime.strptime(str(row.get('data_liberacao', '')), '%d/%m/%Y').date()
     except (ValueError, TypeError):
-        errors['data_liberacao'] = "Formato inválido. Use DD/MM/AAAA."
+        errors['data_liberacao'] = MENSAGENS_VALIDACAO['data_liberacao']
     if tipo != 'discursiva':
         try:
             int(float(row.get('tempo_limite', '')))
-        except (ValueError, TypeError):
-            errors['tempo_limite'] = "Deve ser um número."
+        except (ValueError, TypeError, OverflowError):
+            errors['tempo_limite'] = MENSAGENS_VALIDACAO['tempo_limite']
     is_valid = not errors
     return is_valid, errors
 
+def _coluna_texto(df, coluna):
+    """Coluna como str, com vazio no lugar de ausente/None (o `or ''` do validar_linha)."""
+    if coluna not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[coluna].where(df[coluna].notna() & (df[coluna] != 0), '').astype(str)
+
+def _float_ou_nan(valor):
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        return np.nan
+
+def validar_lote(df):
+    """Versão vetorizada do validar_linha para um DataFrame inteiro (um bloco da planilha).
+    Retorna (validas, erros): um array booleano por linha e, para cada linha, o dict de
+    erros com as mesmas chaves e mensagens do validar_linha. Assim como ele, converte
+    datas vindas como datetime para DD/MM/AAAA no próprio DataFrame."""
+    n = len(df)
+    texto = _coluna_texto(df, 'texto')
+    tipo = _coluna_texto(df, 'tipo').str.lower()
+    resposta = _coluna_texto(df, 'resposta_correta').str.lower()
+
+    if 'data_liberacao' in df.columns:
+        if df['data_liberacao'].dtype == object:
+            eh_data = df['data_liberacao'].map(type).eq(datetime)
+            if eh_data.any():
+                df.loc[eh_data, 'data_liberacao'] = pd.to_datetime(df.loc[eh_data, 'data_liberacao']).dt.strftime('%d/%m/%Y')
+        datas = pd.to_datetime(df['data_liberacao'].astype(str), format='%d/%m/%Y', errors='coerce')
+        erro_data = datas.isna().to_numpy()
+    else:
+        erro_data = np.ones(n, dtype=bool)
+
+    if 'tempo_limite' in df.columns:
+        brutos = df['tempo_limite'].astype(str).str.strip()
+        tempos = pd.to_numeric(brutos, errors='coerce')
+        # float() aceita coisas que o to_numeric recusa ('1_000', dígitos Unicode como '١٢'):
+        # as recusadas (poucas, em geral) são refeitas uma a uma com o float() do validar_linha
+        recusadas = tempos.isna() & (brutos != '')
+        if recusadas.any():
+            tempos[recusadas] = brutos[recusadas].map(_float_ou_nan)
+        erro_tempo_valor = ~np.isfinite(tempos.to_numpy(dtype=float))
+    else:
+        erro_tempo_valor = np.ones(n, dtype=bool)
+
+    erro_texto = (texto == '').to_numpy()
+    erro_tipo = ~tipo.isin(TIPOS_VALIDOS).to_numpy()
+    erro_multipla = (tipo == 'multipla_escolha').to_numpy() & ~resposta.isin(['a', 'b', 'c', 'd']).to_numpy()
+    erro_vf = (tipo == 'verdadeiro_falso').to_numpy() & ~resposta.isin(['v', 'f']).to_numpy()
+    erro_tempo = (tipo != 'discursiva').to_numpy() & erro_tempo_valor
+
+    colunas = [
+        ('texto', erro_texto, MENSAGENS_VALIDACAO['texto']),
+        ('tipo', erro_tipo, MENSAGENS_VALIDACAO['tipo']),
+        ('resposta_correta', erro_multipla, MENSAGENS_VALIDACAO['resposta_multipla']),
+        ('resposta_correta', erro_vf, MENSAGENS_VALIDACAO['resposta_vf']),
+        ('data_liberacao', erro_data, MENSAGENS_VALIDACAO['data_liberacao']),
+        ('tempo_limite', erro_tempo, MENSAGENS_VALIDACAO['tempo_limite']),
+    ]
+    invalidas = np.zeros(n, dtype=bool)
+    for _, mascara, _ in colunas:
+        invalidas |= mascara
+
+    # Só as linhas com problema ganham um dict preenchido
+    erros = [{} for _ in range(n)]
+    for i in np.flatnonzero(invalidas):
+        erros[i] = {campo: mensagem for campo, mascara, mensagem in colunas if mascara[i]}
+    return ~invalidas, erros
+
 def _gerar_dados_relatorio(departamento_id=None):
     """Função auxiliar para relatórios."""
     query = db.session.query(
@@ -201,66 +204,17 @@ def _gerar_dados_relatorio(departamento_id=None):
         })
     return relatorios_finais
 
-def enviar_lembrete_pendencias_thread(app, dados_usuarios, link_acesso):
+def disparar_lembretes_pendencias(dados_usuarios, link_acesso):
     """
-    Envia e-mails de lembrete para usuários com pendências.
+    Grava os lembretes na caixa de saída.
     dados_usuarios: Lista de tuplas (usuario, qtd_pendente)
     """
-    with app.app_context():
-        with mail.connect() as conn:
-            for usuario, qtd in dados_usuarios:
-                if not usuario.email:
-                    continue
-                
-                try:
-                    msg = Message(
-                        subject=f"⏳ Ops! Você tem {qtd} perguntas pendentes...",
-                        recipients=[usuario.email]
-                    )
-                    
-                    # GIF divertido de "Esperando" (Mr. Bean olhando o relógio)
-                    url_gif = "https://media.giphy.com/media/tXL4FHPSnVJ0A/giphy.gif"
-                    
-                    msg.html = f"""
-                    <div style="font-family: Arial, sans-serif; color: #333; max-width: 600px; margin: 0 auto;">
-                        <h2 style="color: #d63384;">Toc toc, {usuario.nome}! 👻</h2>
-                        
-                        <p>Notamos que você deixou passar algumas atividades...</p>
-                        
-                        <div style="background-color: #fff3cd; padding: 20px; border-radius: 10px; text-align: center; border: 1px solid #ffeeba;">
-                            <span style="font-size: 40px; display: block; margin-bottom: 10px;">😱</span>
-                            <strong style="font-size: 18px; color: #856404;">
-                                Você tem {qtd} perguntas esperando sua resposta!
-                            </strong>
-                        </div>
-
-                        <div style="text-align: center; margin: 30px 0;">
-                            <img src="{url_gif}" alt="Esperando" width="100%" style="max-width: 350px; border-radius: 8px;">
-                            <p style="font-size: 12px; color: #888; margin-top: 5px;"><i>Nós esperando você responder para atualizar o Ranking...</i></p>
-                        </div>
-
-                        <p>Não deixe acumular! Responda rapidinho e garanta seus pontos:</p>
-                        
-                        <div style="text-align: center; margin: 30px 0;">
-                            <a href="{link_acesso}" style="background-color: #007bff; color: white; padding: 15px 30px; text-decoration: none; border-radius: 50px; font-weight: bold; font-size: 16px;">
-                                🏃‍♂️ Correr para o Quiz
-                            </a>
-                        </div>
-                        
-                        <hr style="border: 0; border-top: 1px solid #eee;">
-                        <p style="font-size: 12px; color: #999; text-align: center;">Vamos lá! Você consegue!<br>Equipe de Treinamento</p>
-                    </div>
-                    """
-                    
-                    # Texto puro como backup
-                    msg.body = f"Oi {usuario.nome}! Você tem {qtd} perguntas pendentes. Acesse agora: {link_acesso}"
-
-                    conn.send(msg)
-                    print(f"Lembrete divertido enviado para: {usuario.nome}")
-                    
-                except Exception as e:
-                    print(f"Erro ao enviar para {usuario.nome}: {e}")
-
-def disparar_lembretes_pendencias(dados_usuarios, link_acesso):
-    app = current_app._get_current_object()
-    Thread(target=enviar_lembrete_pendencias_thread, args=(app, dados_usuarios, link_acesso)).start()
\ No newline at end of file
+    modelo = correio.ModeloEmail('emails/lembrete.html', ['nome', 'qtd'], link_acesso=link_acesso, url_gif=GIF_LEMBRETE)
+    mensagens = [{
+        'destinatario': usuario.email,
+        'assunto': f"⏳ Ops! Você tem {qtd} perguntas pendentes...",
+        'corpo_html': modelo.render(nome=usuario.nome, qtd=qtd),
+        # Texto puro como backup
+        'corpo_texto': f"Oi {usuario.nome}! Você tem {qtd} perguntas pendentes. Acesse agora: {link_acesso}"
+    } for usuario, qtd in dados_usuarios if usuario.email]
+    return correio.enfileirar_varios(mensagens, tipo='lembrete')
\ No newline at end of file
@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+from urllib import request as urlrequest, parse as urlparse
+from urllib.error import HTTPError
+
+# Benchmark de carga: simula o "pico de início de turno" (todo mundo logando,
+# abrindo o dashboard e respondendo o quiz ao mesmo tempo) e alguns admins
+# olhando analytics e exportando relatórios. Mede p50/p95/p99 e vazão por rota.
+#
+# Uso:
+#   python benchmark_carga.py --semear                      # cria um banco de teste e roda
+#   python benchmark_carga.py --setores 20 --usuarios 2000 --perguntas 500 --respostas 200000 --semear
+#   python benchmark_carga.py --banco postgresql://...  --semear --sessoes 300 --threads 16
+#   python benchmark_carga.py --url http://127.0.0.1:8000   # contra um gunicorn local (banco já semeado)
+#   python benchmark_carga.py --saida resultado.json        # guarda os números para comparar depois
+#
+# O banco informado em --banco é APAGADO e recriado por --semear. Por segurança o
+# padrão é um SQLite próprio (instance/benchmark_carga.db), nunca o DATABASE_URL do app.
+
+BANCO_PADRAO = 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'benchmark_carga.db')
+ADMIN_EMAIL, ADMIN_SENHA = 'benchmark@local', 'benchmark'
+CATEGORIAS = ['Geral', 'Produto', 'Processos', 'Atendimento', 'Segurança', 'Vendas', 'Sem Classificação']
+
+def codigo_acesso(i):
+    # codigo_acesso tem 4 caracteres: base 36 dá 1,6 milhão de usuários
+    alfabeto = string.digits + string.ascii_uppercase
+    codigo = ''
+    for _ in range(4):
+        i, resto = divmod(i, 36)
+        codigo = alfabeto[resto] + codigo
+    return codigo
+
+# --- Massa de dados ---
+
+def semear(args):
+    from sqlalchemy import insert
+    from app.extensions import db
+    from app.models import (Departamento, Usuario, Pergunta, Resposta, Administrador, Categoria,
+                            pergunta_departamento_association)
+    from app import elegibilidade, placar, temas, migracoes
+
+    rnd = random.Random(args.seed)
+    inicio = time.perf_counter()
+    print(f"--- 🌱 Semeando {args.setores} setores, {args.usuarios} usuários, {args.perguntas} perguntas, {args.respostas} respostas ---")
+    db.drop_all()
+    migracoes.aplicar_pendentes(progresso=None)
+
+    def em_lotes(modelo_ou_tabela, linhas, tamanho=5000):
+        for i in range(0, len(linhas), tamanho):
+            db.session.execute(insert(modelo_ou_tabela), linhas[i:i + tamanho])
+
+    em_lotes(Departamento, [{'id': d, 'nome': f'Setor {d:03d}'} for d in range(1, args.setores + 1)])
+    em_lotes(Usuario, [{'id': u, 'nome': f'Usuário {u}', 'email': f'usuario{u}@benchmark.local',
+                        'codigo_acesso': codigo_acesso(u), 'departamento_id': rnd.randint(1, args.setores)}
+                       for u in range(1, args.usuarios + 1)])
+    em_lotes(Categoria, [{'id': c, 'nome': nome, 'chave': nome.lower()} for c, nome in enumerate(CATEGORIAS, 1)])
+    categoria_ids = {nome: c for c, nome in enumerate(CATEGORIAS, 1)}
+    admin = Administrador(nome='Benchmark', email=ADMIN_EMAIL)
+    admin.set_senha(ADMIN_SENHA)
+    db.session.add(admin)
+
+    hoje = (datetime.utcnow() - timedelta(hours=3)).date()
+    perguntas, associacoes, tipos = [], [], {}
+    for p in range(1, args.perguntas + 1):
+        tipo = rnd.choices(['multipla_escolha', 'verdadeiro_falso', 'discursiva'], weights=[6, 3, 1])[0]
+        para_todos = rnd.random() < 0.6
+        tipos[p] = tipo
+        perguntas.append({
+            'id': p, 'tipo': tipo, 'texto': f'Pergunta de benchmark {p}?',
+            'opcao_a': 'Opção A' if tipo == 'multipla_escolha' else None,
+            'opcao_b': 'Opção B' if tipo == 'multipla_escolha' else None,
+            'opcao_c': 'Opção C' if tipo == 'multipla_escolha' else None,
+            'opcao_d': 'Opção D' if tipo == 'multipla_escolha' else None,
+            'resposta_correta': {'multipla_escolha': rnd.choice('abcd'), 'verdadeiro_falso': rnd.choice('vf')}.get(tipo),
+            'explicacao': 'Explicação.', 'data_liberacao': hoje - timedelta(days=rnd.randint(0, 180)),
+            'tempo_limite': None if tipo == 'discursiva' else 30,
+            'categoria_id': categoria_ids[rnd.choice(CATEGORIAS)], 'para_todos_setores': para_todos,
+        })
+        if not para_todos:
+            for d in rnd.sample(range(1, args.setores + 1), k=min(args.setores, rnd.randint(1, 3))):
+                associacoes.append({'pergunta_id': p, 'departamento_id': d})
+    em_lotes(Pergunta, perguntas)
+    if associacoes:
+        em_lotes(pergunta_departamento_association, associacoes)
+
+    # Respostas: pares (usuário, pergunta) sem repetição, espalhadas nos últimos 90 dias
+    respostas, vistos = [], set()
+    maximo = min(args.respostas, args.usuarios * args.perguntas)
+    agora = datetime.utcnow()
+    while len(respostas) < maximo:
+        u, p = rnd.randint(1, args.usuarios), rnd.randint(1, args.perguntas)
+        if (u, p) in vistos:
+            continue
+        vistos.add((u, p))
+        discursiva = tipos[p] == 'discursiva'
+        acertou = rnd.random() < 0.6
+        respostas.append({
+            'usuario_id': u, 'pergunta_id': p,
+            'data_resposta': agora - timedelta(minutes=rnd.randint(0, 90 * 24 * 60)),
+            'resposta_dada': None if discursiva else rnd.choice('abcd'),
+            'texto_discursivo': 'Resposta discursiva de benchmark.' if discursiva else None,
+            'pontos': (100 if acertou else 0) if not discursiva else (rnd.choice([None, 0, 50, 100])),
+            'status_correcao': rnd.choice(['pendente', 'correto', 'incorreto', 'parcialmente_correto']) if discursiva
+                               else ('correto' if acertou else 'incorreto'),
+            'feedback_visto': True,
+        })
+    em_lotes(Resposta, respostas)
+    db.session.commit()
+
+    elegibilidade.reconstruir()
+    placar.reconstruir()
+    temas.reconstruir()
+    print(f"✅ Banco semeado em {time.perf_counter() - inicio:.1f}s")
+
+# --- Clientes (Flask test client ou HTTP de verdade) ---
+
+class ClienteFlask:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, url):
+        r = self.client.get(url)
+        return r.status_code, r.get_data().decode('utf-8', errors='ignore')
+
+    def post(self, url, dados):
+        r = self.client.post(url, data=dados)
+        return r.status_code, r.get_data().decode('utf-8', errors='ignore')
+
+class ClienteHTTP:
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self.opener = urlrequest.build_opener(urlrequest.HTTPCookieProcessor(CookieJar()), _SemRedirect)
+
+    def _abrir(self, req):
+        try:
+            with self.opener.open(req, timeout=120) as r:
+                return r.status, r.read().decode('utf-8', errors='ignore')
+        except HTTPError as e:
+            return e.code, e.read().decode('utf-8', errors='ignore')
+
+    def get(self, url):
+        return self._abrir(urlrequest.Request(self.base + url))
+
+    def post(self, url, dados):
+        return self._abrir(urlrequest.Request(self.base + url, data=urlparse.urlencode(dados).encode()))
+
+class _SemRedirect(urlrequest.HTTPRedirectHandler):
+    # Igual ao test client: o redirect conta como resposta da própria rota
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+# --- Fluxos ---
+
+class Medidor:
+    def __init__(self):
+        self.tempos = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def medir(self, rota, funcao, *args, esperado=(200, 302)):
+        inicio = time.perf_counter()
+        try:
+            status, corpo = funcao(*args)
+        except Exception as e:  # conexão recusada, timeout... conta como erro da rota
+            status, corpo = 0, str(e)
+        duracao = time.perf_counter() - inicio
+        with self.lock:
+            self.tempos[rota].append(duracao)
+            if status not in esperado:
+                self.erros[rota] += 1
+        return status, corpo
+
+def fluxo_usuario(cliente, medidor, codigo, departamento_id, passos_quiz, rnd):
+    medidor.medir('POST /login', cliente.post, '/login', {'codigo': codigo})
+    medidor.medir('GET /dashboard', cliente.get, '/dashboard')
+    for _ in range(passos_quiz):
+        status, corpo = medidor.medir('GET /quiz', cliente.get, '/quiz')
+        achou = re.search(r'name="pergunta_id" value="(\d+)"', corpo) if status == 200 else None
+        if not achou:
+            break
+        opcoes = re.findall(r'name="resposta" value="([a-dvf])"', corpo) or ['a']
+        token = re.search(r'name="token_envio" value="([^"]*)"', corpo)
+        medidor.medir('POST /responder', cliente.post, '/responder', {
+            'pergunta_id': achou.group(1), 'resposta': rnd.choice(opcoes),
+            'categoria': '',
+            'token_envio': token.group(1) if token else ''
+        })
+    medidor.medir('GET /ranking', cliente.get, '/ranking')
+    medidor.medir('GET /ranking/<id>', cliente.get, f'/ranking/{departamento_id}')
+
+def fluxo_admin(cliente, medidor):
+    medidor.medir('POST /admin/ (login)', cliente.post, '/admin/', {'email': ADMIN_EMAIL, 'senha': ADMIN_SENHA})
+    medidor.medir('GET /admin/analytics', cliente.get, '/admin/analytics?filtro_acertos=todos')
+    medidor.medir('GET /admin/correcoes', cliente.get, '/admin/correcoes')
+    medidor.medir('GET /admin/relatorios/exportar', cliente.get, '/admin/relatorios/exportar')
+    medidor.medir('GET /admin/relatorios/exportar_detalhado', cliente.get,
+                  '/admin/relatorios/exportar_detalhado?filtro_acertos=todos&formato=csv')
+
+def rodar(args, novo_cliente, usuarios):
+    medidor = Medidor()
+    tarefas = [('usuario', u) for u in usuarios] + [('admin', None)] * args.admins
+    random.Random(args.seed).shuffle(tarefas)
+    lock = threading.Lock()
+
+    def trabalhador(indice):
+        rnd = random.Random(args.seed + indice)
+        while True:
+            with lock:
+                if not tarefas:
+                    return
+                tipo, dados = tarefas.pop()
+            cliente = novo_cliente()
+            if tipo == 'usuario':
+                fluxo_usuario(cliente, medidor, dados[0], dados[1], args.quiz_passos, rnd)
+            else:
+                fluxo_admin(cliente, medidor)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(args.threads)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return medidor, time.perf_counter() - inicio
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def relatorio(medidor, duracao):
+    linhas = []
+    for rota, tempos in sorted(medidor.tempos.items()):
+        linhas.append({
+            'rota': rota, 'requisicoes': len(tempos), 'erros': medidor.erros[rota],
+            'p50_ms': round(percentil(tempos, 50) * 1000, 1),
+            'p95_ms': round(percentil(tempos, 95) * 1000, 1),
+            'p99_ms': round(percentil(tempos, 99) * 1000, 1),
+            'max_ms': round(max(tempos) * 1000, 1),
+            'req_s': round(len(tempos) / duracao, 1),
+        })
+    total = sum(linha['requisicoes'] for linha in linhas)
+
+    print(f"\n{'Rota':42} {'N':>6} {'Erros':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'req/s':>7}")
+    for l in linhas:
+        print(f"{l['rota']:42} {l['requisicoes']:>6} {l['erros']:>6} {l['p50_ms']:>8} {l['p95_ms']:>8} {l['p99_ms']:>8} {l['max_ms']:>8} {l['req_s']:>7}")
+    print(f"\nTotal: {total} requisições em {duracao:.1f}s ({total / duracao:.1f} req/s)")
+    return {'duracao_s': round(duracao, 2), 'requisicoes': total, 'rotas': linhas}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de carga (pico de login no início do turno)')
+    parser.add_argument('--banco', default=BANCO_PADRAO, help='URL do banco de teste (é apagado por --semear)')
+    parser.add_argument('--url', help='Roda contra um servidor (ex.: gunicorn local) em vez do test client')
+    parser.add_argument('--semear', action='store_true', help='Apaga e recria o banco com a massa de dados')
+    parser.add_argument('--setores', type=int, default=10)
+    parser.add_argument('--usuarios', type=int, default=500)
+    parser.add_argument('--perguntas', type=int, default=200)
+    parser.add_argument('--respostas', type=int, default=20000)
+    parser.add_argument('--sessoes', type=int, default=100, help='Usuários que entram no pico')
+    parser.add_argument('--admins', type=int, default=3, help='Sessões de admin no pico')
+    parser.add_argument('--quiz-passos', type=int, default=5, help='Perguntas respondidas por sessão')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--saida', help='Grava o resultado em JSON')
+    args = parser.parse_args()
+
+    if args.semear and args.banco == os.environ.get('DATABASE_URL'):
+        sys.exit("❌ --banco é o mesmo DATABASE_URL do app; o benchmark apagaria os dados. Use outro banco.")
+
+    # O app lê o DATABASE_URL ao ser criado, então precisa vir antes do import
+    os.environ['DATABASE_URL'] = args.banco
+    os.environ.setdefault('METRICAS_ATIVAS', '0')
+    os.environ.setdefault('RELATORIOS_EM_SEGUNDO_PLANO', '0')  # mede a exportação em si
+    os.makedirs(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance'), exist_ok=True)
+    from run import app
+    from app.extensions import db
+    from app.models import Usuario
+
+    with app.app_context():
+        if args.semear:
+            semear(args)
+        todos = db.session.query(Usuario.codigo_acesso, Usuario.departamento_id).order_by(Usuario.id).all()
+        usuarios = random.Random(args.seed).sample([tuple(u) for u in todos], k=min(args.sessoes, len(todos)))
+    if not usuarios:
+        sys.exit("❌ Banco sem usuários. Rode com --semear.")
+
+    if args.url:
+        novo_cliente = lambda: ClienteHTTP(args.url)
+        print(f"--- 🚀 Pico de {len(usuarios)} sessões contra {args.url} ({args.threads} threads) ---")
+    else:
+        novo_cliente = lambda: ClienteFlask(app)
+        print(f"--- 🚀 Pico de {len(usuarios)} sessões no test client ({args.threads} threads) ---")
+
+    medidor, duracao = rodar(args, novo_cliente, usuarios)
+    resultado = relatorio(medidor, duracao)
+    if args.saida:
+        resultado['parametros'] = vars(args)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Resultado gravado em {args.saida}")
\ No newline at end of file
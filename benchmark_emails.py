@@ -0,0 +1,57 @@
+from run import app
+import argparse
+import random
+import time
+
+# Micro-benchmark dos e-mails em lote: renderizar o template Jinja inteiro para
+# cada destinatário x ModeloEmail (template renderizado uma vez por lote, só os
+# campos do usuário substituídos por mensagem). Confere que os dois dão o mesmo HTML.
+# Uso: python benchmark_emails.py [--mensagens 10000] [--perguntas 8] [--repeticoes 3]
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Érica', 'Fábio', 'Gabi', 'Hugo', 'Íris', 'João & Cia', 'Léa <TI>']
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark da renderização dos e-mails em lote')
+    parser.add_argument('--mensagens', type=int, default=10000)
+    parser.add_argument('--perguntas', type=int, default=8, help='Perguntas na lista do resumo do dia')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    usuarios = [(f"{rnd.choice(NOMES)} {i}", rnd.randint(1, 40)) for i in range(args.mensagens)]
+    titulos = [f"Qual é o procedimento correto número {i} para o atendimento ao cliente?" for i in range(args.perguntas)]
+    link = 'https://quiz.exemplo.com/'
+
+    with app.app_context():
+        from app.correio import ModeloEmail
+        from app.utils import GIF_RESUMO, GIF_LEMBRETE
+
+        casos = [
+            ('resumo_do_dia', 'emails/resumo_do_dia.html', ['nome'],
+             dict(qtd=len(titulos), titulos=titulos, link_acesso=link, url_gif=GIF_RESUMO), lambda nome, qtd: {'nome': nome}),
+            ('lembrete', 'emails/lembrete.html', ['nome', 'qtd'],
+             dict(link_acesso=link, url_gif=GIF_LEMBRETE), lambda nome, qtd: {'nome': nome, 'qtd': qtd}),
+        ]
+        print(f"--- {args.mensagens} mensagens (melhor de {args.repeticoes}) ---")
+        for nome_caso, template_nome, campos, compartilhado, por_usuario in casos:
+            template = app.jinja_env.get_template(template_nome)
+            t_jinja, por_mensagem = cronometrar(
+                lambda: [template.render(**compartilhado, **por_usuario(n, q)) for n, q in usuarios], args.repeticoes)
+
+            def em_lote():
+                modelo = ModeloEmail(template_nome, campos, **compartilhado)
+                return [modelo.render(**por_usuario(n, q)) for n, q in usuarios]
+            t_lote, lote = cronometrar(em_lote, args.repeticoes)
+
+            divergencias = sum(1 for a, b in zip(por_mensagem, lote) if a != b)
+            print(f"{nome_caso}:")
+            print(f"  template.render por mensagem: {t_jinja * 1000:8.1f} ms")
+            print(f"  ModeloEmail (uma vez/lote):   {t_lote * 1000:8.1f} ms   ({t_jinja / t_lote:.1f}x) | divergências: {divergencias}")
\ No newline at end of file
@@ -0,0 +1,93 @@
+import argparse
+import random
+import time
+import pandas as pd
+from app.utils import validar_linha, validar_lote
+
+# Micro-benchmark: validar_linha (linha a linha) x validar_lote (vetorizado).
+# Gera uma planilha sintética com ~10% de linhas inválidas, confere que os dois
+# caminhos dão exatamente os mesmos erros e mostra o tempo de cada um. Depois
+# confere os dois com valores aleatórios (--fuzz linhas): o preview revalida com
+# validar_linha e a importação com validar_lote, então qualquer divergência é erro.
+# Uso: python benchmark_validacao.py [--linhas 10000] [--repeticoes 5] [--fuzz 20000]
+
+# Pedaços dos valores do fuzz: números, sinais, expoente, '_', espaços (inclusive Unicode),
+# dígitos de outros sistemas de escrita e palavras que float() conhece
+PEDACOS = ['0', '1', '5', '30', '.', ',', '-', '+', 'e', 'E', '_', ' ', '\t', '\u00a0', '\u2003',
+           '١٢', '٣', '۴', '१०', '５', 'nan', 'inf', 'Infinity', 'x', 'v', 'F', '/', '2024', '01/02/2024']
+
+def gerar_linhas(n, seed=42):
+    rnd = random.Random(seed)
+    linhas = []
+    for i in range(n):
+        tipo = rnd.choice(['multipla_escolha', 'multipla_escolha', 'verdadeiro_falso', 'discursiva'])
+        linha = {
+            'tipo': tipo,
+            'texto': f'Pergunta {i}',
+            'opcao_a': 'A', 'opcao_b': 'B', 'opcao_c': 'C', 'opcao_d': 'D',
+            'resposta_correta': {'multipla_escolha': 'a', 'verdadeiro_falso': 'v', 'discursiva': ''}[tipo],
+            'data_liberacao': f'{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2024',
+            'tempo_limite': '' if tipo == 'discursiva' else str(rnd.choice([15, 30, 60])),
+            'setor': 'todos',
+        }
+        if rnd.random() < 0.1:  # estraga um campo
+            campo, valor = rnd.choice([('tipo', 'xx'), ('texto', ''), ('resposta_correta', 'z'),
+                                       ('data_liberacao', '2024-13-01'), ('tempo_limite', 'abc')])
+            linha[campo] = valor
+        linhas.append(linha)
+    return linhas
+
+def gerar_fuzz(n, seed=7):
+    rnd = random.Random(seed)
+    def valor():
+        return ''.join(rnd.choice(PEDACOS) for _ in range(rnd.randint(0, 4)))
+    tipos = ['multipla_escolha', 'verdadeiro_falso', 'discursiva', 'MULTIPLA_ESCOLHA', 'xx', '']
+    return [{
+        'tipo': rnd.choice(tipos),
+        'texto': rnd.choice(['', 'Pergunta', valor()]),
+        'resposta_correta': rnd.choice(['a', 'B', 'v', 'f', '', valor()]),
+        'data_liberacao': rnd.choice(['01/02/2024', '31/02/2024', valor()]),
+        'tempo_limite': rnd.choice([rnd.randint(0, 120), rnd.random() * 100, None, valor(), valor()]),
+    } for _ in range(n)]
+
+def linhas_divergentes(linhas):
+    """Linhas em que validar_linha e validar_lote discordam (válida ou dict de erros)."""
+    por_linha = [validar_linha(dict(row)) for row in linhas]
+    validas, erros = validar_lote(pd.DataFrame(linhas))
+    return [i for i, ((ok, e), v, e2) in enumerate(zip(por_linha, validas, erros)) if ok != v or e != e2]
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark da validação da planilha de importação')
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--fuzz', type=int, default=20000, help='Linhas aleatórias comparadas entre os dois (0 = pula)')
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+    df = pd.DataFrame(linhas)
+
+    t_linha, por_linha = cronometrar(lambda: [validar_linha(dict(row)) for row in linhas], args.repeticoes)
+    t_lote, (validas, erros) = cronometrar(lambda: validar_lote(df.copy()), args.repeticoes)
+
+    divergencias = sum(1 for (ok, e), v, e2 in zip(por_linha, validas, erros) if ok != v or e != e2)
+    print(f"--- Validação de {args.linhas} linhas (melhor de {args.repeticoes}) ---")
+    print(f"validar_linha (linha a linha): {t_linha * 1000:8.1f} ms")
+    print(f"validar_lote  (vetorizado):    {t_lote * 1000:8.1f} ms   ({t_linha / t_lote:.1f}x)")
+    print(f"Linhas inválidas: {int((~validas).sum())} | divergências entre os dois: {divergencias}")
+
+    if args.fuzz:
+        linhas_fuzz = gerar_fuzz(args.fuzz)
+        diferentes = linhas_divergentes(linhas_fuzz)
+        print(f"Fuzz: {args.fuzz} linhas aleatórias, {len(diferentes)} divergências")
+        for i in diferentes[:5]:
+            print(f"   {linhas_fuzz[i]!r}")
+        if diferentes or divergencias:
+            raise SystemExit("validar_linha e validar_lote discordam.")
\ No newline at end of file
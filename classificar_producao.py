@@ -1,9 +1,27 @@
+import argparse
+import csv
+from collections import defaultdict
 from app import create_app, db
 from app.models import Pergunta
-from sqlalchemy import func
+from app import categorias
 
 app = create_app()
 
+# Uso:
+#   python classificar_producao.py                         -> modo interativo (pergunta por pergunta da 'Geral')
+#   python classificar_producao.py --mapa mapa.csv         -> aplica um arquivo de mapeamento, sem perguntas
+#   python classificar_producao.py --mapa mapa.csv --simular -> só mostra quantas perguntas mudariam
+#
+# O arquivo de mapeamento (CSV com cabeçalho, separado por vírgula ou ponto e vírgula)
+# tem a coluna 'categoria' (destino) e, em cada linha, uma destas:
+#   pergunta_id     -> move a pergunta com esse ID
+#   texto_contem    -> move as perguntas cujo texto contém o trecho (sem diferenciar maiúsculas)
+#   categoria_atual -> junta a categoria inteira no destino (a antiga deixa de existir)
+# Cada operação é um UPDATE só (IDs vão em blocos de LOTE_IDS) com commit logo em
+# seguida, então a tabela fica travada só por poucos milissegundos de cada vez.
+
+LOTE_IDS = 500
+
 def reclassificar_geral():
     with app.app_context():
         print("\n=== RECLASSIFICADOR DE PERGUNTAS 'GERAL' ===")
@@ -12,7 +30,7 @@ def reclassificar_geral():
 
         # --- MUDANÇA AQUI: Busca perguntas onde a categoria é 'Geral' ---
         perguntas_para_alterar = Pergunta.query.filter(
-            func.lower(Pergunta.categoria) == 'geral'
+            Pergunta.categoria_id == categorias.filtro_id('Geral')
         ).all()
 
         total = len(perguntas_para_alterar)
@@ -47,22 +65,79 @@ def reclassificar_geral():
                 nova_cat = nova_cat.title()
                 ultima_categoria_digitada = nova_cat
 
-            # Só salva se houve mudança real
-            if p.categoria != nova_cat:
-                p.categoria = nova_cat
+            # Só salva se houve mudança real (e já salva: nada fica pendurado na sessão)
+            if categorias.reclassificar(nova_cat, pergunta_ids=[p.id]):
+                db.session.commit()
                 alteradas += 1
                 print(f"✅ Alterada para: {nova_cat}")
             else:
                 print("⏭️  Sem alteração.")
 
-        # Salva tudo no final
+        print("-" * 60)
         if alteradas > 0:
-            print("-" * 60)
-            print(f"💾 Salvando {alteradas} alterações no banco de dados...")
-            db.session.commit()
-            print("🚀 Concluído!")
+            print(f"🚀 Concluído! {alteradas} perguntas reclassificadas.")
         else:
             print("\nNenhuma alteração foi feita.")
 
+def _ler_mapa(caminho):
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=',;')
+        return [{(k or '').strip().lower(): (v or '').strip() for k, v in linha.items()}
+                for linha in csv.DictReader(arquivo, dialect=dialeto)]
+
+def aplicar_mapa(caminho, simular=False):
+    """Modo em lote: agrupa as linhas do mapa por destino e aplica um UPDATE por operação."""
+    with app.app_context():
+        ids_por_destino = defaultdict(list)
+        origens_por_destino = defaultdict(list)
+        trechos = []
+        ignoradas = 0
+        for linha in _ler_mapa(caminho):
+            destino = linha.get('categoria')
+            if not destino:
+                ignoradas += 1
+            elif linha.get('pergunta_id', '').isdigit():
+                ids_por_destino[destino].append(int(linha['pergunta_id']))
+            elif linha.get('texto_contem'):
+                trechos.append((linha['texto_contem'], destino))
+            elif linha.get('categoria_atual'):
+                origens_por_destino[destino].append(linha['categoria_atual'])
+            else:
+                ignoradas += 1
+
+        operacoes = []
+        for destino, origens in origens_por_destino.items():
+            operacoes.append((f"categorias {', '.join(origens)} -> '{destino}'",
+                              lambda s, o=origens, d=destino: categorias.juntar(o, d, simular=s)))
+        for destino, ids in ids_por_destino.items():
+            for inicio in range(0, len(ids), LOTE_IDS):
+                bloco = ids[inicio:inicio + LOTE_IDS]
+                operacoes.append((f"{len(bloco)} IDs -> '{destino}'",
+                                  lambda s, b=bloco, d=destino: categorias.reclassificar(d, pergunta_ids=b, simular=s)))
+        for trecho, destino in trechos:
+            operacoes.append((f"texto contém '{trecho}' -> '{destino}'",
+                              lambda s, t=trecho, d=destino: categorias.reclassificar(d, texto_contem=t, simular=s)))
+
+        print(f"\n=== {'SIMULAÇÃO' if simular else 'RECLASSIFICAÇÃO'} EM LOTE: {len(operacoes)} operações ===")
+        total = 0
+        for descricao, operacao in operacoes:
+            qtd = operacao(simular) or 0
+            if not simular:
+                db.session.commit()
+            total += qtd
+            print(f"{'🔎' if simular else '✅'} {descricao}: {qtd} perguntas")
+        if ignoradas:
+            print(f"⚠️ {ignoradas} linhas ignoradas (sem categoria de destino ou sem pergunta_id/texto_contem/categoria_atual).")
+        print(f"{'Mudariam' if simular else 'Mudaram'} {total} perguntas.")
+
 if __name__ == "__main__":
-    reclassificar_geral()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Reclassificação de perguntas por categoria')
+    parser.add_argument('--mapa', help='CSV de mapeamento (modo em lote, sem perguntas)')
+    parser.add_argument('--simular', action='store_true', help='Com --mapa: só conta o que mudaria')
+    args = parser.parse_args()
+    if args.mapa:
+        aplicar_mapa(args.mapa, simular=args.simular)
+    else:
+        reclassificar_geral()
\ No newline at end of file
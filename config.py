@@ -8,14 +8,62 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'csv'}
 
+    # Fila de próximas perguntas do quiz (cache em memória por worker)
+    FILA_QUIZ_TTL = int(os.environ.get('FILA_QUIZ_TTL', 300))        # segundos até remontar a fila
+    FILA_QUIZ_TAMANHO = int(os.environ.get('FILA_QUIZ_TAMANHO', 100)) # IDs guardados por fila
+    TEMAS_CACHE_TTL = int(os.environ.get('TEMAS_CACHE_TTL', 300))    # segundos de cache dos totais por tema de cada setor
+
+    # Listagens paginadas por cursor: segundos de cache do total (só para o "Página X de Y")
+    PAGINACAO_CONTAGEM_TTL = int(os.environ.get('PAGINACAO_CONTAGEM_TTL', 60))
+
+    # Cronômetro do quiz no servidor (app/cronometro.py)
+    CRONOMETRO_TTL = int(os.environ.get('CRONOMETRO_TTL', 3600))                   # segundos do início guardado em memória
+    CRONOMETRO_TOLERANCIA = float(os.environ.get('CRONOMETRO_TOLERANCIA', 2))       # segundos de rede/carregamento descontados
+    CRONOMETRO_EXPIRA_HORAS = int(os.environ.get('CRONOMETRO_EXPIRA_HORAS', 24))    # registros mais antigos (de perguntas já respondidas) são apagados
+
+    # Importação de planilhas: quantas perguntas por commit
+    IMPORTACAO_TAMANHO_LOTE = int(os.environ.get('IMPORTACAO_TAMANHO_LOTE', 500))
+    IMPORTACAO_BLOCO_LEITURA = int(os.environ.get('IMPORTACAO_BLOCO_LEITURA', 2000))  # linhas lidas da planilha por vez
+    IMPORTACAO_LINHAS_POR_PAGINA = 50   # linhas por página no preview
+    IMPORTACAO_EXPIRA_HORAS = 24        # importações abandonadas são apagadas depois disso
+    EXPORTACAO_TAMANHO_LOTE = int(os.environ.get('EXPORTACAO_TAMANHO_LOTE', 2000))  # linhas lidas do banco por vez nas exportações
+
+    # Migrações de esquema (migrar.py): faixa de ids por commit nos preenchimentos em lote
+    MIGRACOES_TAMANHO_LOTE = int(os.environ.get('MIGRACOES_TAMANHO_LOTE', 5000))
+
+    # Relatórios em segundo plano: RELATORIOS_EM_SEGUNDO_PLANO=1 só com o worker_relatorios.py rodando
+    # (sem ele as tarefas ficariam na fila para sempre); desligado, a exportação é gerada na própria requisição
+    RELATORIOS_EM_SEGUNDO_PLANO = os.environ.get('RELATORIOS_EM_SEGUNDO_PLANO', '0') == '1'
+    RELATORIOS_DIR = os.environ.get('RELATORIOS_DIR')  # padrão: instance/relatorios
+    RELATORIOS_MAX_SIMULTANEOS = int(os.environ.get('RELATORIOS_MAX_SIMULTANEOS', 2))  # tarefas rodando ao mesmo tempo (todos os workers)
+    RELATORIOS_MAX_PENDENTES_POR_ADMIN = 3
+    RELATORIOS_TIMEOUT_MINUTOS = 30     # tarefa "processando" há mais tempo que isso volta para a fila
+    RELATORIOS_EXPIRA_HORAS = 24        # arquivos gerados ficam disponíveis por esse tempo
+
+    # Instrumentação por requisição (/admin/metrics); METRICAS_LOG_JSON=1 loga uma linha JSON por requisição
+    METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', '1') == '1'
+    METRICAS_LOG_JSON = os.environ.get('METRICAS_LOG_JSON', '0') == '1'
+
     # Configurações de E-mail (Gmail Exemplo)
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '1') == '1'
     # É recomendável usar variáveis de ambiente para a senha, mas podes testar direto aqui
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD') 
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_USERNAME')
+
+    # Caixa de saída de e-mails (app/correio.py); CORREIO_WORKER_EXTERNO=1 quando o worker_emails.py estiver rodando
+    CORREIO_WORKER_EXTERNO = os.environ.get('CORREIO_WORKER_EXTERNO', '0') == '1'
+    CORREIO_CONEXOES = int(os.environ.get('CORREIO_CONEXOES', 3))                     # threads/conexões SMTP simultâneas
+    CORREIO_LOTE = 20                                                                 # mensagens reservadas por vez em cada conexão
+    CORREIO_LIMITE_POR_MINUTO = int(os.environ.get('CORREIO_LIMITE_POR_MINUTO', 60))  # limite da conta SMTP (0 = sem limite)
+    CORREIO_LIMITES_POR_DOMINIO = os.environ.get('CORREIO_LIMITES_POR_DOMINIO', '')   # ex.: 'gmail.com=30,hotmail.com=20'
+    CORREIO_MAX_TENTATIVAS = 5
+    CORREIO_BACKOFF_SEGUNDOS = 30       # espera antes da 2ª tentativa; dobra a cada falha
+    CORREIO_BACKOFF_MAXIMO_SEGUNDOS = 3600
+    CORREIO_TIMEOUT_MINUTOS = 10        # mensagem 'enviando' há mais tempo que isso volta para a fila
+    CORREIO_EXPIRA_DIAS = 30            # mensagens enviadas são apagadas depois disso
     
     # Configurações do Cloudinary
     CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME')
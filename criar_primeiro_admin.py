@@ -3,8 +3,9 @@ from app.extensions import db # Importa o db das extensões
 from app.models import Administrador # Importa o modelo do ficheiro correto
 
 with app.app_context():
-    # 1. Cria a tabela no banco (se não existir)
-    db.create_all()
+    # 1. Cria/atualiza as tabelas do banco (migrações pendentes)
+    from app import migracoes
+    migracoes.aplicar_pendentes()
     
     # 2. Verifica se já existe algum admin
     if not Administrador.query.first():
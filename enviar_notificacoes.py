@@ -1,54 +1,45 @@
 from run import app
-from app.models import Usuario, Pergunta, Resposta, Departamento
-from app.utils import disparar_lembretes_pendencias # Importa a nova função divertida
-from app.extensions import db
-from sqlalchemy import or_
+from app.contadores import pendencias_por_usuario
+from app.utils import disparar_lembretes_pendencias
 from datetime import datetime, timedelta
+import argparse
+import time
 
 # --- CONFIGURAÇÃO ---
 LINK_DO_SITE = "https://quiz-empresa.onrender.com"
 
-def verificar_e_lembrar_pendencias():
+# Uso:
+#   python enviar_notificacoes.py            -> grava os lembretes na caixa de saída (app/correio.py)
+#   python enviar_notificacoes.py --simular  -> só lista quem receberia o lembrete
+# O envio (lotes, limites por minuto, novas tentativas) é do despachante de e-mails.
+
+def verificar_e_lembrar_pendencias(simular=False):
     with app.app_context():
         print("--- 🕵️ Iniciando Caça às Pendências ---")
-        
+        inicio = time.time()
+
         # 1. Data de Hoje (UTC-3)
         hoje = (datetime.utcnow() - timedelta(hours=3)).date()
-        
-        # 2. Busca todos os usuários com e-mail
-        usuarios = Usuario.query.filter(Usuario.email != None).all()
-        
-        lista_devedores = []
-        
-        print(f"Analisando {len(usuarios)} usuários...")
-
-        for usuario in usuarios:
-            # A) Quais perguntas este usuário JÁ respondeu?
-            # sq_respondidas = lista de IDs
-            respondidas_ids = [r.pergunta_id for r in Resposta.query.filter_by(usuario_id=usuario.id).all()]
-            
-            # B) Quantas perguntas DISPONÍVEIS (até hoje) ele NÃO respondeu?
-            # Filtra por data, exclui as respondidas e verifica o setor
-            pendencias_count = Pergunta.query.filter(
-                Pergunta.data_liberacao <= hoje,           # Já liberada
-                ~Pergunta.id.in_(respondidas_ids),         # Não respondida
-                or_(
-                    Pergunta.para_todos_setores == True,   # Para todos
-                    Pergunta.departamentos.any(id=usuario.departamento_id) # Ou do setor dele
-                )
-            ).count()
-            
-            if pendencias_count > 0:
-                print(f"-> {usuario.nome} tem {pendencias_count} pendências.")
-                lista_devedores.append((usuario, pendencias_count))
-        
+
+        # 2. Pendências de todos os usuários com e-mail numa única consulta agrupada
+        #    (perguntas elegíveis do setor, já liberadas, sem resposta do usuário)
+        lista_devedores = pendencias_por_usuario(hoje)
+        print(f"{len(lista_devedores)} usuários com pendências (consulta em {time.time() - inicio:.2f}s).")
+
+        for usuario, pendencias_count in lista_devedores:
+            print(f"-> {usuario.nome} tem {pendencias_count} pendências.")
+
         # 3. Envia os e-mails se houver alguém com pendência
-        if lista_devedores:
-            print(f"Enviando e-mails para {len(lista_devedores)} usuários atrasados...")
-            disparar_lembretes_pendencias(lista_devedores, LINK_DO_SITE)
-            print("Disparos iniciados com sucesso! (O envio ocorre em segundo plano)")
-        else:
+        if not lista_devedores:
             print("🎉 Ninguém tem pendências! Tudo em dia.")
+        elif simular:
+            print("Simulação: nenhum e-mail enviado.")
+        else:
+            enfileirados = disparar_lembretes_pendencias(lista_devedores, LINK_DO_SITE)
+            print(f"{enfileirados} lembretes na caixa de saída. (O envio ocorre em segundo plano)")
 
 if __name__ == '__main__':
-    verificar_e_lembrar_pendencias()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Lembrete de pendências por e-mail')
+    parser.add_argument('--simular', action='store_true', help='Só calcula e lista as pendências')
+    args = parser.parse_args()
+    verificar_e_lembrar_pendencias(simular=args.simular)
\ No newline at end of file
@@ -1,6 +1,8 @@
 from run import app                   # Importa a app criada no run.py
 from app.extensions import db         # Importa o db das extensões
 from app.models import Usuario, Departamento # Importa os modelos do ficheiro correto
+from app.placar import reconstruir as reconstruir_placar
+from app.contadores import recalcular_todos
 
 # ESTRUTURA DOS SETORES E USUÁRIOS
 dados_iniciais = {
@@ -22,26 +24,31 @@ dados_iniciais = {
 }
 
 with app.app_context():
-    print("Apagando e recriando o banco de dados...")
-    db.drop_all() # Garante que o banco de dados antigo seja apagado
-    db.create_all()
+    from app import migracoes
+    print("Aplicando as migrações do banco de dados...")
+    migracoes.aplicar_pendentes()  # Nunca apaga o banco: só cria/ajusta o que falta
 
-    print("Inserindo departamentos e usuários...")
-    for nome_depto, lista_usuarios in dados_iniciais.items():
-        # Cria o departamento
-        novo_depto = Departamento(nome=nome_depto)
-        db.session.add(novo_depto)
-        
-        # Cria os usuários e já os associa ao departamento
-        for user_data in lista_usuarios:
-            novo_usuario = Usuario(
-                nome=user_data['nome'], 
-                codigo_acesso=user_data['codigo_acesso'],
-                email=user_data['email'],
-                departamento=novo_depto
-            )
-            db.session.add(novo_usuario)
-    
-    db.session.commit()
-    print("Dados iniciais inseridos com sucesso!")
+    if Departamento.query.first():
+        print("O banco já tem departamentos cadastrados; dados iniciais não inseridos.")
+    else:
+        print("Inserindo departamentos e usuários...")
+        for nome_depto, lista_usuarios in dados_iniciais.items():
+            # Cria o departamento
+            novo_depto = Departamento(nome=nome_depto)
+            db.session.add(novo_depto)
+
+            # Cria os usuários e já os associa ao departamento
+            for user_data in lista_usuarios:
+                novo_usuario = Usuario(
+                    nome=user_data['nome'],
+                    codigo_acesso=user_data['codigo_acesso'],
+                    email=user_data['email'],
+                    departamento=novo_depto
+                )
+                db.session.add(novo_usuario)
+
+        db.session.commit()
+        recalcular_todos()
+        reconstruir_placar()
+        print("Dados iniciais inseridos com sucesso!")
     print("Banco de dados pronto!")
\ No newline at end of file
@@ -0,0 +1,189 @@
+from run import app
+from app.extensions import db
+import argparse
+import html
+import re
+
+# Comandos de manutenção das estruturas derivadas (contadores, índices, etc.)
+# O esquema do banco é atualizado pelo migrar.py (este script só confere se está em dia).
+# Uso: python manutencao.py contadores | elegibilidade | placar [--verificar] | temas [--verificar] | consultas | indices | cronometro
+
+def cmd_contadores(args):
+    from app.contadores import recalcular_todos
+
+    print("--- 🔄 Recalculando contadores do dashboard ---")
+    total = recalcular_todos(progresso=lambda feitos, total: print(f"   {feitos}/{total} usuários..."))
+    print(f"✅ Contadores recalculados para {total} usuários.")
+
+def cmd_elegibilidade(args):
+    from app.elegibilidade import reconstruir
+
+    print("--- 🔄 Reconstruindo o índice de elegibilidade (setor x pergunta) ---")
+    total = reconstruir(progresso=lambda feitas, total: print(f"   {feitas}/{total} perguntas..."))
+    print(f"✅ Índice reconstruído com {total} linhas.")
+
+def cmd_placar(args):
+    from app.placar import reconstruir, verificar
+
+    print("--- 🏆 Conferindo o placar do ranking ---")
+    divergencias = verificar()
+    for tipo, chave, salvo, esperado in divergencias[:50]:
+        print(f"   ⚠️ {tipo} {chave}: salvo={salvo} esperado={esperado}")
+    if not divergencias:
+        print("✅ Placar consistente com as respostas.")
+        return
+    print(f"Encontradas {len(divergencias)} divergências.")
+    if args.verificar:
+        return
+    reconstruir()
+    print("✅ Placar reconstruído a partir das respostas.")
+
+def _args_placar(parser):
+    parser.add_argument('--verificar', action='store_true', help='Só confere, sem reconstruir')
+
+def cmd_temas(args):
+    from app.temas import reconstruir, verificar
+
+    print("--- 🗂️ Conferindo as respondidas por tema (tela de escolha de tema) ---")
+    divergencias = verificar()
+    for chave, salvo, esperado in divergencias[:50]:
+        print(f"   ⚠️ {chave}: salvo={salvo} esperado={esperado}")
+    if not divergencias:
+        print("✅ Contadores por tema consistentes com as respostas.")
+        return
+    print(f"Encontradas {len(divergencias)} divergências.")
+    if args.verificar:
+        return
+    reconstruir()
+    print("✅ Contadores por tema reconstruídos a partir das respostas.")
+
+# Páginas listadas e o máximo de consultas SQL aceitável para renderizar uma página
+# inteira (independente de quantas linhas ela mostra).
+PAGINAS_CONSULTAS = [
+    ('/admin/correcoes?status=todos', 8),
+    ('/admin/analytics?filtro_acertos=todos', 8),
+    ('/minhas-respostas', 8),
+]
+
+def cmd_consultas(args):
+    from sqlalchemy import func
+    from app.carregamento import contar_consultas
+    from app.models import Administrador, Resposta
+
+    print("--- 🔎 Contando consultas SQL por página (perfis de carregamento) ---")
+    admin = Administrador.query.first()
+    usuario_id = db.session.query(Resposta.usuario_id).group_by(Resposta.usuario_id)\
+        .order_by(func.count(Resposta.id).desc()).limit(1).scalar()
+    if not admin or not usuario_id:
+        print("⚠️ É preciso ter ao menos um admin e respostas cadastradas.")
+        return
+
+    client = app.test_client()
+    with client.session_transaction() as sessao:
+        sessao.update({'admin_logged_in': True, 'admin_id': admin.id, 'usuario_id': usuario_id})
+
+    falhas = 0
+    for url, limite in PAGINAS_CONSULTAS:
+        contagens = []
+        status = set()
+        endereco = url
+        for _ in range(2):  # página 1 e a seguinte (link com o cursor)
+            with contar_consultas() as contagem:
+                resposta = client.get(endereco)
+            status.add(resposta.status_code)
+            contagens.append(contagem['total'])
+            proxima = re.search(r'href="([^"]*[?&]cursor=[^"]*)"', resposta.get_data(as_text=True))
+            if not proxima:
+                break
+            endereco = html.unescape(proxima.group(1))
+        ok = max(contagens) <= limite and status == {200}
+        falhas += 0 if ok else 1
+        print(f"   {'✅' if ok else '❌'} {url}: {contagens} consultas (página 1 e seguinte, limite {limite}), HTTP {sorted(status)}")
+    if falhas:
+        raise SystemExit(f"{falhas} página(s) acima do limite de consultas.")
+
+# Rotas com as consultas quentes (sessão do usuário com mais respostas e de um admin) e as
+# tabelas que a rota lê inteiras de propósito (listas de usuários dos filtros, estatística geral)
+ROTAS_INDICES = [
+    ('/dashboard', set()),
+    ('/quiz', set()),
+    ('/temas/quiz', set()),
+    ('/atividades', set()),
+    ('/minhas-respostas', set()),
+    ('/ranking', set()),
+    ('/admin/', {'usuario'}),
+    ('/admin/perguntas', set()),
+    ('/admin/perguntas?filtro_tipo=discursiva', set()),
+    ('/admin/correcoes', {'usuario'}),
+    ('/admin/correcoes?status=todos', {'usuario'}),
+    ('/admin/analytics', {'usuario', 'resposta'}),
+]
+
+def cmd_indices(args):
+    from sqlalchemy import func
+    from app.explicar import capturar_consultas, plano, tamanhos_das_tabelas, varreduras_completas
+    from app.models import Administrador, Resposta, Usuario
+
+    print("--- 🧭 Conferindo os planos (EXPLAIN) das consultas das rotas quentes ---")
+    admin = Administrador.query.first()
+    usuario_id = db.session.query(Resposta.usuario_id).group_by(Resposta.usuario_id)\
+        .order_by(func.count(Resposta.id).desc()).limit(1).scalar()
+    if not admin or not usuario_id:
+        print("⚠️ É preciso ter ao menos um admin e respostas cadastradas (use um banco semeado pelo benchmark_carga.py).")
+        return
+
+    client = app.test_client()
+    with client.session_transaction() as sessao:
+        sessao.update({'admin_logged_in': True, 'admin_id': admin.id, 'usuario_id': usuario_id,
+                       'usuario_nome': db.session.get(Usuario, usuario_id).nome})
+
+    tamanhos = tamanhos_das_tabelas()
+    falhas = 0
+    for url, permitidas in ROTAS_INDICES:
+        with capturar_consultas() as consultas:
+            status = client.get(url).status_code
+        achadas = []
+        for statement, parametros in consultas:
+            for tabela, linha in varreduras_completas(plano(statement, parametros), tamanhos, args.min_linhas):
+                if tabela not in permitidas:
+                    achadas.append((tabela, linha, statement))
+        falhas += 1 if achadas else 0
+        falhas += 1 if status != 200 else 0
+        print(f"   {'❌' if achadas or status != 200 else '✅'} {url}: {len(consultas)} consultas, HTTP {status}")
+        for tabela, linha, statement in achadas:
+            print(f"      varredura completa em '{tabela}' ({tamanhos[tabela]} linhas): {linha}")
+            print(f"      {' '.join(statement.split())[:300]}")
+    if falhas:
+        raise SystemExit(f"{falhas} rota(s) com varredura completa de tabela grande.")
+
+def cmd_cronometro(args):
+    from app.cronometro import expirar
+
+    print("--- ⏱️ Apagando inícios de cronômetro antigos de perguntas respondidas (pergunta_emitida) ---")
+    print(f"✅ {expirar()} registros apagados.")
+
+def _args_indices(parser):
+    parser.add_argument('--min-linhas', type=int, default=1000, help='Ignora tabelas menores que isso')
+
+COMANDOS = {
+    'contadores': (cmd_contadores, 'Recalcula os contadores de pendências do dashboard', None),
+    'elegibilidade': (cmd_elegibilidade, 'Reconstrói o índice de perguntas elegíveis por setor', None),
+    'placar': (cmd_placar, 'Confere e reconstrói o placar do ranking', _args_placar),
+    'temas': (cmd_temas, 'Confere e reconstrói as respondidas por tema', _args_placar),
+    'consultas': (cmd_consultas, 'Confere o número de consultas SQL das páginas com listagens', None),
+    'indices': (cmd_indices, 'Roda EXPLAIN nas consultas das rotas quentes e aponta varreduras completas', _args_indices),
+    'cronometro': (cmd_cronometro, 'Apaga os inícios de cronômetro de perguntas já respondidas mais antigos que CRONOMETRO_EXPIRA_HORAS', None),
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manutenção do Quiz Interno')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    for nome, (_, ajuda, configurar) in COMANDOS.items():
+        sub_parser = sub.add_parser(nome, help=ajuda)
+        if configurar: configurar(sub_parser)
+    args = parser.parse_args()
+
+    with app.app_context():
+        from app import migracoes
+        migracoes.exigir_em_dia()  # Sai com aviso se faltar rodar o migrar.py
+        COMANDOS[args.comando][0](args)
@@ -0,0 +1,26 @@
+from run import app
+import argparse
+
+# Migrações do esquema do banco (app/migracoes). Substitui os antigos scripts avulsos
+# (adicionar_coluna.py, atualizar_banco.py, migrar_*.py) e funciona em SQLite e Postgres:
+#   python migrar.py              -> aplica as migrações pendentes, em ordem
+#   python migrar.py --status     -> lista as migrações e quando cada uma foi aplicada
+#   python migrar.py --ate 0002   -> aplica só até a versão informada
+# Pode ser rodado sempre no deploy: o que já foi aplicado é pulado.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrações do banco do Quiz Interno')
+    parser.add_argument('--status', action='store_true', help='Só mostra o que foi e o que falta aplicar')
+    parser.add_argument('--ate', help='Aplica até esta versão (ex.: 0002)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        from app import migracoes
+
+        if args.status:
+            for versao, descricao, aplicada in migracoes.status():
+                quando = f"aplicada em {aplicada.aplicada_em:%d/%m/%Y %H:%M} UTC" if aplicada else 'PENDENTE'
+                print(f"{'✅' if aplicada else '⏳'} {versao}: {descricao} ({quando})")
+        else:
+            feitas = migracoes.aplicar_pendentes(ate=args.ate)
+            print(f"✅ {len(feitas)} migrações aplicadas." if feitas else "✅ Banco já está na última versão.")
\ No newline at end of file
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# O banco dos testes precisa estar no ambiente antes de config.py ser importado
+# (uma vez só por sessão do pytest; cada teste recria o arquivo do zero)
+BANCO = os.path.join(tempfile.mkdtemp(prefix='quiz_testes_'), 'quiz.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{BANCO}'
+os.environ['METRICAS_ATIVAS'] = '0'
\ No newline at end of file
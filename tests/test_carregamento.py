@@ -0,0 +1,96 @@
+import os
+import re
+import html
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import create_app, paginacao
+from app.extensions import db
+from app.models import Departamento, Usuario, Administrador, Pergunta, Resposta, ImagemPergunta, AnexoResposta
+from app.categorias import obter_ou_criar
+from app.carregamento import contar_consultas
+from conftest import BANCO
+
+# Número de consultas SQL das listagens de respostas (perfis de app/carregamento.py):
+# tem que ser o mesmo com 3 ou 12 setores e poucas ou muitas respostas. Uma consulta
+# por linha (lazy load no template) faz a contagem crescer junto com os dados.
+
+PAGINAS = [
+    ('/admin/correcoes?status=todos', 8),
+    ('/admin/analytics?filtro_acertos=todos', 8),
+    ('/minhas-respostas', 8),
+]
+PERGUNTAS = 8
+
+@pytest.fixture
+def app():
+    if os.path.exists(BANCO):
+        os.remove(BANCO)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+def _semear(setores):
+    """Cria mais 'setores' setores, cada um com um usuário que responde todas as discursivas."""
+    categoria = obter_ou_criar('Geral')
+    perguntas = Pergunta.query.order_by(Pergunta.id).all()
+    if not perguntas:
+        ontem = date.today() - timedelta(days=1)
+        perguntas = [Pergunta(tipo='discursiva', texto=f'Pergunta {i}', data_liberacao=ontem,
+                              para_todos_setores=True, categoria_id=categoria.id) for i in range(PERGUNTAS)]
+        db.session.add_all(perguntas)
+        db.session.flush()
+        db.session.add_all(ImagemPergunta(url=f'http://img/{p.id}', pergunta_id=p.id) for p in perguntas)
+
+    inicio = Departamento.query.count()
+    for n in range(inicio, inicio + setores):
+        setor = Departamento(nome=f'Setor {n}')
+        db.session.add(setor)
+        db.session.flush()
+        usuario = Usuario(nome=f'Usuário {n}', email=f'u{n}@x', codigo_acesso=f'{n:04d}', departamento_id=setor.id)
+        db.session.add(usuario)
+        db.session.flush()
+        for i, pergunta in enumerate(perguntas):
+            resposta = Resposta(usuario_id=usuario.id, pergunta_id=pergunta.id, texto_discursivo='...',
+                                status_correcao='pendente', data_resposta=datetime.utcnow() - timedelta(minutes=i))
+            db.session.add(resposta)
+            db.session.flush()
+            db.session.add(AnexoResposta(url=f'http://anexo/{resposta.id}', resposta_id=resposta.id))
+    db.session.commit()
+
+def _contar_paginas(client, url):
+    """Consultas da página 1 e da seguinte (link com o cursor)."""
+    paginacao._contagens.limpar()  # o total em cache pularia uma consulta só na segunda rodada
+    contagens = []
+    endereco = url
+    for _ in range(2):
+        with contar_consultas() as contagem:
+            resposta = client.get(endereco)
+        assert resposta.status_code == 200
+        contagens.append(contagem['total'])
+        proxima = re.search(r'href="([^"]*[?&]cursor=[^"]*)"', resposta.get_data(as_text=True))
+        assert proxima, f'{url}: sem link para a página seguinte'
+        endereco = html.unescape(proxima.group(1))
+    return contagens
+
+@pytest.mark.parametrize('url, limite', PAGINAS)
+def test_consultas_por_pagina_nao_crescem_com_os_dados(app, url, limite):
+    admin = Administrador(nome='Admin', email='admin@x', senha_hash='-')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+
+    _semear(3)
+    usuario_id = Usuario.query.first().id
+    with client.session_transaction() as sessao:
+        sessao.update({'admin_logged_in': True, 'admin_id': admin.id, 'usuario_id': usuario_id, 'usuario_nome': 'Usuário 0'})
+    poucos = _contar_paginas(client, url)
+
+    _semear(9)
+    muitos = _contar_paginas(client, url)
+
+    assert poucos == muitos
+    assert max(muitos) <= limite
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import create_app, migracoes, placar, temas
+from app.extensions import db
+from app.models import Categoria, Pergunta, Resposta, Usuario, ContadorPendencias, PerguntaElegivel
+from app.contadores import calcular_pendencias
+from conftest import BANCO
+
+# Esquema da versão inicial do app (o instance/quiz.db original, com a coluna de
+# texto pergunta.categoria do antigo adicionar_coluna.py), sem nenhuma tabela nova.
+ESQUEMA_INICIAL = """
+CREATE TABLE departamento (
+    id INTEGER NOT NULL, nome VARCHAR(100) NOT NULL, PRIMARY KEY (id), UNIQUE (nome));
+CREATE TABLE pergunta (
+    id INTEGER NOT NULL, tipo VARCHAR(20) NOT NULL, texto VARCHAR(500) NOT NULL,
+    opcao_a VARCHAR(500), opcao_b VARCHAR(500), opcao_c VARCHAR(500), opcao_d VARCHAR(500),
+    resposta_correta VARCHAR(1), data_liberacao DATE NOT NULL, tempo_limite INTEGER,
+    imagem_pergunta VARCHAR(300), para_todos_setores BOOLEAN NOT NULL, explicacao TEXT,
+    categoria VARCHAR(50) DEFAULT 'Geral', PRIMARY KEY (id));
+CREATE TABLE pergunta_departamento (
+    pergunta_id INTEGER NOT NULL, departamento_id INTEGER NOT NULL,
+    PRIMARY KEY (pergunta_id, departamento_id),
+    FOREIGN KEY(pergunta_id) REFERENCES pergunta (id),
+    FOREIGN KEY(departamento_id) REFERENCES departamento (id));
+CREATE TABLE usuario (
+    id INTEGER NOT NULL, nome VARCHAR(100) NOT NULL, email VARCHAR(120),
+    codigo_acesso VARCHAR(4) NOT NULL, departamento_id INTEGER NOT NULL,
+    PRIMARY KEY (id), UNIQUE (email), UNIQUE (codigo_acesso),
+    FOREIGN KEY(departamento_id) REFERENCES departamento (id));
+CREATE TABLE resposta (
+    id INTEGER NOT NULL, pontos INTEGER, usuario_id INTEGER NOT NULL, pergunta_id INTEGER NOT NULL,
+    resposta_dada VARCHAR(1), data_resposta DATETIME, texto_discursivo TEXT, anexo_resposta VARCHAR(300),
+    status_correcao VARCHAR(20) NOT NULL, feedback_admin TEXT, feedback_visto BOOLEAN NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(usuario_id) REFERENCES usuario (id), FOREIGN KEY(pergunta_id) REFERENCES pergunta (id));
+CREATE TABLE imagem_pergunta (
+    id INTEGER NOT NULL, url VARCHAR(300) NOT NULL, pergunta_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(pergunta_id) REFERENCES pergunta (id));
+CREATE TABLE anexo_resposta (
+    id INTEGER NOT NULL, url VARCHAR(300) NOT NULL, resposta_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(resposta_id) REFERENCES resposta (id));
+CREATE TABLE administrador (
+    id INTEGER NOT NULL, nome VARCHAR(100) NOT NULL, email VARCHAR(120) NOT NULL,
+    senha_hash VARCHAR(256) NOT NULL, PRIMARY KEY (id), UNIQUE (email));
+"""
+
+CATEGORIAS = ['Vendas', 'vendas', ' VENDAS', 'Vendas', None, '', 'Processos']
+
+def _criar_banco_inicial():
+    conn = sqlite3.connect(BANCO)
+    conn.executescript(ESQUEMA_INICIAL)
+    ontem = (date.today() - timedelta(days=1)).isoformat()
+    agora = datetime.utcnow().isoformat(' ')
+    conn.execute("INSERT INTO departamento (id, nome) VALUES (1, 'Suporte'), (2, 'Vendas')")
+    conn.execute("INSERT INTO usuario (id, nome, email, codigo_acesso, departamento_id) VALUES "
+                 "(1, 'Ana', 'ana@x', '1111', 1), (2, 'Bia', 'bia@x', '2222', 2)")
+    for i, categoria in enumerate(CATEGORIAS * 2, 1):
+        tipo = 'discursiva' if i % 4 == 0 else 'multipla_escolha'
+        conn.execute("INSERT INTO pergunta (id, tipo, texto, resposta_correta, data_liberacao, para_todos_setores, categoria) "
+                     "VALUES (?, ?, ?, 'a', ?, 1, ?)", (i, tipo, f'Pergunta {i}', ontem, categoria))
+    resposta_id = 0
+    for usuario_id in (1, 2):
+        for pergunta_id in range(1, 9):
+            # A pergunta 3 foi respondida duas vezes (duplo clique), com um anexo na repetida
+            for _ in range(2 if pergunta_id == 3 else 1):
+                resposta_id += 1
+                conn.execute("INSERT INTO resposta (id, pontos, usuario_id, pergunta_id, resposta_dada, data_resposta, "
+                             "status_correcao, feedback_visto) VALUES (?, 150, ?, ?, 'a', ?, 'correto', 0)",
+                             (resposta_id, usuario_id, pergunta_id, agora))
+    conn.execute("INSERT INTO anexo_resposta (url, resposta_id) VALUES ('http://anexo', ?)", (resposta_id - 5,))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def app():
+    if os.path.exists(BANCO):
+        os.remove(BANCO)
+    _criar_banco_inicial()
+    app = create_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+def _conferir_banco_atualizado():
+    assert migracoes.pendentes() == []
+    assert migracoes.aplicar_pendentes(progresso=None) == []  # rodar de novo não faz nada
+
+    # Uma resposta por (usuário, pergunta), com o anexo da repetida preservado
+    assert Resposta.query.count() == 16
+    assert db.session.execute(db.text("SELECT COUNT(*) FROM anexo_resposta a JOIN resposta r ON r.id = a.resposta_id")).scalar() == 1
+
+    # Grafias da mesma categoria juntas; vazias em 'Sem Classificação'
+    nomes = {c.nome: c for c in Categoria.query}
+    assert set(nomes) == {'Vendas', 'Sem Classificação', 'Processos'}
+    assert Pergunta.query.filter_by(categoria_id=nomes['Vendas'].id).count() == 8
+    assert Pergunta.query.filter_by(categoria_id=nomes['Sem Classificação'].id).count() == 4
+
+    # Tabelas derivadas preenchidas e consistentes
+    assert PerguntaElegivel.query.count() > 0
+    assert placar.verificar() == []
+    assert temas.verificar() == []
+    contadores = ContadorPendencias.query.all()
+    assert len(contadores) == 2
+    for contador in contadores:
+        esperado = calcular_pendencias(db.session.get(Usuario, contador.usuario_id), contador.data_referencia)
+        assert (contador.quiz_pendentes, contador.atividades_pendentes, contador.feedbacks_novos) == tuple(esperado)
+
+    # O app grava do jeito novo (colunas das migrações finais existem)
+    assert db.session.execute(db.text("SELECT COUNT(token_envio) FROM resposta")).scalar() == 0
+
+def test_banco_da_versao_inicial_passa_por_todas_as_migracoes(app):
+    aplicadas = migracoes.aplicar_pendentes(progresso=None)
+    assert sorted(aplicadas) == [versao for versao, _, _ in migracoes.status()]
+    _conferir_banco_atualizado()
+
+def test_aplicar_em_etapas_com_ate(app):
+    primeiras = migracoes.aplicar_pendentes(ate=3, progresso=None)
+    # A 0003 recalcula pelos modelos atuais: fica pendente até o esquema estar completo
+    assert primeiras == ['0001_esquema_base', '0002_categorias']
+    migracoes.aplicar_pendentes(progresso=None)
+    _conferir_banco_atualizado()
\ No newline at end of file
@@ -0,0 +1,36 @@
+from run import app
+import argparse
+import time
+
+# Despachante da caixa de saída de e-mails (tabela email_saida).
+# Roda fora do gunicorn, num processo próprio (com CORREIO_WORKER_EXTERNO=1 no app):
+#   python worker_emails.py              -> fica em loop enviando o que chegar na fila
+#   python worker_emails.py --uma-vez    -> envia tudo o que estiver pendente e sai (bom para cron)
+#   python worker_emails.py --status     -> mostra quantas mensagens há em cada status
+# Cada processo abre CORREIO_CONEXOES conexões SMTP (uma por thread).
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Despachante de e-mails')
+    parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila (inclusive novas tentativas) e sai')
+    parser.add_argument('--conexoes', type=int, help='Conexões SMTP simultâneas (padrão: CORREIO_CONEXOES)')
+    parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre consultas à fila vazia')
+    parser.add_argument('--status', action='store_true', help='Só mostra o resumo da fila')
+    args = parser.parse_args()
+
+    with app.app_context():
+        from app import correio, migracoes
+        migracoes.exigir_em_dia()  # Sai com aviso se faltar rodar o migrar.py
+
+        if args.status:
+            print(correio.resumo() or 'Caixa de saída vazia.')
+        else:
+            travadas = correio.recuperar_travadas()
+            expiradas = correio.expirar()
+            if travadas or expiradas:
+                print(f"🧹 {travadas} mensagens travadas devolvidas à fila, {expiradas} enviadas antigas removidas.")
+
+            conexoes = args.conexoes or app.config['CORREIO_CONEXOES']
+            print(f"--- ✉️ Despachante de e-mails iniciado ({conexoes} conexões) ---")
+            inicio = time.time()
+            totais = correio.processar_fila(app, conexoes, continuo=not args.uma_vez, intervalo=args.intervalo)
+            print(f"✅ {totais['enviadas']} enviadas, {totais['falhas']} falhas em {time.time() - inicio:.1f}s.")
\ No newline at end of file
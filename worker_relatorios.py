@@ -0,0 +1,56 @@
+from run import app
+from app.extensions import db
+import argparse
+import time
+
+# Worker dos relatórios em segundo plano (tabela tarefa_relatorio).
+# Roda fora do gunicorn, num processo próprio:
+#   python worker_relatorios.py            -> fica em loop processando a fila
+#   python worker_relatorios.py --uma-vez  -> processa o que tiver na fila e sai (bom para cron)
+# As rotas só enfileiram com RELATORIOS_EM_SEGUNDO_PLANO=1 (desligado por padrão).
+# Pode haver mais de um worker; o limite global é RELATORIOS_MAX_SIMULTANEOS.
+
+def processar_fila(worker, uma_vez=False, intervalo=3):
+    from app import tarefas
+
+    ultima_limpeza = 0
+    while True:
+        # A cada 10 minutos: devolve tarefas travadas para a fila e apaga arquivos expirados
+        if time.time() - ultima_limpeza > 600:
+            travadas = tarefas.recuperar_travadas()
+            expiradas = tarefas.expirar()
+            if travadas or expiradas:
+                print(f"🧹 {travadas} tarefas travadas devolvidas à fila, {expiradas} expiradas removidas.")
+            ultima_limpeza = time.time()
+
+        tarefa = tarefas.reservar_proxima(worker)
+        if tarefa is None:
+            if uma_vez:
+                return
+            db.session.remove()
+            time.sleep(intervalo)
+            continue
+
+        print(f"⚙️  Gerando relatório {tarefa.tipo} ({tarefa.formato}) #{tarefa.id[:8]}...")
+        inicio = time.time()
+        try:
+            tarefas.executar(tarefa)
+            print(f"✅ #{tarefa.id[:8]} concluído em {time.time() - inicio:.1f}s")
+        except Exception as e:
+            print(f"❌ #{tarefa.id[:8]} falhou: {e}")
+        finally:
+            db.session.remove()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Worker dos relatórios em segundo plano')
+    parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila e sai')
+    parser.add_argument('--intervalo', type=float, default=3, help='Segundos entre consultas à fila vazia')
+    args = parser.parse_args()
+
+    with app.app_context():
+        from app import migracoes
+        from app.tarefas import identificador_worker
+        migracoes.exigir_em_dia()  # Sai com aviso se faltar rodar o migrar.py
+        worker = identificador_worker()
+        print(f"--- 📊 Worker de relatórios {worker} iniciado ---")
+        processar_fila(worker, uma_vez=args.uma_vez, intervalo=args.intervalo)
\ No newline at end of file